@@ -0,0 +1,158 @@
+"""
+Python reader of the ARGO profile files downloaded by ARGO_download.m
+(ARGO_{ocean}_{yyyymmdd}.nc, the Ifremer geo/ daily files).
+
+https://data-argo.ifremer.fr/geo/
+
+The output is the same ragged-array dict as gtspp_read.py:
+    lon      --- longitude (degree east)
+    lat      --- latitude (degree north)
+    time     --- date and time (datetime64[s])
+    row_size --- number of depths of every profile
+    z        --- pressure (dbar)
+    t        --- temperature (degree C)
+    s        --- salinity (psu)
+Only the levels with both temperature and salinity are kept, as in
+ARGO_read.m.
+
+The files are selected by the date in their names. In every file the
+positions are read first and tested against the polygon all at once;
+the pressure, temperature and salinity are then read only over the
+profiles that are inside, and the files are read in parallel.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import glob
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from netCDF4 import Dataset
+
+from geo_utils import box_polygon, inpolygon
+
+# JULD is in days since 1950-01-01
+JULD_EPOCH = np.datetime64('1950-01-01T00:00:00', 's')
+
+# Usage instructions
+USAGE = """
+Usage: python argo_read.py directory [start_date end_date]
+
+Arguments:
+  directory     Directory of the ARGO_{ocean}_{yyyymmdd}.nc files
+  start_date    Start date, format: yyyymmdd (optional)
+  end_date      End date, format: yyyymmdd (optional)
+
+Example:
+  python argo_read.py ./ 20231001 20231002
+"""
+
+
+def _juld_time(juld):
+    # JULD (days since 1950) as datetime64[s]
+    seconds = np.round(np.asarray(juld, dtype=np.float64) * 86400)
+    return JULD_EPOCH + seconds.astype('timedelta64[s]')
+
+
+def _ragged(lon, lat, time, z, t, s):
+    # Pack (profile, level) arrays into the ragged dict, keeping the T/S levels
+    valid = ~np.isnan(t + s)
+    return {
+        'lon': np.asarray(lon, dtype=float),
+        'lat': np.asarray(lat, dtype=float),
+        'time': time,
+        'row_size': valid.sum(axis=1).astype(np.int64),
+        'z': z[valid],
+        't': t[valid],
+        's': s[valid],
+    }
+
+
+def _filled(var, rows=slice(None)):
+    # Read variable rows as float, with NaN for the missing values
+    return np.ma.filled(var[rows].astype(float), np.nan)
+
+
+def argo_read_file(fin, poly=None):
+    """
+    Read the profiles of one ARGO file, or only those inside the polygon
+    poly (n, 2) if it is given.
+    """
+    with Dataset(fin) as nc:
+        lon = _filled(nc.variables['LONGITUDE'])
+        lat = _filled(nc.variables['LATITUDE'])
+        if poly is None:
+            rows = np.arange(len(lon))
+        else:
+            rows = np.flatnonzero(inpolygon(lon, lat, poly))
+        if len(rows) == 0:
+            empty = np.zeros((0, 0))
+            return _ragged(lon[rows], lat[rows], _juld_time([]), empty, empty, empty)
+
+        # Read the rows between the first and last selected profiles only
+        span = slice(rows[0], rows[-1] + 1)
+        rows_span = rows - rows[0]
+        juld = _filled(nc.variables['JULD'], span)[rows_span]
+        z, t, s = [_filled(nc.variables[name], span)[rows_span]
+                   for name in ('PRES', 'TEMP', 'PSAL')]
+    return _ragged(lon[rows], lat[rows], _juld_time(juld), z, t, s)
+
+
+def argo_files(directory, tlims=None):
+    # ARGO files of directory with a date (in the name) within tlims
+    files = []
+    for fin in sorted(glob.glob(os.path.join(directory, 'ARGO_*.nc'))):
+        try:
+            day = datetime.strptime(os.path.basename(fin)[-11:-3], '%Y%m%d')
+        except ValueError:
+            continue
+        if tlims is not None and (day < tlims[0] or day > tlims[1]):
+            continue
+        files.append(fin)
+    return files
+
+
+def argo_read(directory, tlims=None, xlims=(-180, 180), ylims=(-90, 90), poly=None,
+              workers=None):
+    """
+    Read the ARGO profiles of directory, as ARGO_read.m.
+
+    tlims is an optional [start, end] pair of datetimes (compared with the
+    date of every file), and poly an optional (n, 2) lon/lat polygon, by
+    default the xlims/ylims box. The files are read with a pool of workers
+    processes. Returns the ragged-array dict described at the top of this
+    module.
+    """
+    if poly is None:
+        poly = box_polygon(xlims, ylims)
+    if tlims is not None and not isinstance(tlims, (list, tuple)):
+        tlims = [tlims, tlims]
+
+    print('----- ARGO read -----')
+    files = argo_files(directory, tlims)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        blocks = list(pool.map(argo_read_file, files, [poly] * len(files)))
+    if not blocks:
+        empty = np.zeros((0, 0))
+        blocks = [_ragged([], [], _juld_time([]), empty, empty, empty)]
+    return {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) not in (2, 4):
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    directory = sys.argv[1]
+    tlims = None
+    if len(sys.argv) == 4:
+        tlims = [datetime.strptime(sys.argv[2], '%Y%m%d'),
+                 datetime.strptime(sys.argv[3], '%Y%m%d')]
+
+    out = argo_read(directory, tlims)
+    print(f"---- {len(out['lon'])} profiles, {len(out['z'])} levels")
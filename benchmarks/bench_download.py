@@ -0,0 +1,293 @@
+"""
+Benchmark of the download_*.py scripts against local stand-ins of the
+data servers (standins.py) and of the Copernicus Marine library
+(standin/copernicusmarine.py), so nothing is fetched from CMEMS, ERDDAP
+or NCEP.
+
+Usage: python benchmarks/bench_download.py start_date end_date [product ...]
+       python benchmarks/bench_download.py compare before.json after.json
+
+Arguments:
+  start_date    Start date in yyyymmdd format
+  end_date      End date in yyyymmdd format
+  product       ssh, sss, ostia, swh, ghrsst or rtghr (optional, defaults to all)
+
+Every script is run unchanged in a child process, in an empty directory,
+twice: a cold run, and a warm run that should find everything up to date.
+The child times the stages of the script (list and check of the remote
+files, download, and the rest: conversion and writing) and the bytes
+received. The results (files/s, MB/s, peak RSS, per-stage latency) are
+printed and saved with the git commit to bench_download_{commit}.json,
+to be compared with those of another commit.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import json
+import time
+import runpy
+import tempfile
+import resource
+import threading
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPO_DIRECTORY = os.path.dirname(BENCH_DIRECTORY)
+sys.path.insert(0, REPO_DIRECTORY)
+from products import PRODUCTS, script as product_script
+
+# Settings
+# Latency (s) of every request to the stand-in servers
+LATENCY = 0.1
+# Grid of the stand-in files: RTGHR GRIB2 and CMEMS NetCDF (lat x lon)
+RTGHR_SHAPE = (2160, 4320)
+CMEMS_GRID = (720, 1440)
+
+# Real server URLs and the stand-in paths they are sent to
+REWRITE = {
+    'https://coastwatch.pfeg.noaa.gov/erddap/griddap/': 'griddap/',
+    'ftp://ftpprd.ncep.noaa.gov/pub/data/nccf/com/nsst/v1.2/': '',
+}
+
+
+def child(stats_path, script, args):
+    """
+    Run script with args in this process, timing its stages, and write
+    the stage durations, the bytes received and the peak RSS to stats_path.
+    """
+    sys.path[:0] = [os.path.join(BENCH_DIRECTORY, 'standin'), REPO_DIRECTORY]
+    import download_utils
+    import copernicusmarine
+
+    rewrite = json.loads(os.environ['OCEANDATA_BENCH_REWRITE'])
+    stages = {}
+    received = [0]
+    lock = threading.Lock()
+
+    def record(stage, t0, nbytes=0):
+        with lock:
+            stages.setdefault(stage, []).append(time.perf_counter() - t0)
+            received[0] += nbytes
+
+    def local(url):
+        for real, standin in rewrite.items():
+            if url.startswith(real):
+                return standin + url[len(real):]
+        return url
+
+    # Patched before the scripts (and erddap_utils) import them
+    url_download = download_utils.urlDownload
+    remote_info = download_utils.remote_info
+    cmems_get = copernicusmarine.get
+    cmems_subset = copernicusmarine.subset
+
+    def timed_download(url, destination, *a, **kw):
+        t0 = time.perf_counter()
+        remote = url_download(local(url), destination, *a, **kw)
+        record('download', t0, download_utils.file_size(destination))
+        return remote
+
+    def timed_info(url):
+        t0 = time.perf_counter()
+        remote = remote_info(local(url))
+        record('check', t0)
+        return remote
+
+    def timed_get(*a, **kw):
+        t0 = time.perf_counter()
+        files = cmems_get(*a, **kw)
+        if kw.get('create_file_list'):
+            record('list', t0)
+        else:
+            record('download', t0, sum(download_utils.file_size(f) for f in files))
+        return files
+
+    def timed_subset(*a, **kw):
+        t0 = time.perf_counter()
+        path = cmems_subset(*a, **kw)
+        record('download', t0, download_utils.file_size(path))
+        return path
+
+    download_utils.urlDownload = timed_download
+    download_utils.remote_info = timed_info
+    copernicusmarine.get = timed_get
+    copernicusmarine.subset = timed_subset
+
+    sys.argv = [script] + args
+    t0 = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit:
+        pass
+    wall = time.perf_counter() - t0
+    timed = sum(sum(durations) for durations in stages.values())
+    stages['other'] = [max(wall - timed, 0.0)]
+
+    with open(stats_path, 'w') as f:
+        json.dump({'wall': wall, 'bytes': received[0], 'stages': stages,
+                   'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}, f)
+
+
+def _outputs(directory, prefix):
+    # Modification times of the daily files of prefix
+    return {name: os.path.getmtime(os.path.join(directory, name))
+            for name in os.listdir(directory)
+            if name.startswith(prefix + '_') and name.endswith('.nc')}
+
+
+def run_product(product, dates, directory, env):
+    # One pass of a product over dates in directory; returns the metrics
+    script = os.path.join(REPO_DIRECTORY, product_script(product))
+    prefix = PRODUCTS[product]['prefix']
+    if PRODUCTS[product]['single_date']:
+        runs = [[date_str] for date_str in dates]
+    else:
+        runs = [[dates[0], dates[-1]]]
+
+    # A home of its own, for the listings cached by cmems_utils
+    env = dict(env, HOME=os.path.join(directory, '.home'))
+    before = _outputs(directory, prefix)
+    stages = {}
+    nbytes, max_rss, wall = 0, 0, 0.0
+    for args in runs:
+        stats_path = os.path.join(directory, '.bench_stats.json')
+        with open(os.path.join(directory, '.bench.log'), 'a') as log:
+            status = subprocess.call([sys.executable, __file__, 'child', stats_path, script] + args,
+                                     cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if status != 0 or not os.path.isfile(stats_path):
+            raise RuntimeError(f"{product} failed, see {directory}/.bench.log")
+        with open(stats_path) as f:
+            stats = json.load(f)
+        os.remove(stats_path)
+        wall += stats['wall']
+        nbytes += stats['bytes']
+        max_rss = max(max_rss, stats['max_rss'])
+        for stage, durations in stats['stages'].items():
+            stages.setdefault(stage, []).extend(durations)
+
+    after = _outputs(directory, prefix)
+    written = [name for name in after if before.get(name) != after[name]]
+    output_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in written)
+    return {
+        'files': len(written),
+        'wall': wall,
+        'files_per_s': len(written) / wall,
+        'mb': nbytes / 1e6,
+        'mb_per_s': nbytes / 1e6 / wall,
+        'output_mb': output_bytes / 1e6,
+        'max_rss_mb': max_rss / 1e6,
+        'stages': {stage: {'count': len(durations),
+                           'total': float(np.sum(durations)),
+                           'median': float(np.median(durations)),
+                           'p95': float(np.percentile(durations, 95))}
+                   for stage, durations in stages.items()},
+    }
+
+
+def git_commit():
+    # Commit of the repository, with -dirty if it has uncommitted changes
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=REPO_DIRECTORY, text=True).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                        cwd=REPO_DIRECTORY, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def report(product, name, metrics):
+    print(f"{product:7s} {name:5s} {metrics['files']:4d} files  {metrics['wall']:7.2f} s  "
+          f"{metrics['files_per_s']:6.2f} files/s  {metrics['mb']:8.1f} MB  "
+          f"{metrics['mb_per_s']:7.1f} MB/s  out {metrics['output_mb']:7.1f} MB  "
+          f"RSS {metrics['max_rss_mb']:6.0f} MB")
+    for stage, s in metrics['stages'].items():
+        print(f"{'':14s}{stage:9s} n={s['count']:<4d} total {s['total']:7.2f} s  "
+              f"median {s['median']:6.3f} s  p95 {s['p95']:6.3f} s")
+
+
+def benchmark(start_date, end_date, products):
+    # Cold and warm runs of every product; returns the results
+    from standins import start_server
+    server, base_url = start_server(LATENCY, RTGHR_SHAPE)
+    env = dict(os.environ,
+               OCEANDATA_BENCH_REWRITE=json.dumps({real: base_url + path
+                                                   for real, path in REWRITE.items()}),
+               OCEANDATA_BENCH_LATENCY=str(LATENCY),
+               OCEANDATA_BENCH_GRID=','.join(str(n) for n in CMEMS_GRID))
+    dates = [d.strftime('%Y%m%d') for d in
+             np.arange(np.datetime64(datetime.strptime(start_date, '%Y%m%d'), 'D'),
+                       np.datetime64(datetime.strptime(end_date, '%Y%m%d'), 'D') + 1)
+             .astype(datetime)]
+
+    results = {}
+    try:
+        for product in products:
+            results[product] = {}
+            with tempfile.TemporaryDirectory() as directory:
+                for name in ('cold', 'warm'):
+                    metrics = run_product(product, dates, directory, env)
+                    results[product][name] = metrics
+                    report(product, name, metrics)
+    finally:
+        server.shutdown()
+
+    return {
+        'commit': git_commit(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'config': {'start_date': start_date, 'end_date': end_date, 'latency': LATENCY,
+                   'rtghr_shape': list(RTGHR_SHAPE), 'cmems_grid': list(CMEMS_GRID)},
+        'results': results,
+    }
+
+
+def compare(before_path, after_path):
+    # Print the metrics of two result files side by side
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    if before['config'] != after['config']:
+        print("     Warning: the two runs have different settings")
+    print(f"{'':14s}{before['commit']:>12s} {after['commit']:>12s}   ratio")
+    for product in before['results']:
+        for name, a in before['results'][product].items():
+            b = after['results'].get(product, {}).get(name)
+            if b is None:
+                continue
+            rows = [(key, a[key], b[key]) for key in
+                    ('wall', 'files_per_s', 'mb_per_s', 'max_rss_mb')]
+            rows += [(stage, s['median'], b['stages'][stage]['median'])
+                     for stage, s in a['stages'].items() if stage in b['stages']]
+            print(f"{product} {name}")
+            for key, x, y in rows:
+                ratio = y / x if x else float('nan')
+                print(f"  {key:12s}{x:12.3f} {y:12.3f}   {ratio:5.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'child':
+        child(sys.argv[2], sys.argv[3], sys.argv[4:])
+    elif len(sys.argv) == 4 and sys.argv[1] == 'compare':
+        compare(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 3:
+        products = sys.argv[3:] or list(PRODUCTS)
+        unknown = [p for p in products if p not in PRODUCTS]
+        if unknown:
+            print(f"Unknown products: {', '.join(unknown)}")
+            sys.exit()
+        sys.path.insert(0, BENCH_DIRECTORY)
+        results = benchmark(sys.argv[1], sys.argv[2], products)
+        fout = f"bench_download_{results['commit']}.json"
+        with open(fout, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"---- Results saved to {fout}")
+    else:
+        print(__doc__)
@@ -0,0 +1,121 @@
+"""
+Benchmark of gtspp_read.py against a line-by-line reader that follows
+GTSPP_read_one.m.
+
+Usage: python benchmarks/bench_gtspp_read.py [file]
+
+With no file, a synthetic MEDS-ASCII month (20000 stations, T and S
+profiles in 2 segments) is written to a temporary .gz file.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import gzip
+import time
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gtspp_read import gtspp_read
+
+
+def write_synthetic(fout, n_station=20000, seed=0):
+    # Write a synthetic MEDS-ASCII file with TEMP and PSAL profiles
+    rng = np.random.default_rng(seed)
+    with gzip.open(fout, 'wt') as f:
+        for k in range(n_station):
+            n_seg = [int(rng.integers(1, 3)), int(rng.integers(0, 3))]
+            types = ['TEMP', 'PSAL'] if n_seg[1] else ['TEMP']
+            header = [' '] * (14 * len(types) + 130)
+            header[26:38] = f"2024{1 + k % 12:02d}{1 + k % 28:02d}{k % 24:02d}{k % 60:02d}"
+            header[62:70] = f"{rng.uniform(-80, 80):8.3f}"
+            header[70:79] = f"{rng.uniform(-180, 180):9.3f}"
+            header[121:123] = f"{len(types):2d}"
+            for i, prof in enumerate(types, start=1):
+                header[14 * i + 116:14 * i + 122] = f"{n_seg[i - 1]:2d}{prof}"
+            f.write(''.join(header) + '\n')
+            for prof, n in zip(types, n_seg):
+                for seg in range(n):
+                    nz = int(rng.integers(5, 100))
+                    line = [' '] * 63
+                    line[52:56] = prof
+                    line[58:62] = f"{nz:4d}"
+                    z0 = seg * 500.0
+                    for z in np.sort(rng.uniform(z0, z0 + 500, nz)):
+                        v = rng.uniform(0, 30) if prof == 'TEMP' else rng.uniform(30, 37)
+                        line.append(f"{z:6.1f}1{v:9.3f}1")
+                    f.write(''.join(line) + '\n')
+
+
+def read_lines(fin):
+    # Line-by-line reader, as GTSPP_read_one.m
+    def number(text):
+        try:
+            return float(text)
+        except ValueError:
+            return np.nan
+
+    out = []
+    with gzip.open(fin, 'rt') if fin.endswith('.gz') else open(fin) as f:
+        for line in f:
+            lat = number(line[62:70])
+            lon = -number(line[70:79])
+            n_prof = int(line[121:123])
+            n_segg = [int(line[14 * i + 116:14 * i + 118]) for i in range(1, n_prof + 1)]
+            temp, psal = [], []
+            for i in range(n_prof):
+                for j in range(n_segg[i]):
+                    line2 = next(f)
+                    nz = int(line2[58:62])
+                    data = [(number(line2[63 + 17 * k:69 + 17 * k]),
+                             number(line2[70 + 17 * k:79 + 17 * k])) for k in range(nz)]
+                    if line2[52:56] == 'TEMP':
+                        temp += data
+                    elif line2[52:56] == 'PSAL':
+                        psal += data
+            temp = [d for d in temp if d != (0, 0) and not np.isnan(d[1])]
+            psal = [d for d in psal if d != (0, 0) and not np.isnan(d[1])]
+            if not temp and not psal:
+                continue
+            z = sorted({d[0] for d in temp + psal if not np.isnan(d[0])})
+            t = [next((d[1] for d in temp if d[0] == zz), np.nan) for zz in z]
+            s = [next((d[1] for d in psal if d[0] == zz), np.nan) for zz in z]
+            out.append((lon, lat, z, t, s))
+    return out
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        fin = sys.argv[1]
+    else:
+        fin = os.path.join(tempfile.mkdtemp(), 'synthetic_meds.gz')
+        write_synthetic(fin)
+    print(f"---- {fin}: {os.path.getsize(fin) / 1e6:.1f} MB")
+
+    t0 = time.time()
+    out = gtspp_read(fin)
+    t_numpy = time.time() - t0
+    print(f"     gtspp_read : {len(out['lon'])} profiles, {len(out['z'])} depths "
+          f"in {t_numpy:.2f} s")
+
+    t0 = time.time()
+    ref = read_lines(fin)
+    t_lines = time.time() - t0
+    print(f"     line by line: {len(ref)} profiles in {t_lines:.2f} s "
+          f"({t_lines / t_numpy:.1f}x slower)")
+
+    # Check that both readers return the same data
+    same = len(ref) == len(out['lon'])
+    offset = 0
+    for k, (lon, lat, z, t, s) in enumerate(ref if same else []):
+        n = out['row_size'][k]
+        same &= np.allclose([lon, lat], [out['lon'][k], out['lat'][k]])
+        same &= np.array_equal(z, out['z'][offset:offset + n])
+        same &= np.allclose(t, out['t'][offset:offset + n], equal_nan=True)
+        same &= np.allclose(s, out['s'][offset:offset + n], equal_nan=True)
+        offset += n
+    print(f"     same output : {bool(same)}")
@@ -0,0 +1,84 @@
+"""
+Benchmark of ioc_harvest.py against a local stand-in of the IOC server.
+
+Usage: python benchmarks/bench_ioc_harvest.py [n_station] [latency]
+
+The stand-in serves bgraph.php tables (one sample every 5 minutes) after
+latency seconds (default 0.2). The same stations are harvested with one
+connection (as IOC_download.m) and with the default pool.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+import numpy as np
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import ioc_harvest
+
+
+@lru_cache(maxsize=None)
+def table(end, period, step=5):
+    # bgraph.php table of period days ending at end
+    rows = ['<table><tr><th>Time (UTC)</th><th>prs(m)</th></tr>']
+    t = end - timedelta(days=period)
+    while t < end:
+        minutes = (t - datetime(2000, 1, 1)).total_seconds() / 60
+        value = np.sin(2 * np.pi * minutes / 745.2)
+        rows.append(f"<tr><td>{t:%Y-%m-%d %H:%M:%S}</td><td>{value:.3f}</td></tr>")
+        t += timedelta(minutes=step)
+    rows.append('</table>')
+    return '\n'.join(rows)
+
+
+def start_server(latency):
+    # Run the stand-in server in a thread; returns its base URL
+    async def bgraph(request):
+        await asyncio.sleep(latency)
+        end = datetime.strptime(request.query['endtime'], '%Y-%m-%d')
+        text = table(end, int(request.query['period']))
+        return web.Response(text=text, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/bgraph.php', bgraph)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}/"
+
+
+def run(ids, outdir, tlims, per_host):
+    # Harvest with per_host connections; returns the elapsed time
+    ioc_harvest.CONNECTIONS_PER_HOST = per_host
+    ioc_harvest.RATE = 0
+    t0 = time.time()
+    ioc_harvest.harvest(ids, outdir, tlims)
+    return time.time() - t0
+
+
+if __name__ == "__main__":
+    n_station = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    ioc_harvest.url0 = start_server(latency)
+    ids = list(ioc_harvest.read_list('IOC')['id'][:n_station])
+    tlims = [datetime(2024, 1, 1), datetime(2024, 12, 31)]
+    with tempfile.TemporaryDirectory() as outdir:
+        t_serial = run(ids, outdir, tlims, 1)
+        t_pool = run(ids, outdir, tlims, ioc_harvest.CONNECTIONS)
+    print(f"one connection: {t_serial:.1f} s")
+    print(f"pool:           {t_pool:.1f} s  ({t_serial / t_pool:.1f}x)")
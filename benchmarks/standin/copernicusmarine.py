@@ -0,0 +1,90 @@
+"""
+Stand-in of the Copernicus Marine library (login, get and subset), for
+the benchmarks. get() writes a synthetic NetCDF file named after the date
+of the filter, after OCEANDATA_BENCH_LATENCY seconds (default 0.1), on a
+grid of OCEANDATA_BENCH_GRID points (default 720,1440); subset() writes
+the same data cut to the requested box and variables. The file list of a
+month filter (yyyymm*) has one file for every day of the month.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import re
+import time
+import calendar
+
+import numpy as np
+from netCDF4 import Dataset
+
+
+def _setting(name, default):
+    return os.environ.get(f"OCEANDATA_BENCH_{name}", default)
+
+
+def login(username=None, password=None, **kwargs):
+    return True
+
+
+def _file_names(filter):
+    # Remote file names of a filter, e.g. */2024/01/20240101*.nc or */2024/01/202401*.nc
+    name = filter.rsplit('/', 1)[-1]
+    month = re.search(r'(?<!\d)(\d{4})(\d{2})\*', name)
+    if month is None:
+        return {re.search(r'\d{8}', name).group(0): name.replace('*', 'standin')}
+    yyyy, mm = int(month.group(1)), int(month.group(2))
+    names = {}
+    for day in range(1, calendar.monthrange(yyyy, mm)[1] + 1):
+        date_str = f"{yyyy}{mm:02d}{day:02d}"
+        names[date_str] = name.replace(month.group(0), date_str, 1).replace('*', 'standin')
+    return names
+
+
+def _write(path, date_str, lon_limits=(-180, 180), lat_limits=(-90, 90), variables=('data',)):
+    # Synthetic daily field(s) in a box
+    ny, nx = [int(n) for n in _setting('GRID', '720,1440').split(',')]
+    lat = -90 + 180 / ny * (np.arange(ny) + 0.5)
+    lon = -180 + 360 / nx * (np.arange(nx) + 0.5)
+    lat = lat[(lat >= lat_limits[0]) & (lat <= lat_limits[1])]
+    lon = lon[(lon >= lon_limits[0]) & (lon <= lon_limits[1])]
+    day = (np.datetime64(f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}")
+           - np.datetime64('2024-01-01')).astype(int)
+    with Dataset(path, 'w') as nc:
+        nc.createDimension('time', 1)
+        nc.createDimension('latitude', len(lat))
+        nc.createDimension('longitude', len(lon))
+        nc.createVariable('time', 'f8', ('time',))[:] = day
+        nc.createVariable('latitude', 'f4', ('latitude',))[:] = lat
+        nc.createVariable('longitude', 'f4', ('longitude',))[:] = lon
+        for k, name in enumerate(variables):
+            var = nc.createVariable(name, 'f4', ('time', 'latitude', 'longitude'), zlib=True)
+            var[0] = (np.cos(np.radians(lat))[:, None] * np.sin(np.radians(lon) + k)[None, :]
+                      + 0.01 * day)
+
+
+def get(dataset_id=None, output_directory='./', filter=None, create_file_list=None, **kwargs):
+    time.sleep(float(_setting('LATENCY', '0.1')))
+    names = _file_names(filter)
+    if create_file_list:
+        with open(os.path.join(output_directory, create_file_list), 'w') as f:
+            f.write("filename,size,last_modified_datetime,etag\n")
+            for name in names.values():
+                f.write(f"s3://standin/{dataset_id}/{name},0,2024-01-01T00:00:00Z,\"{name}\"\n")
+        return []
+    paths = []
+    for date_str, name in names.items():
+        paths.append(os.path.join(output_directory, name))
+        _write(paths[-1], date_str)
+    return paths
+
+
+def subset(dataset_id=None, variables=None, minimum_longitude=-180, maximum_longitude=180,
+           minimum_latitude=-90, maximum_latitude=90, start_datetime=None, output_directory='./',
+           output_filename=None, **kwargs):
+    time.sleep(float(_setting('LATENCY', '0.1')))
+    date_str = start_datetime[:10].replace('-', '')
+    path = os.path.join(output_directory, output_filename or f"{dataset_id}_{date_str}_subset.nc")
+    _write(path, date_str, (minimum_longitude, maximum_longitude),
+           (minimum_latitude, maximum_latitude), variables or ('data',))
+    return path
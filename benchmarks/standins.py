@@ -0,0 +1,183 @@
+"""
+Local stand-ins of the data servers of the download_*.py scripts, for the
+benchmarks:
+    griddap   --- ERDDAP griddap .nc responses on the MUR grid (GHRSST)
+    rtghr     --- RTG-SST-HR GRIB2 files under nsst.{yyyymmdd}/ (HTTP)
+The fake Copernicus Marine library is in standin/copernicusmarine.py.
+
+All the data are synthetic and the same on every run. Every response is
+sent after latency seconds.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import re
+import time
+import struct
+import threading
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import unquote
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from netCDF4 import Dataset
+
+# MUR grid (first point, spacing, number of points), as the GHRSST script
+MUR_LAT = (-89.99, 0.01, 17999)
+MUR_LON = (-179.99, 0.01, 36000)
+# RTGHR grid (1/12 degree, north to south)
+RTGHR_SHAPE = (2160, 4320)
+RTGHR_NAME = 'rtgssthr_grb_0.083_awips.grib2'
+LAST_MODIFIED = formatdate(datetime(2024, 1, 1).timestamp(), usegmt=True)
+
+
+def sst_field(lat, lon, day):
+    # Smooth synthetic SST (degree C) on a lat/lon grid
+    lat = np.radians(np.asarray(lat, dtype=np.float64))[:, None]
+    lon = np.radians(np.asarray(lon, dtype=np.float64))[None, :]
+    return 15 + 13 * np.cos(lat) ** 2 + np.sin(3 * lon) * np.cos(lat) + 0.01 * day
+
+
+def _grib_signed(value, nbytes):
+    # GRIB2 signed integer: sign bit and magnitude
+    magnitude = abs(int(value))
+    if value < 0:
+        magnitude |= 1 << (8 * nbytes - 1)
+    return magnitude.to_bytes(nbytes, 'big')
+
+
+def rtghr_grib(date_str, shape=RTGHR_SHAPE):
+    """
+    A GRIB2 message of temperature (K) on a global regular lat/lon grid,
+    north to south, 16-bit simple packing at 0.001 K, as the RTGHR file.
+    """
+    ny, nx = shape
+    dy, dx = 180 / ny, 360 / nx
+    lat = 90 - dy / 2 - dy * np.arange(ny)
+    lon = dx / 2 + dx * np.arange(nx)
+    day = (datetime.strptime(date_str, '%Y%m%d') - datetime(2024, 1, 1)).days
+    values = (sst_field(lat, lon, day) + 273.15) * 1000
+    reference = np.float32(np.floor(values.min()))
+    packed = np.round(values - reference).astype('>u2')
+
+    date = datetime.strptime(date_str, '%Y%m%d')
+    micro = 1000000
+    section1 = struct.pack('>IBHHBBBHBBBBBBB', 21, 1, 7, 0, 2, 1, 0, date.year, date.month,
+                           date.day, 0, 0, 0, 0, 0)
+    grid = (struct.pack('>BBIBIBI', 6, 0, 0, 0, 0, 0, 0)
+            + struct.pack('>IIII', nx, ny, 0, 0xFFFFFFFF)
+            + _grib_signed(round(lat[0] * micro), 4) + _grib_signed(round(lon[0] * micro), 4)
+            + bytes([48])
+            + _grib_signed(round(lat[-1] * micro), 4) + _grib_signed(round(lon[-1] * micro), 4)
+            + struct.pack('>II', round(dx * micro), round(dy * micro)) + bytes([0]))
+    section3 = struct.pack('>IBBIBBH', 14 + len(grid), 3, 0, nx * ny, 0, 0, 0) + grid
+    product = struct.pack('>BBBBBHBBIBBIBBI', 0, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 255, 0, 0)
+    section4 = struct.pack('>IBHH', 9 + len(product), 4, 0, 0) + product
+    section5 = (struct.pack('>IBIH', 21, 5, nx * ny, 0) + np.array(reference, dtype='>f4').tobytes()
+                + _grib_signed(0, 2) + _grib_signed(3, 2) + bytes([16, 0]))
+    section6 = struct.pack('>IBB', 6, 6, 255)
+    data = packed.tobytes()
+    section7 = struct.pack('>IB', 5 + len(data), 7) + data
+    body = section1 + section3 + section4 + section5 + section6 + section7 + b'7777'
+    return b'GRIB' + bytes([0, 0, 0, 2]) + struct.pack('>Q', 16 + len(body)) + body
+
+
+def _axis_index(subscript, grid):
+    # Indices of a griddap subscript, (value):stride:(value) or index:stride:index
+    start, step, n = grid
+    parts = subscript.split(':')
+    first, last = parts[0], parts[-1]
+    stride = int(parts[1]) if len(parts) == 3 else 1
+
+    def index(text):
+        if text.startswith('('):
+            return int(min(max(round((float(text.strip('()')) - start) / step), 0), n - 1))
+        return int(text)
+    return np.arange(index(first), index(last) + 1, stride)
+
+
+def griddap_response(query):
+    # The .nc response of a griddap query analysed_sst[time][lat][lon]
+    subscripts = re.findall(r'\[([^\]]*)\]', unquote(query))
+    days = re.findall(r'\((\d{4}-\d{2}-\d{2})', subscripts[0])
+    days = np.arange(np.datetime64(days[0]), np.datetime64(days[-1]) + 1)
+    lat = MUR_LAT[0] + MUR_LAT[1] * _axis_index(subscripts[1], MUR_LAT)
+    lon = MUR_LON[0] + MUR_LON[1] * _axis_index(subscripts[2], MUR_LON)
+
+    size = 4 * len(days) * len(lat) * len(lon) + 8 * (len(lat) + len(lon)) + 4096
+    nc = Dataset('griddap.nc', 'w', format='NETCDF3_64BIT_OFFSET', memory=size)
+    nc.title = 'stand-in of jplMURSST41'
+    nc.createDimension('time', len(days))
+    nc.createDimension('latitude', len(lat))
+    nc.createDimension('longitude', len(lon))
+    time_var = nc.createVariable('time', 'f8', ('time',))
+    time_var.units = 'seconds since 1970-01-01T00:00:00Z'
+    seconds = (days - np.datetime64('1970-01-01')).astype('timedelta64[s]').astype(float)
+    time_var[:] = seconds + 9 * 3600
+    nc.createVariable('latitude', 'f4', ('latitude',))[:] = lat
+    nc.createVariable('longitude', 'f4', ('longitude',))[:] = lon
+    sst = nc.createVariable('analysed_sst', 'f4', ('time', 'latitude', 'longitude'),
+                            fill_value=np.float32(-999))
+    sst.units = 'degree_C'
+    for k, day in enumerate(days):
+        sst[k] = sst_field(lat, lon, (day - np.datetime64('2024-01-01')).astype(int))
+    return bytes(nc.close())
+
+
+@lru_cache(maxsize=8)
+def _rtghr_cached(date_str, shape):
+    return rtghr_grib(date_str, shape)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    # griddap queries under /griddap/, RTGHR files under /nsst.{yyyymmdd}/
+    latency = 0.0
+    rtghr_shape = RTGHR_SHAPE
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        path, _, query = self.path.partition('?')
+        if path.startswith('/griddap/'):
+            return griddap_response(query)
+        match = re.fullmatch(r'/nsst\.(\d{8})/' + re.escape(RTGHR_NAME), path)
+        if match:
+            return _rtghr_cached(match.group(1), self.rtghr_shape)
+        return None
+
+    def _reply(self, send_body):
+        time.sleep(self.latency)
+        body = self._body()
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.send_header('ETag', f'"{len(body):x}"')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(True)
+
+    def do_HEAD(self):
+        self._reply(False)
+
+
+def start_server(latency=0.0, rtghr_shape=RTGHR_SHAPE):
+    """
+    Start the stand-in HTTP server in a thread. Returns the server and its
+    base URL.
+    """
+    handler = type('Handler', (StandinHandler,), {'latency': latency,
+                                                   'rtghr_shape': tuple(rtghr_shape)})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
@@ -0,0 +1,374 @@
+"""
+This script computes the daily climatology of one product from its daily
+files ({prefix}_{yyyymmdd}.nc), and the anomalies of the daily files
+against it, without holding more than one tile of the grid in memory.
+
+The grid is cut into tiles of TILE points. Every tile keeps running
+accumulators for the 366 days of the year (count, mean and sum of
+squared deviations, updated with Welford's algorithm) in its own file in
+{prefix}_clim_tiles/, with the dates already added. The daily files are
+read in date order, once for a group of TILE_GROUP tiles of the same
+row, and the groups are processed in parallel (one process per group).
+The accumulators take 10 bytes (int16 count, float32 mean and M2) per
+grid point, day of the year and variable before compression, i.e. 60 MB
+per tile of 128 x 128 points and about 95 GB per variable for the
+3600 x 7200 grid of OSTIA; land points and short records compress well.
+A new run only adds the days that are
+not in the accumulators yet, so the climatology is kept up to date
+without reading the history again; a day that was added and then
+downloaded again is not added twice (its old values cannot be removed
+from the sums).
+
+The mean and standard deviation of every day of the year are written to
+{prefix}_clim.nc, where only the days of the year that changed are
+written again. The anomalies are written to {prefix}_anom_{yyyymmdd}.nc.
+The day of the year is counted on a 366-day year: 29 February is day 60
+and 1 March is always day 61.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import numpy as np
+from netCDF4 import Dataset
+
+from download_utils import daily_files
+from station_extract import grid_coordinates
+from regrid import time_variable, file_time
+
+# Tile size (lat, lon); the accumulators of one tile take about 3.7 kB per
+# point and variable in memory
+TILE = (128, 128)
+# Number of tiles of a row updated together (every daily file is opened
+# once per group)
+TILE_GROUP = 4
+# Compression level (0-9)
+COMPLEVEL = 4
+NDAYS = 366
+
+# Usage instructions
+USAGE = """
+Usage: python climatology.py prefix [directory] [var ...]
+       python climatology.py anomalies prefix [directory] [var ...]
+
+Arguments:
+  prefix        Product prefix, e.g. SST_OSTIA_0p05
+  directory     Directory of the daily files (optional, defaults to ./)
+  var           Variables (optional, defaults to all)
+  anomalies     Write the anomalies of the daily files against the climatology
+
+Example:
+  python climatology.py SST_OSTIA_0p05 ./ analysed_sst
+  python climatology.py anomalies SST_OSTIA_0p05 ./ analysed_sst
+"""
+
+
+def day_index(date_str):
+    # Day of the year (0-365) of yyyymmdd on a 366-day year
+    day = datetime.strptime(date_str, '%Y%m%d')
+    k = day.timetuple().tm_yday - 1
+    leap = day.year % 4 == 0 and (day.year % 100 != 0 or day.year % 400 == 0)
+    if not leap and k >= 59:
+        k += 1
+    return k
+
+
+def welford(count, mean, m2, x):
+    # Add the field x (NaN: no data) to the running count, mean and M2, in place
+    valid = np.isfinite(x)
+    count[valid] += 1
+    delta = np.where(valid, x - mean, 0.0)
+    mean += delta / np.maximum(count, 1)
+    m2 += delta * np.where(valid, x - mean, 0.0)
+
+
+def tiles(shape, tile=TILE):
+    # (j1, j2, i1, i2) of the tiles of a grid
+    return [(j1, min(j1 + tile[0], shape[0]), i1, min(i1 + tile[1], shape[1]))
+            for j1 in range(0, shape[0], tile[0]) for i1 in range(0, shape[1], tile[1])]
+
+
+def tile_groups(shape, tile=TILE, n=TILE_GROUP):
+    # Groups of at most n neighbouring tiles of the same row
+    groups = []
+    for t in tiles(shape, tile):
+        if groups and len(groups[-1]) < n and groups[-1][-1][0] == t[0]:
+            groups[-1].append(t)
+        else:
+            groups.append([t])
+    return groups
+
+
+def _load_tile(path, names, shape):
+    # Accumulators of one tile, empty if it has no file yet
+    if not os.path.isfile(path):
+        acc = {'dates': np.zeros(0, dtype=np.int64)}
+        for name in names:
+            acc[f"{name}_count"] = np.zeros(shape, dtype=np.int16)
+            acc[f"{name}_mean"] = np.zeros(shape, dtype=np.float32)
+            acc[f"{name}_m2"] = np.zeros(shape, dtype=np.float32)
+        return acc
+    with np.load(path) as cache:
+        acc = {key: cache[key] for key in cache.files}
+    # (files of older versions hold int32 and float64)
+    for name in names:
+        acc[f"{name}_count"] = acc[f"{name}_count"].astype(np.int16, copy=False)
+        for key in ('mean', 'm2'):
+            acc[f"{name}_{key}"] = acc[f"{name}_{key}"].astype(np.float32, copy=False)
+    return acc
+
+
+def update_tiles(group, files, names, tile_directory, written):
+    """
+    Add the daily files (date_str, path) that are not in the accumulators
+    yet to a group of tiles (j1, j2, i1, i2) of the same row, and save
+    them. Every daily file is opened once for the group. written is the
+    number of dates of every tile in the climatology file.
+
+    Returns, for every tile, the tile, the number of dates in its
+    accumulators and of dates added, and the mean and standard deviation
+    of the days of the year to write: the days that changed, or all of
+    them if the climatology file does not have the written dates of the
+    tile.
+    """
+    j1, j2 = group[0][0], group[0][1]
+    paths, accs, news = [], [], []
+    for (_, _, i1, i2), n in zip(group, written):
+        paths.append(os.path.join(tile_directory, f"tile_{j1}_{i1}.npz"))
+        accs.append(_load_tile(paths[-1], names, (NDAYS, j2 - j1, i2 - i1)))
+        done = set(accs[-1]['dates'].tolist())
+        news.append({date_str for date_str, p in files if int(date_str) not in done})
+
+    for date_str, p in files:
+        todo = [t for t, new in enumerate(news) if date_str in new]
+        if not todo:
+            continue
+        k = day_index(date_str)
+        i1, i2 = group[todo[0]][2], group[todo[-1]][3]
+        with Dataset(p) as nc:
+            for name in names:
+                field = nc.variables[name][0, j1:j2, i1:i2]
+                x = np.ma.filled(field.astype(np.float32), np.nan)
+                for t in todo:
+                    acc = accs[t]
+                    a, b = group[t][2] - i1, group[t][3] - i1
+                    welford(acc[f"{name}_count"][k], acc[f"{name}_mean"][k],
+                            acc[f"{name}_m2"][k], x[:, a:b])
+
+    results = []
+    for tile, path, acc, new, n in zip(group, paths, accs, news, written):
+        days = sorted({day_index(date_str) for date_str in new})
+        if len(acc['dates']) != n:
+            days = list(range(NDAYS))
+        if new:
+            acc['dates'] = np.sort(np.append(acc['dates'], [int(d) for d in new]))
+            tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp_path, **acc)
+            os.replace(tmp_path, path)
+
+        stats = {}
+        for name in names:
+            count = acc[f"{name}_count"][days]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(count > 0, acc[f"{name}_mean"][days], np.nan)
+                std = np.where(count > 1, np.sqrt(acc[f"{name}_m2"][days] / (count - 1)),
+                               np.nan)
+            stats[name] = (mean.astype(np.float32), std.astype(np.float32))
+        results.append((tile, len(acc['dates']), len(new), days, stats))
+    return results
+
+
+def _create_climatology(fout, src, names, lat, lon, tile, complevel=COMPLEVEL):
+    # Create an empty climatology file on the grid of the daily file src
+    with Dataset(fout, 'w', format='NETCDF4') as dst:
+        dst.title = f"{getattr(src, 'title', 'OceanData')} daily climatology"
+        dst.createDimension('dayofyear', NDAYS)
+        dst.createDimension('lat', len(lat))
+        dst.createDimension('lon', len(lon))
+        dst.createDimension('tile_lat', -(-len(lat) // tile[0]))
+        dst.createDimension('tile_lon', -(-len(lon) // tile[1]))
+        doy_var = dst.createVariable('dayofyear', np.int16, ('dayofyear',))
+        doy_var.description = 'day of the year on a 366-day year (29 February is day 60)'
+        lat_var = dst.createVariable('lat', np.float64, ('lat',))
+        lat_var.standard_name = 'latitude'
+        lat_var.units = 'degrees_north'
+        lon_var = dst.createVariable('lon', np.float64, ('lon',))
+        lon_var.standard_name = 'longitude'
+        lon_var.units = 'degrees_east'
+        days_var = dst.createVariable('tile_days', np.int32, ('tile_lat', 'tile_lon'),
+                                      fill_value=np.int32(0))
+        days_var.description = 'number of daily files in the climatology of every tile'
+        doy_var[:] = np.arange(1, NDAYS + 1)
+        lat_var[:] = lat
+        lon_var[:] = lon
+        chunksizes = (1, min(tile[0], len(lat)), min(tile[1], len(lon)))
+        for name in names:
+            attrs = {k: v for k, v in src.variables[name].__dict__.items()
+                     if k not in ('_FillValue', 'scale_factor', 'add_offset',
+                                  'valid_min', 'valid_max')}
+            for suffix, description in (('mean', 'mean'), ('std', 'standard deviation')):
+                var = dst.createVariable(f"{name}_{suffix}", np.float32,
+                                         ('dayofyear', 'lat', 'lon'),
+                                         zlib=complevel > 0, complevel=complevel,
+                                         chunksizes=chunksizes, fill_value=np.float32(np.nan))
+                var.setncatts(attrs)
+                var.description = f"daily climatology: {description}"
+
+
+def climatology(prefix, directory='./', names=None, workers=None, tile=TILE):
+    """
+    Add the new daily files of prefix in directory to the accumulators
+    and update {prefix}_clim.nc. Returns the path of the climatology.
+    """
+    files = daily_files(prefix, directory)
+    if not files:
+        raise ValueError(f"No {prefix} files in {directory}")
+
+    with Dataset(files[0][1]) as nc:
+        (ydim, lat), (xdim, lon) = grid_coordinates(nc)
+        if names is None:
+            names = [name for name, var in nc.variables.items()
+                     if var.dimensions[1:] == (ydim, xdim) and var.ndim == 3]
+        shape = (len(lat), len(lon))
+
+        # The accumulators only fit the grid, tiles and variables they were made with
+        tile_directory = os.path.join(directory, f"{prefix}_clim_tiles")
+        grid_path = os.path.join(tile_directory, 'grid.json')
+        grid = {'shape': list(shape), 'tile': list(tile), 'names': list(names)}
+        if os.path.isfile(grid_path):
+            with open(grid_path) as f:
+                if json.load(f) != grid:
+                    raise ValueError(f"{tile_directory} was made for another grid, tile size "
+                                     f"or variables, remove it to start again")
+        else:
+            os.makedirs(tile_directory, exist_ok=True)
+            with open(grid_path, 'w') as f:
+                json.dump(grid, f)
+
+        clim_path = os.path.join(directory, f"{prefix}_clim.nc")
+        if not os.path.isfile(clim_path):
+            print(f"---- Create {clim_path}")
+            _create_climatology(clim_path, nc, names, lat, lon, tile)
+
+    t0 = time.time()
+    todo = tile_groups(shape, tile)
+    ntiles = len(tiles(shape, tile))
+    added = 0
+    done = 0
+    with Dataset(clim_path, 'a') as clim, ProcessPoolExecutor(max_workers=workers) as pool:
+        tile_days = np.ma.filled(clim.variables['tile_days'][:], 0)
+        pending = set()
+        while todo or pending:
+            # At most two groups per worker at a time, so that the results
+            # waiting to be written stay small
+            while todo and len(pending) < 2 * (workers or os.cpu_count()):
+                group = todo.pop(0)
+                written = [int(tile_days[t[0] // tile[0], t[2] // tile[1]]) for t in group]
+                pending.add(pool.submit(update_tiles, group, files, names, tile_directory,
+                                        written))
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for (j1, j2, i1, i2), ndays, nnew, days, stats in future.result():
+                    for name, (mean, std) in stats.items():
+                        if len(days) == NDAYS:
+                            # All the days of the year in one write
+                            clim.variables[f"{name}_mean"][:, j1:j2, i1:i2] = mean
+                            clim.variables[f"{name}_std"][:, j1:j2, i1:i2] = std
+                            continue
+                        for k, day in enumerate(days):
+                            clim.variables[f"{name}_mean"][day, j1:j2, i1:i2] = mean[k]
+                            clim.variables[f"{name}_std"][day, j1:j2, i1:i2] = std[k]
+                    clim.variables['tile_days'][j1 // tile[0], i1 // tile[1]] = ndays
+                    added = max(added, nnew)
+                    done += 1
+                    if done % 100 == 0:
+                        print(f"---- {done} of {ntiles} tiles")
+    print(f"---- {ntiles} tiles, {added} new days in {time.time() - t0:.1f} s")
+
+    return clim_path
+
+
+def anomaly_file(date_str, path, names, clim_path, fout):
+    # Write the anomalies of one daily file against the climatology
+    k = day_index(date_str)
+    with Dataset(path) as src, Dataset(clim_path) as clim, \
+            Dataset(fout + '.part', 'w', format='NETCDF4') as dst:
+        dst.setncatts(src.__dict__)
+        dst.createDimension('time', None)
+        dst.createDimension('lat', len(clim.dimensions['lat']))
+        dst.createDimension('lon', len(clim.dimensions['lon']))
+        time_variable(dst, src)[:] = file_time(src, date_str)
+        for coord in ('lat', 'lon'):
+            var = dst.createVariable(coord, np.float64, (coord,))
+            var.setncatts(clim.variables[coord].__dict__)
+            var[:] = clim.variables[coord][:]
+        for name in names:
+            mean = clim.variables[f"{name}_mean"][k]
+            field = np.ma.filled(src.variables[name][0].astype(np.float32), np.nan)
+            var = dst.createVariable(name, np.float32, ('time', 'lat', 'lon'), zlib=COMPLEVEL > 0,
+                                     complevel=COMPLEVEL, fill_value=np.float32(np.nan))
+            var.setncatts({key: v for key, v in clim.variables[f"{name}_mean"].__dict__.items()
+                           if key != '_FillValue'})
+            var.description = 'anomaly against the daily climatology'
+            var[0] = field - np.ma.filled(mean, np.nan)
+        dst.history = f"anomalies of {src.filepath()} against {clim_path}"
+    os.replace(fout + '.part', fout)
+    return fout
+
+
+def anomalies(prefix, directory='./', names=None, workers=None):
+    """
+    Write the anomalies of the daily files of prefix in directory against
+    {prefix}_clim.nc into {prefix}_anom_{yyyymmdd}.nc, one process per
+    file. Files whose anomalies are newer than them are skipped. Returns
+    the number of files written.
+    """
+    clim_path = os.path.join(directory, f"{prefix}_clim.nc")
+    with Dataset(clim_path) as clim:
+        available = [name[:-5] for name in clim.variables if name.endswith('_mean')]
+    names = names or available
+
+    todo = []
+    for date_str, path in daily_files(prefix, directory):
+        fout = os.path.join(directory, f"{prefix}_anom_{date_str}.nc")
+        if not os.path.isfile(fout) or os.path.getmtime(fout) < os.path.getmtime(path):
+            todo.append((date_str, path, fout))
+    if not todo:
+        print(f"---- No new {prefix} files in {directory}")
+        return 0
+
+    t0 = time.time()
+    write = partial(anomaly_file, names=names, clim_path=clim_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write, date_str, path, fout=fout) for date_str, path, fout in todo]
+        for future in as_completed(futures):
+            future.result()
+    print(f"---- {len(todo)} anomaly files in {time.time() - t0:.1f} s")
+
+    return len(todo)
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    args = sys.argv[1:]
+    mode = args.pop(0) if args and args[0] == 'anomalies' else 'climatology'
+    if not args:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    prefix = args[0]
+    directory = args[1] if len(args) > 1 else './'
+    names = args[2:] or None
+
+    if mode == 'anomalies':
+        anomalies(prefix, directory, names)
+    else:
+        print(f"---- SAVE: {climatology(prefix, directory, names)}")
@@ -0,0 +1,330 @@
+"""
+Shared helpers for the CMEMS download scripts (SSH, SSS, OSTIA and SWH).
+
+The login is done once and stored by the Copernicus Marine library, so
+the get() calls of all the workers reuse the same credentials instead of
+authenticating for every date; the next runs reuse them too, as long as
+the user, the password and the stored credentials have not changed.
+
+The remote files are listed one month at a time and the listings are
+cached on disk (CACHE_DIRECTORY), so a backfill lists the dataset once
+per month instead of once per day, and a new run lists nothing. The
+listings are kept LISTING_TTL, or NRT_LISTING_TTL for the recent months
+of the near-real-time datasets, whose files are added and replaced every
+day; a date missing from a cached listing makes it listed again.
+
+With a region, a depth range or a list of variables, only that subset is
+downloaded: it is cut on the server by subset() instead of get() fetching
+the whole global file.
+
+https://pypi.org/project/copernicusmarine/
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import csv
+import json
+import time
+import fnmatch
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import copernicusmarine
+
+from download_utils import Metrics, NotPublished, file_size
+
+
+# Directory of the cached listings and login (as station_info.CACHE_DIRECTORY,
+# without importing numpy and scipy)
+CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'oceandata')
+# Credentials stored by copernicusmarine.login()
+CREDENTIALS_FILE = os.path.join(os.path.expanduser('~'), '.copernicusmarine',
+                                '.copernicusmarine-credentials')
+# Lifetime (s) of a cached listing, and of a listing of the last
+# NRT_DAYS of a near-real-time dataset
+LISTING_TTL = 30 * 86400
+NRT_LISTING_TTL = 3 * 3600
+NRT_DAYS = 30
+# Minimum age (s) of a cached listing before a date missing from it
+# makes it listed again
+MIN_REFRESH = 900
+
+# Logins already done by this process (see _credentials())
+_logged_in = set()
+_listing_lock = threading.Lock()
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _login_key(user, pswd, salt):
+    # Salted hash of the credentials, so the password is not stored
+    return hashlib.pbkdf2_hmac('sha256', f"{user}:{pswd}".encode(), bytes.fromhex(salt),
+                               100000).hex()
+
+
+def _credentials(user, pswd):
+    # Everything a login depends on: the user, the password and the
+    # credentials file (path and modification time)
+    mtime = os.path.getmtime(CREDENTIALS_FILE) if os.path.isfile(CREDENTIALS_FILE) else None
+    return user, pswd, CREDENTIALS_FILE, mtime
+
+
+def login(user, pswd):
+    """
+    Log in once and store the credentials for the following get() calls.
+    The login of a previous run is reused if it was done with the same
+    credentials and the stored credentials have not changed since.
+    """
+    if _credentials(user, pswd) in _logged_in:
+        return
+    record_path = os.path.join(CACHE_DIRECTORY, 'cmems_login.json')
+    record = _read_json(record_path)
+    if (record and os.path.isfile(CREDENTIALS_FILE)
+            and record.get('path') == CREDENTIALS_FILE
+            and record.get('mtime') == os.path.getmtime(CREDENTIALS_FILE)
+            and record.get('key') == _login_key(user, pswd, record['salt'])):
+        _logged_in.add(_credentials(user, pswd))
+        return
+
+    copernicusmarine.login(
+        username=user,
+        password=pswd,
+        overwrite_configuration_file=True)
+    _logged_in.add(_credentials(user, pswd))
+    if os.path.isfile(CREDENTIALS_FILE):
+        salt = os.urandom(16).hex()
+        _write_json(record_path, {'salt': salt, 'key': _login_key(user, pswd, salt),
+                                  'path': CREDENTIALS_FILE,
+                                  'mtime': os.path.getmtime(CREDENTIALS_FILE)})
+
+
+def list_files(dataset_id, date_range, list_name, output_directory="./"):
+    """
+    List the remote files matching date_range without downloading them.
+
+    Returns one dict per file with its name, size, last-modified time and
+    ETag, read from the file list written by get(create_file_list=...).
+    """
+    copernicusmarine.get(
+        dataset_id=dataset_id,
+        output_directory=output_directory,
+        filter=date_range,
+        create_file_list=list_name)
+
+    list_path = os.path.join(output_directory, list_name)
+    files = []
+    if not os.path.isfile(list_path):
+        return files
+    with open(list_path, newline='') as f:
+        for row in csv.DictReader(f):
+            files.append({
+                'filename': os.path.basename(row['filename']),
+                'size': int(row['size']),
+                'last_modified': row['last_modified_datetime'],
+                'etag': row['etag'],
+            })
+    os.remove(list_path)
+
+    return files
+
+
+def listing_ttl(dataset_id, date_str):
+    # Lifetime (s) of the cached listing of the month of date_str
+    month_end = (datetime.strptime(date_str[:6], '%Y%m') + timedelta(days=31)).replace(day=1)
+    if 'nrt' in dataset_id.lower() and month_end > datetime.now() - timedelta(days=NRT_DAYS):
+        return NRT_LISTING_TTL
+    return LISTING_TTL
+
+
+def date_files(dataset_id, file_filter, date_str, output_directory="./",
+               cache_directory=CACHE_DIRECTORY):
+    """
+    The remote files of one date (see list_files()), found in the cached
+    listing of its month. The month is listed if it has no listing yet,
+    if its listing is older than listing_ttl(), or if the date is missing
+    from a listing older than MIN_REFRESH (it may have been published since).
+    """
+    yyyy, mm = date_str[:4], date_str[4:6]
+    month_filter = file_filter.format(yyyy=yyyy, mm=mm, dd='*', yyyymmdd=f"{yyyy}{mm}*")
+    name_filter = file_filter.format(yyyy=yyyy, mm=mm, dd=date_str[6:8],
+                                     yyyymmdd=date_str).rsplit('/', 1)[-1]
+    key = hashlib.sha1(f"{dataset_id}|{month_filter}".encode()).hexdigest()[:16]
+    cache_path = os.path.join(cache_directory, f"cmems_list_{key}.json")
+
+    # One listing at a time, so the workers of a month share it
+    with _listing_lock:
+        cached = _read_json(cache_path)
+        age = time.time() - cached['time'] if cached else None
+        if cached is not None and age < listing_ttl(dataset_id, date_str):
+            files = [f for f in cached['files'] if fnmatch.fnmatch(f['filename'], name_filter)]
+            if files or age < MIN_REFRESH:
+                return files
+
+        listing = list_files(dataset_id, month_filter,
+                             f".cmems_{key}_{os.getpid()}_files.csv", output_directory)
+        _write_json(cache_path, {'time': time.time(), 'dataset_id': dataset_id,
+                                 'filter': month_filter, 'files': listing})
+    return [f for f in listing if fnmatch.fnmatch(f['filename'], name_filter)]
+
+
+def subset_request(lon_limits=None, lat_limits=None, depth_limits=None, variables=None):
+    """
+    Keyword arguments of copernicusmarine.subset() for a region, a depth
+    range and a list of variables (None: all). Returns None if nothing is
+    cut, i.e. the whole file is downloaded.
+    """
+    request = {}
+    if variables:
+        request['variables'] = list(variables)
+    if lon_limits is not None:
+        request['minimum_longitude'] = lon_limits[0]
+        request['maximum_longitude'] = lon_limits[1]
+    if lat_limits is not None:
+        request['minimum_latitude'] = lat_limits[0]
+        request['maximum_latitude'] = lat_limits[1]
+    if depth_limits is not None:
+        request['minimum_depth'] = depth_limits[0]
+        request['maximum_depth'] = depth_limits[1]
+    return request or None
+
+
+def subset_data(dataset_id, prefix, date_str, subset, output_directory="./",
+                manifest=None, metrics=None, file_filter=None):
+    """
+    Download the subset of one date, cut on the server, to
+    {prefix}_{yyyymmdd}.nc. subset is the request made by subset_request().
+
+    The subset is built on request, so the server is not asked for its
+    metadata: with a download_utils.Manifest, the date is skipped (None is
+    returned) if its file was downloaded with the same request.
+
+    With the file_filter of the dataset (see download_data()), the date is
+    first looked up in the cached listing of its month, and
+    download_utils.NotPublished is raised if the dataset has no file for
+    it, instead of asking subset() for a date out of its time range.
+    """
+    metrics = metrics or Metrics()
+    output_file = f"{prefix}_{date_str}.nc"
+    output_path = os.path.join(output_directory, output_file)
+    source = f"{dataset_id}?" + '&'.join(f"{key}={value}" for key, value in sorted(subset.items()))
+    if manifest is not None and manifest.is_current(output_file, source):
+        return None
+    if file_filter is not None:
+        with metrics.stage(date_str, 'list'):
+            listing = date_files(dataset_id, file_filter, date_str, output_directory)
+        if not listing:
+            raise NotPublished(f"No file of {dataset_id} for {date_str}")
+
+    day = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
+    tmp_name = f".{prefix}_{date_str}_subset.nc"
+    with metrics.stage(date_str, 'download'):
+        copernicusmarine.subset(
+            dataset_id=dataset_id,
+            start_datetime=f"{day}T00:00:00",
+            end_datetime=f"{day}T23:59:59",
+            output_directory=output_directory,
+            output_filename=tmp_name,
+            force_download=True,
+            overwrite_output_data=True,
+            **subset)
+
+    tmp_path = os.path.join(output_directory, tmp_name)
+    metrics.add(date_str, 'bytes', file_size(tmp_path))
+    with metrics.stage(date_str, 'rename'):
+        os.replace(tmp_path, output_path)
+
+    if manifest is not None:
+        with metrics.stage(date_str, 'manifest'):
+            manifest.update(output_file, date_str, source)
+
+    return output_path
+
+
+def download_data(dataset_id, prefix, date_str, file_filter, output_directory="./",
+                  manifest=None, metrics=None, subset=None):
+    """
+    Download the file of one date and rename it to {prefix}_{yyyymmdd}.nc.
+
+    file_filter is the filename pattern of the dataset, with the fields
+    {yyyy}, {mm}, {dd} and {yyyymmdd} filled in from date_str. With a
+    subset request (subset_request()), only the subset is downloaded, by
+    subset_data().
+
+    With a download_utils.Manifest, the remote file is looked up first in
+    the cached listing of its month (date_files()), and the download is
+    skipped (None is returned) if the local file was downloaded from the
+    same remote file and it has not changed since.
+
+    Raises download_utils.NotPublished if the dataset has no file for the
+    date, found in the listing without a download request.
+
+    With a download_utils.Metrics, the list, download, rename and
+    manifest stages and the bytes received are recorded for date_str.
+    """
+    if subset:
+        return subset_data(dataset_id, prefix, date_str, subset, output_directory,
+                           manifest=manifest, metrics=metrics, file_filter=file_filter)
+
+    metrics = metrics or Metrics()
+    output_file = f"{prefix}_{date_str}.nc"
+    output_path = os.path.join(output_directory, output_file)
+
+    # Define date range
+    date_range = file_filter.format(yyyy=date_str[:4], mm=date_str[4:6],
+                                    dd=date_str[6:8], yyyymmdd=date_str)
+
+    # Check the remote file against the manifest
+    remote = None
+    if manifest is not None:
+        with metrics.stage(date_str, 'list'):
+            listing = date_files(dataset_id, file_filter, date_str, output_directory)
+        if not listing:
+            raise NotPublished(f"No file of {dataset_id} for {date_str}")
+        if len(listing) == 1:
+            remote = listing[0]
+            if manifest.is_current(output_file, remote['filename'], remote):
+                return None
+
+    # Call the get function with the stored credentials
+    # (force_download only skips the confirmation prompt)
+    with metrics.stage(date_str, 'download'):
+        download_file = copernicusmarine.get(
+            dataset_id=dataset_id,
+            output_directory=output_directory,
+            filter=date_range,
+            no_directories=True,
+            force_download=True,
+            overwrite_output_data=True)
+
+    if not download_file:
+        raise NotPublished(f"No file of {dataset_id} for {date_str}")
+
+    # Rename the output
+    original_path = download_file[0]
+    metrics.add(date_str, 'bytes', file_size(original_path))
+    with metrics.stage(date_str, 'rename'):
+        os.rename(original_path, output_path)
+
+    if manifest is not None:
+        source = remote['filename'] if remote else os.path.basename(original_path)
+        with metrics.stage(date_str, 'manifest'):
+            manifest.update(output_file, date_str, source, remote)
+
+    return output_path
@@ -0,0 +1,199 @@
+"""
+A lazy view of the daily files of one product ({prefix}_{yyyymmdd}.nc) as
+one time x lat x lon array, indexed by date.
+
+Nothing is read until the view is sliced, and then only the chunks of
+the files that are needed: every day is cut into tiles of 256 x 256
+points, and each tile is read as one hyperslab. The open files and the
+decoded tiles are kept in two LRU caches, the tiles up to a memory cap, so
+slicing the same region again (e.g. a subregion over a month, then the
+next month) opens and reads as little as possible.
+
+    view = DailyView('SST_OSTIA_0p05', './')
+    sst = view['20240301':'20240331', 1000:1200, 2000:2400]
+    sst = view.sel(('20240301', '20240331'), lon=(-72, -66), lat=(38, 44))
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from netCDF4 import Dataset
+
+from download_utils import daily_files
+from geo_utils import lon_180
+from station_extract import grid_coordinates
+
+# Tile size (lat, lon) of the chunk cache
+TILE = (256, 256)
+# Number of open files and memory (bytes) of the decoded tiles
+MAX_HANDLES = 32
+CACHE_BYTES = 512 * 1024 ** 2
+
+
+class DailyView:
+    """
+    The daily files of prefix in directory as a lazy (time, lat, lon)
+    array of the variable name (by default the first variable on the
+    grid). view[t, j, i] returns a float array, with NaN where there is
+    no data; t may be an index, a slice, a list of indices, a date
+    'yyyymmdd' or a slice of dates (both ends included), and j and i an
+    index, a slice or a list of indices.
+    """
+
+    def __init__(self, prefix, directory='./', name=None, max_handles=MAX_HANDLES,
+                 cache_bytes=CACHE_BYTES, tile=TILE):
+        files = daily_files(prefix, directory)
+        if not files:
+            raise ValueError(f"No {prefix} files in {directory}")
+        self.dates = [date_str for date_str, path in files]
+        self.paths = [path for date_str, path in files]
+        self.max_handles = max_handles
+        self.cache_bytes = cache_bytes
+        self.tile = tile
+        self.handles = OrderedDict()
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        self.reads = 0
+
+        nc = self._open(0)
+        (ydim, self.lat), (xdim, self.lon) = grid_coordinates(nc)
+        if name is None:
+            name = [n for n, var in nc.variables.items()
+                    if var.ndim == 3 and var.dimensions[1:] == (ydim, xdim)][0]
+        self.name = name
+        self.shape = (len(self.paths), len(self.lat), len(self.lon))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def close(self):
+        # Close the open files and drop the cached tiles
+        for nc in self.handles.values():
+            nc.close()
+        self.handles.clear()
+        self.tiles.clear()
+        self.nbytes = 0
+
+    def _open(self, k):
+        # Open file k, keeping the max_handles most recently used files open
+        if k in self.handles:
+            self.handles.move_to_end(k)
+            return self.handles[k]
+        nc = Dataset(self.paths[k])
+        self.handles[k] = nc
+        while len(self.handles) > self.max_handles:
+            self.handles.popitem(last=False)[1].close()
+        return nc
+
+    def _tile(self, k, tj, ti):
+        # Tile (tj, ti) of day k, from the cache or read as one hyperslab
+        key = (k, tj, ti)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        j1, i1 = tj * self.tile[0], ti * self.tile[1]
+        var = self._open(k).variables[self.name]
+        data = var[0, j1:j1 + self.tile[0], i1:i1 + self.tile[1]]
+        data = np.ma.filled(np.ma.asarray(data).astype(np.float64), np.nan)
+        self.reads += 1
+        self.tiles[key] = data
+        self.nbytes += data.nbytes
+        while self.nbytes > self.cache_bytes and len(self.tiles) > 1:
+            self.nbytes -= self.tiles.popitem(last=False)[1].nbytes
+        return data
+
+    def _time_index(self, key):
+        # Indices of the days selected by key
+        if isinstance(key, str):
+            return [self.dates.index(key)]
+        if isinstance(key, slice) and (isinstance(key.start, str) or isinstance(key.stop, str)):
+            start = key.start or self.dates[0]
+            stop = key.stop or self.dates[-1]
+            index = [k for k, d in enumerate(self.dates) if start <= d <= stop]
+            return index[::key.step or 1]
+        if isinstance(key, slice):
+            return list(range(*key.indices(self.shape[0])))
+        if np.ndim(key) == 0:
+            return [range(self.shape[0])[key]]
+        return [range(self.shape[0])[k] for k in key]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        days = self._time_index(key[0])
+        squeeze = [np.ndim(key[0]) == 0 and not isinstance(key[0], slice)]
+        ranges = []
+        for axis, k in zip((1, 2), key[1:]):
+            if isinstance(k, slice):
+                ranges.append(range(*k.indices(self.shape[axis])))
+                squeeze.append(False)
+            elif np.ndim(k) == 1:
+                ranges.append([range(self.shape[axis])[x] for x in k])
+                squeeze.append(False)
+            else:
+                k = range(self.shape[axis])[k]
+                ranges.append(range(k, k + 1))
+                squeeze.append(True)
+        rows, cols = ranges
+
+        out = np.full((len(days), len(rows), len(cols)), np.nan)
+        if len(rows) and len(cols):
+            rows_index = np.asarray(rows)
+            cols_index = np.asarray(cols)
+            tile_rows = rows_index // self.tile[0]
+            tile_cols = cols_index // self.tile[1]
+            for n, k in enumerate(days):
+                for tj in np.unique(tile_rows):
+                    jj = np.flatnonzero(tile_rows == tj)
+                    for ti in np.unique(tile_cols):
+                        ii = np.flatnonzero(tile_cols == ti)
+                        data = self._tile(k, tj, ti)
+                        out[n, jj[:, None], ii] = data[
+                            (rows_index[jj] - tj * self.tile[0])[:, None],
+                            cols_index[ii] - ti * self.tile[1]]
+
+        return out.squeeze(axis=tuple(a for a, s in enumerate(squeeze) if s))
+
+    def sel(self, dates=None, lon=None, lat=None):
+        """
+        Slice by value: dates is a (first, last) pair of 'yyyymmdd', lon and
+        lat are (min, max) pairs. lon may be in any convention and cross 180
+        (e.g. (170, -170)), the columns are then returned from west to east.
+        Returns the data and its lon and lat.
+        """
+        def axis_slice(axis, lims):
+            if lims is None:
+                return slice(None)
+            index = np.flatnonzero((axis >= lims[0]) & (axis <= lims[1]))
+            if len(index) == 0:
+                return slice(0, 0)
+            return slice(index[0], index[-1] + 1)
+
+        def lon_index(lims):
+            # Columns in the lon range, by their distance east of its west end
+            if lims is None or lims[1] - lims[0] >= 360:
+                return slice(None)
+            x1, x2 = lon_180(lims)
+            east = (lon_180(self.lon) - x1) % 360
+            index = np.flatnonzero(east <= (x2 - x1) % 360)
+            index = index[np.argsort(east[index], kind='stable')]
+            if len(index) == 0:
+                return slice(0, 0)
+            if np.all(np.diff(index) == 1):
+                return slice(index[0], index[-1] + 1)
+            return index
+
+        t = slice(*dates) if dates is not None else slice(None)
+        j = axis_slice(self.lat, lat)
+        i = lon_index(lon)
+        return self[t, j, i], self.lon[i], self.lat[j]
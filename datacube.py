@@ -0,0 +1,299 @@
+"""
+This script builds a time-series datacube from the daily files of one
+product ({prefix}_{yyyymmdd}.nc, as written by the download_*.py scripts).
+
+Every daily file is appended into {prefix}_cube.nc, a NetCDF4 file with an
+unlimited time dimension. The variables are compressed and chunked along
+time (64 days x 32 x 32 points by default), so the whole time series of
+one location is read from a few chunks instead of thousands of files.
+
+The time axis has a fixed step, the cadence of the product (1 day, or 7
+days for the weekly SSS), so every date has its own slot. A day that is
+downloaded again is written into the same slot, and only the files
+modified since they were ingested are read on the next run. Dates before
+the start of the cube (a backfill) are added by rebuilding the cube with
+empty slots before its first one.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from netCDF4 import Dataset
+
+from download_utils import daily_files
+from products import product_step
+
+# Time chunk and spatial chunk sizes of the cube
+CHUNKS = (64, 32, 32)
+# Compression level (0-9)
+COMPLEVEL = 4
+# Number of days read into memory and written at once
+BATCH_DAYS = 16
+
+TIME_UNITS = 'days since 1970-01-01 00:00:00'
+EPOCH = datetime(1970, 1, 1)
+
+# Usage instructions
+USAGE = """
+Usage: python datacube.py prefix [directory] [cube]
+
+Arguments:
+  prefix        Product prefix, e.g. SST_OSTIA_0p05
+  directory     Directory of the daily files (optional, defaults to ./)
+  cube          Datacube file (optional, defaults to directory/prefix_cube.nc)
+
+Example:
+  python datacube.py SST_OSTIA_0p05 ./
+"""
+
+
+def data_variables(nc):
+    # Variables with a time dimension followed by two spatial dimensions
+    return [name for name, var in nc.variables.items()
+            if var.ndim == 3 and var.dimensions[0] == 'time']
+
+
+def create_cube(cube_path, template_path, start_date, step, chunks=CHUNKS,
+                complevel=COMPLEVEL):
+    """
+    Create an empty datacube with the grid and variables of one daily file.
+    start_date (yyyymmdd) and step (days) define the time axis.
+    """
+    with Dataset(template_path) as src, Dataset(cube_path, 'w', format='NETCDF4') as dst:
+        src.set_auto_maskandscale(False)
+        dst.set_auto_maskandscale(False)
+
+        names = data_variables(src)
+        ydim, xdim = src.variables[names[0]].dimensions[1:]
+        ny = len(src.dimensions[ydim])
+        nx = len(src.dimensions[xdim])
+
+        dst.title = f"{getattr(src, 'title', 'OceanData')} datacube"
+        dst.start_date = start_date
+        dst.time_step_days = np.int32(step)
+        dst.createDimension('time', None)
+        dst.createDimension(ydim, ny)
+        dst.createDimension(xdim, nx)
+
+        time_var = dst.createVariable('time', np.float64, ('time',))
+        time_var.long_name = 'time'
+        time_var.units = TIME_UNITS
+        ingest_var = dst.createVariable('ingest_time', np.float64, ('time',),
+                                        fill_value=-1.0)
+        ingest_var.description = 'modification time (POSIX) of the ingested daily file'
+
+        # Coordinates
+        for name, var_in in src.variables.items():
+            if name in names or not var_in.dimensions:
+                continue
+            if not set(var_in.dimensions) <= {ydim, xdim}:
+                continue
+            attrs = var_in.__dict__
+            fill_value = attrs.pop('_FillValue', None)
+            var_out = dst.createVariable(name, var_in.dtype, var_in.dimensions,
+                                         zlib=complevel > 0, complevel=complevel,
+                                         fill_value=fill_value)
+            var_out.setncatts(attrs)
+            var_out[:] = var_in[:]
+
+        # Data, chunked for time-series reads
+        chunksizes = (chunks[0], min(chunks[1], ny), min(chunks[2], nx))
+        for name in names:
+            var_in = src.variables[name]
+            attrs = var_in.__dict__
+            fill_value = attrs.pop('_FillValue', None)
+            var_out = dst.createVariable(name, var_in.dtype, ('time', ydim, xdim),
+                                         zlib=complevel > 0, complevel=complevel,
+                                         chunksizes=chunksizes, fill_value=fill_value)
+            var_out.setncatts(attrs)
+
+
+def prepend_slots(cube_path, n, batch_days=BATCH_DAYS):
+    """
+    Rebuild the datacube with n empty slots before its first one, so that
+    dates before its start date can be ingested. The cube is copied into
+    a temporary file, which replaces it at the end.
+    """
+    tmp_path = cube_path + '.tmp'
+    with Dataset(cube_path) as src, Dataset(tmp_path, 'w', format='NETCDF4') as dst:
+        src.set_auto_maskandscale(False)
+        dst.set_auto_maskandscale(False)
+
+        step = int(src.time_step_days)
+        start = datetime.strptime(src.start_date, '%Y%m%d') - timedelta(days=n * step)
+        dst.setncatts(src.__dict__)
+        dst.start_date = start.strftime('%Y%m%d')
+        for name, dim in src.dimensions.items():
+            dst.createDimension(name, None if dim.isunlimited() else len(dim))
+
+        for name, var_in in src.variables.items():
+            attrs = var_in.__dict__
+            fill_value = attrs.pop('_FillValue', None)
+            filters = var_in.filters()
+            chunking = var_in.chunking()
+            var_out = dst.createVariable(name, var_in.dtype, var_in.dimensions,
+                                         zlib=filters['zlib'], complevel=filters['complevel'],
+                                         shuffle=filters['shuffle'],
+                                         chunksizes=None if chunking == 'contiguous' else chunking,
+                                         fill_value=fill_value)
+            var_out.setncatts(attrs)
+            if 'time' not in var_in.dimensions:
+                var_out[:] = var_in[:]
+
+        # Time axis, then the slots of the old cube shifted by n
+        nt = len(src.dimensions['time'])
+        days = (start - EPOCH).days + step * np.arange(nt + n)
+        dst.variables['time'][:] = days.astype(np.float64)
+        for name in data_variables(src) + ['ingest_time']:
+            for k1 in range(0, nt, batch_days):
+                k2 = min(k1 + batch_days, nt)
+                dst.variables[name][n + k1:n + k2] = src.variables[name][k1:k2]
+
+    os.replace(tmp_path, cube_path)
+
+
+def _blocks(slots, n):
+    # Group (index, ...) items into runs of at most n consecutive indices
+    blocks = []
+    for slot in slots:
+        if blocks and len(blocks[-1]) < n and blocks[-1][-1][0] + 1 == slot[0]:
+            blocks[-1].append(slot)
+        else:
+            blocks.append([slot])
+    return blocks
+
+
+def ingest(prefix, directory='./', cube_path=None, step=None, batch_days=BATCH_DAYS):
+    """
+    Append the daily files of prefix in directory into the datacube.
+
+    Files already ingested and not modified since are skipped, and a file
+    that was downloaded again overwrites its own time slot. step is the
+    time step in days of a new cube; by default it is the cadence of the
+    product. Files dated before the start of the cube make it rebuilt
+    with the slots they need. Returns the number of days written.
+    """
+    if cube_path is None:
+        cube_path = os.path.join(directory, f"{prefix}_cube.nc")
+
+    files = daily_files(prefix, directory)
+    if not files:
+        print(f"---- No {prefix} files in {directory}")
+        return 0
+
+    if not os.path.isfile(cube_path):
+        if step is None:
+            step = product_step(prefix)
+        print(f"---- Create {cube_path}")
+        create_cube(cube_path, files[0][1], files[0][0], step)
+    else:
+        # Backfill: slots needed before the start of the cube
+        with Dataset(cube_path) as nc:
+            start = datetime.strptime(nc.start_date, '%Y%m%d')
+            step = int(nc.time_step_days)
+        days = [(start - datetime.strptime(date_str, '%Y%m%d')).days for date_str, path in files]
+        n = max([day // step for day in days if day > 0 and day % step == 0], default=0)
+        if n > 0:
+            print(f"     Files before the start of the cube ({start:%Y%m%d}), "
+                  f"rebuild it with {n} slots more.")
+            prepend_slots(cube_path, n, batch_days)
+
+    t0 = time.time()
+    with Dataset(cube_path, 'a') as nc:
+        nc.set_auto_maskandscale(False)
+        start = datetime.strptime(nc.start_date, '%Y%m%d')
+        step = int(nc.time_step_days)
+        names = data_variables(nc)
+        ingested = nc.variables['ingest_time'][:]
+
+        # Files that are new or modified since they were ingested
+        slots = []
+        for date_str, path in files:
+            k, r = divmod((datetime.strptime(date_str, '%Y%m%d') - start).days, step)
+            if k < 0 or r != 0:
+                print(f"     {date_str} is not on the time axis of the cube, skipped.")
+                continue
+            mtime = os.path.getmtime(path)
+            if k < len(ingested) and ingested[k] >= mtime:
+                continue
+            slots.append((k, path, mtime))
+
+        for block in _blocks(slots, batch_days):
+            k1 = block[0][0]
+            k2 = block[-1][0] + 1
+            print(f"---- Ingest {len(block)} days into slots {k1} to {k2 - 1}")
+
+            # Time axis, including the slots of any gap before this block
+            nt = len(nc.dimensions['time'])
+            if k2 > nt:
+                days = (start - EPOCH).days + step * np.arange(nt, k2)
+                nc.variables['time'][nt:k2] = days.astype(np.float64)
+
+            for name in names:
+                data = []
+                for k, path, mtime in block:
+                    with Dataset(path) as src:
+                        src.set_auto_maskandscale(False)
+                        data.append(src.variables[name][0])
+                nc.variables[name][k1:k2] = np.stack(data)
+            nc.variables['ingest_time'][k1:k2] = [mtime for k, path, mtime in block]
+
+    print(f"---- {len(slots)} days ingested in {time.time() - t0:.1f} s")
+
+    return len(slots)
+
+
+def nearest_point(nc, ydim, xdim, lon, lat):
+    # Indices of the grid point nearest to (lon, lat), longitude in any convention
+    lat_name, lon_name = [
+        [name for name, v in nc.variables.items()
+         if name.lower().startswith(key) and set(v.dimensions) <= {ydim, xdim}][0]
+        for key in ('lat', 'lon')]
+    lat_grid = nc.variables[lat_name][:]
+    lon_grid = nc.variables[lon_name][:]
+    dlon = (lon_grid - lon + 180) % 360 - 180
+    if lat_grid.ndim == 1:
+        return np.argmin(np.abs(lat_grid - lat)), np.argmin(np.abs(dlon))
+    dist = (lat_grid - lat) ** 2 + dlon ** 2
+    return np.unravel_index(np.argmin(dist), dist.shape)
+
+
+def read_point(cube_path, name, lon, lat, tlims=None):
+    """
+    Read the time series of variable name at the grid point nearest to
+    (lon, lat). tlims is an optional [start, end] pair of datetimes.
+
+    Returns the times (datetime) and the values (masked array).
+    """
+    with Dataset(cube_path) as nc:
+        var = nc.variables[name]
+        j, i = nearest_point(nc, *var.dimensions[1:], lon, lat)
+
+        days = nc.variables['time'][:]
+        k1, k2 = 0, len(days)
+        if tlims is not None:
+            k1 = np.searchsorted(days, (tlims[0] - EPOCH).total_seconds() / 86400, side='left')
+            k2 = np.searchsorted(days, (tlims[1] - EPOCH).total_seconds() / 86400, side='right')
+        values = var[k1:k2, j, i]
+
+    times = [EPOCH + timedelta(days=float(d)) for d in days[k1:k2]]
+    return times, values
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    prefix = sys.argv[1]
+    directory = sys.argv[2] if len(sys.argv) > 2 else './'
+    cube_path = sys.argv[3] if len(sys.argv) > 3 else None
+
+    ingest(prefix, directory, cube_path)
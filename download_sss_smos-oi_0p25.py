@@ -25,93 +25,111 @@ Siqi Li, SMAST
 2024-03-04
 """
 
-import sys
 import os
+import sys
 from datetime import datetime, timedelta
 
-import copernicusmarine
+from download_utils import date_list, run_dates, read_summary, Manifest, Metrics, SUMMARY_NAME
+import cmems_utils
 
 # Settings
 user = "***"
 pswd = "***"
 output_directory = './'
+# Number of dates downloaded in parallel (1: one date at a time)
+workers = 1
+# Skip the dates whose files are already downloaded and unchanged
+incremental = True
+# Region, depth range and variables (None: the whole global file), e.g.
+# lon_limits = [-77.97, -56.85], lat_limits = [31.84, 46.15]; with any of
+# them set, only that subset is downloaded, cut on the server
+lon_limits = None
+lat_limits = None
+depth_limits = None
+variables = None
+# Metrics of the run are appended to download_metrics.jsonl in the output
+# directory; they are also written to this Prometheus textfile (None: off)
+prometheus_textfile = None
 
 prefix = "SSS_SMOS-OI_0p25"
 
 # Dataset information
 dataset_id = "cmems_obs-mob_glo_phy-sss_my_multi-oi_P1W"
+# Filename pattern of one date in the dataset
+file_filter = "*/{yyyy}/*_{yyyymmdd}T000000_*.nc"
 
 # Usage instructions
 USAGE = """
 Usage: python download_sss_data.py [start_date] [end_date]
        python download_sss_data.py [date]
+       python download_sss_data.py [summary]
        python download_sss_data.py
 
 Arguments:
   start_date    Start date in yyyymmdd format
   end_date      End date in yyyymmdd format (optional, defaults to start_date)
   date          Single date in yyyymmdd format (optional, defaults to current date)
+  summary       Summary of a previous run (download_summary_*.json): its failed
+                and unpublished dates are downloaded again
 
 Example:
   python download_sss_data.py 20220101 20220105
 """
 
-# Parse command-line arguments
-if len(sys.argv) == 3:
-    start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
-    end_date = datetime.strptime(sys.argv[2], "%Y%m%d")
-elif len(sys.argv) == 2:
-    start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
-    end_date = start_date
-elif len(sys.argv) == 1:
-    current_date = datetime.now()
-    start_date = current_date
-    end_date = current_date
-else:
-    print("Invalid input format.")
-    print(USAGE)
-    sys.exit()
-
-# Modify the starting and ending time
-start_date -= timedelta(days = start_date.weekday())
-end_date   -= timedelta(days = end_date.weekday())
-
-def download_data(user, pswd, dataset_id, prefix, date_str, output_directory="./"):
-    # Define date range
-    date_range = f"*/{date_str[:4]}/*_{date_str}T000000_*.nc"
-
-    # Call the get function for each dataset to save files for the date range
-    download_file = copernicusmarine.get(
-        username=user,
-        password=pswd,
-        dataset_id=dataset_id,
-        output_directory=output_directory,
-        filter=date_range,
-        no_directories=True,
-        force_download=True,
-        overwrite_output_data=True)
-
-    # Rename the output
-    original_path = download_file[0]
-    output_file = f"{prefix}_{date_str}.nc"
-    output_path = os.path.join(output_directory, output_file)
-    os.rename(original_path, output_path)
-
-    return
-
-
-current_date = start_date
-print(current_date.strftime('%Y%m%d'))
-while current_date <= end_date:
-    # Format the date in yyyymmdd
-    formatted_date = current_date.strftime('%Y%m%d')
-
-    # Download the data for one day
-    print(f"----Processing data for {formatted_date}")
-    download_data(user, pswd, dataset_id, prefix, formatted_date, output_directory=output_directory)
-    print("     Data download completed.")
-    print()
-
-    # Advance the day
-    current_date += timedelta(days = 7)
-
+def main(start_date, end_date, dates=None):
+    """
+    Download the data from start_date to end_date (datetime), or of the
+    dates (yyyymmdd) if given. Returns the number of files, the bytes and
+    the seconds of the run.
+    """
+    if dates is None:
+        # Modify the starting and ending time
+        start_date -= timedelta(days = start_date.weekday())
+        end_date   -= timedelta(days = end_date.weekday())
+        dates = date_list(start_date, end_date, step=7)
+
+    # Log in once, shared by all the workers
+    cmems_utils.login(user, pswd)
+
+    # Record of the downloaded files
+    manifest = Manifest(output_directory) if incremental else None
+    # Per-day and per-stage metrics
+    metrics = Metrics(prefix, output_directory, prometheus_textfile)
+    # Server-side subset (None: whole files)
+    subset = cmems_utils.subset_request(lon_limits, lat_limits, depth_limits, variables)
+
+    def download_one(date_str):
+        # Download the data for one day
+        return cmems_utils.download_data(dataset_id, prefix, date_str, file_filter,
+                                         output_directory=output_directory,
+                                         manifest=manifest, metrics=metrics, subset=subset)
+
+    run = run_dates(download_one, dates, workers=workers, metrics=metrics,
+                    summary=os.path.join(output_directory, SUMMARY_NAME.format(prefix=prefix)))
+    metrics.close()
+    return run
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    dates = None
+    if len(sys.argv) == 2 and sys.argv[1].endswith('.json'):
+        # Dates left by a previous run
+        dates = read_summary(sys.argv[1])
+        start_date = end_date = None
+    elif len(sys.argv) == 3:
+        start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
+        end_date = datetime.strptime(sys.argv[2], "%Y%m%d")
+    elif len(sys.argv) == 2:
+        start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
+        end_date = start_date
+    elif len(sys.argv) == 1:
+        current_date = datetime.now()
+        start_date = current_date
+        end_date = current_date
+    else:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+
+    main(start_date, end_date, dates)
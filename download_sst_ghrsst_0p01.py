@@ -15,9 +15,13 @@ Siqi Li, SMAST
 
 import sys
 import os
-from datetime import datetime, timedelta
-import urllib.request
-from urllib.error import URLError, HTTPError
+import time
+from datetime import datetime
+
+from download_utils import (date_list, date_blocks, urlDownload, file_size, retry_delay,
+                            write_summary, read_summary, Manifest, Metrics, NotPublished,
+                            DATE_RETRIES, SUMMARY_NAME)
+from erddap_utils import grid_index, tile_ranges, batch_days, download_tiled, split_days
 
 
 # Settings
@@ -26,84 +30,232 @@ lon_limits = [-77.97, -56.85]
 lat_limits = [31.84, 46.15]
 lon_stride = 10
 lat_stride = 10
+# Skip the dates whose files are already downloaded with the same request
+incremental = True
+# Large boxes are downloaded in tiles of tile_size x tile_size points,
+# tile_workers tiles at a time, and stitched into one file
+tile_size = 1000
+tile_workers = 4
+# Small boxes are requested for up to batch_max_days days at once, with
+# at most batch_points values in one request
+batch_max_days = 31
+batch_points = 20000000
+# Metrics of the run are appended to download_metrics.jsonl in the output
+# directory; they are also written to this Prometheus textfile (None: off)
+prometheus_textfile = None
 
 prefix = "SST_GHRSST_0p01"
 
+# Dataset information
+url0 = "https://coastwatch.pfeg.noaa.gov/erddap/griddap/jplMURSST41.nc"
+# MUR grid: first point, spacing and number of points
+lat_grid = [-89.99, 0.01, 17999]
+lon_grid = [-179.99, 0.01, 36000]
+
 # Set the default limits of longitude and latitude
 if lon_limits is None:
-    lonlims = [-179.99, 180.00]
+    lon_limits = [-179.99, 180.00]
 
 if lat_limits is None:
-    latlims = [-89.99, 89.99]
+    lat_limits = [-89.99, 89.99]
+
+# Grid indices of the box
+lat_range = [grid_index(lat, *lat_grid) for lat in lat_limits]
+lon_range = [grid_index(lon, *lon_grid) for lon in lon_limits]
+n_tiles = (len(tile_ranges(*lat_range, lat_stride, tile_size))
+           * len(tile_ranges(*lon_range, lon_stride, tile_size)))
 
 # Usage instructions
 USAGE = """
 Usage: python download_sst_data.py [start_date] [end_date]
        python download_sst_data.py [date]
+       python download_sst_data.py [summary]
        python download_sst_data.py
 
 Arguments:
   start_date    Start date in yyyymmdd format
   end_date      End date in yyyymmdd format (optional, defaults to start_date)
   date          Single date in yyyymmdd format (optional, defaults to current date)
+  summary       Summary of a previous run (download_summary_*.json): its failed
+                and unpublished dates are downloaded again
 
 Example:
   python download_sst_data.py 20240101 20240105
 """
 
-# Parse command-line arguments
-if len(sys.argv) == 3:
-    start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
-    end_date = datetime.strptime(sys.argv[2], "%Y%m%d")
-elif len(sys.argv) == 2:
-    start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
-    end_date = start_date
-elif len(sys.argv) == 1:
-    start_date = datetime.now()
-    end_date = datetime.now()
-else:
-    print("Invalid input format.")
-    sys.exit()
-
-# Download the data
-def urlDownload(url, destination):
-    try:
-        ftp = urllib.request.urlopen(url)
-        # If the FTP link is available, download the file
-        with open(destination, 'wb') as f:
-            f.write(ftp.read())
-        print(f"  URL : {url}")
-        print(f"  SAVE: {destination}")
-    except HTTPError as e:
-        print(f"HTTP Error: {e.code}, {e.reason}")
-        sys.exit()
-    except URLError as e:
-        print(f"URL Error: {e.reason}")
-        sys.exit()
+def griddap_time(date1, date2):
+    # griddap time subscript from date1 to date2 (yyyymmdd)
+    t1 = f"({date1[:4]}-{date1[4:6]}-{date1[6:8]}T09:00:00Z)"
+    t2 = f"({date2[:4]}-{date2[4:6]}-{date2[6:8]}T09:00:00Z)"
+    return f"{t1}:1:{t2}"
 
-current_date = start_date
-while current_date <= end_date:
-    # Format the date in yyyymmdd
-    date_str = current_date.strftime('%Y%m%d')
-    yyyy = date_str[:4]
-    mm = date_str[4:6]
-    dd = date_str[6:8]
-
-    # URL
-    file_name = f"{prefix}_{date_str}.nc"
-    file_path = os.path.join(output_directory, file_name)
-    url  = "https://coastwatch.pfeg.noaa.gov/erddap/griddap/jplMURSST41.nc?"
-    url += "analysed_sst"
-    url += f"%5B({yyyy}-{mm}-{dd}T09:00:00Z):1:({yyyy}-{mm}-{dd}T09:00:00Z)%5D"
+
+def griddap_url(date1, date2):
+    # griddap request of the box from date1 to date2 (yyyymmdd)
+    url  = f"{url0}?analysed_sst"
+    url += f"%5B{griddap_time(date1, date2)}%5D"
     url += f"%5B({lat_limits[0]}):{lat_stride}:({lat_limits[1]})%5D"
     url += f"%5B({lon_limits[0]}):{lon_stride}:({lon_limits[1]})%5D"
+    return url
+
+
+def file_path(date_str):
+    return os.path.join(output_directory, f"{prefix}_{date_str}.nc")
+
+
+def download_block(block, day, manifest, metrics):
+    """
+    Download the dates of block (one request, or tiles for a large box);
+    returns the dates found in the response.
+    """
+    if n_tiles > 1:
+        date_str = block[0]
+        download_tiled(url0, "analysed_sst", griddap_time(date_str, date_str),
+                       lat_range, lon_range, [lat_stride, lon_stride], file_path(date_str),
+                       tile_size=tile_size, workers=tile_workers, metrics=metrics, day=day)
+        if manifest is not None:
+            with metrics.stage(day, 'manifest'):
+                manifest.update(os.path.basename(file_path(date_str)), date_str,
+                                griddap_url(date_str, date_str))
+        return [date_str]
 
-    # Download the data for one day
-    print(f"----Processing data for {date_str}")
-    urlDownload(url, file_path)
-    print("     Data download completed.")
-    print()
+    block_path = os.path.join(output_directory, f"{prefix}_{block[0]}_{block[-1]}.nc")
+    with metrics.stage(day, 'download'):
+        remote = urlDownload(griddap_url(block[0], block[-1]), block_path,
+                             metrics=metrics, day=day)
+    with metrics.stage(day, 'split'):
+        found = split_days(block_path, "analysed_sst",
+                           {date_str: file_path(date_str) for date_str in block})
+        os.remove(block_path)
+    for date_str in found:
+        if manifest is not None:
+            with metrics.stage(day, 'manifest'):
+                manifest.update(os.path.basename(file_path(date_str)), date_str,
+                                griddap_url(date_str, date_str),
+                                remote if len(block) == 1 else None)
+    return found
 
-    # Advance the day
-    current_date += timedelta(days=1)
 
+def main(start_date, end_date, dates=None):
+    """
+    Download the data from start_date to end_date (datetime), or of the
+    dates (yyyymmdd) if given. Returns the number of files, the bytes and
+    the seconds of the run.
+
+    A block that fails does not stop the run: it is split into smaller
+    blocks down to single days, the failed days are tried again after the
+    others, as in download_utils.run_dates(), and the outcome of every
+    date is written to the summary of the run.
+    """
+    t0 = time.time()
+    # Record of the downloaded files
+    manifest = Manifest(output_directory) if incremental else None
+    # Per-day and per-stage metrics
+    metrics = Metrics(prefix, output_directory, prometheus_textfile)
+
+    # Check which days have to be downloaded
+    # (the griddap subset is built on request, so it is not asked for its
+    # metadata: a file is up to date if it was downloaded with the same URL)
+    outcomes = {}
+    todo = []
+    written = []
+    for date_str in dates if dates is not None else date_list(start_date, end_date):
+        file_name = os.path.basename(file_path(date_str))
+        if manifest is not None and manifest.is_current(file_name, griddap_url(date_str, date_str)):
+            print(f"----{date_str} is up to date, skipped.")
+            metrics.finish(date_str, 'skipped')
+            outcomes[date_str] = ('skipped', None)
+        else:
+            todo.append(date_str)
+
+    if n_tiles > 1:
+        # Large box: one day at a time, in tiles
+        blocks = [[date_str] for date_str in todo]
+    else:
+        # Small box: blocks of consecutive days in one request, split locally
+        points_per_day = (len(range(lat_range[0], lat_range[1] + 1, lat_stride))
+                          * len(range(lon_range[0], lon_range[1] + 1, lon_stride)))
+        blocks = date_blocks(todo, batch_days(points_per_day, batch_points, batch_max_days))
+
+    for attempt in range(DATE_RETRIES + 1):
+        if attempt > 0:
+            delay = retry_delay(attempt)
+            print(f"---- {len(blocks)} blocks failed, trying again in {delay:.0f} s "
+                  f"({attempt}/{DATE_RETRIES})")
+            time.sleep(delay)
+        failed = []
+        queue = list(blocks)
+        while queue:
+            block = queue.pop(0)
+            if len(block) == 1:
+                print(f"----Processing data for {block[0]}")
+            else:
+                print(f"----Processing data for {block[0]} to {block[-1]}")
+            # The metrics of a block are recorded under its first and last dates
+            day = block[0] if len(block) == 1 else f"{block[0]}_{block[-1]}"
+            metrics.start(day)
+            try:
+                found = download_block(block, day, manifest, metrics)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if len(block) > 1:
+                    # The failure may come from some of the days only: try the
+                    # block without its last day (often not on the server yet),
+                    # or its two halves, before giving up on any day
+                    metrics.finish(day, 'retry')
+                    half = len(block) - 1 if isinstance(e, NotPublished) else len(block) // 2
+                    queue[:0] = [block[:half], block[half:]]
+                    print(f"     Failed ({error}), split into {block[0]}-{block[half - 1]} "
+                          f"and {block[half]}-{block[-1]}")
+                elif isinstance(e, NotPublished):
+                    metrics.finish(day, 'unpublished')
+                    outcomes[block[0]] = ('unpublished', str(e))
+                    print(f"     Not published yet: {e}")
+                else:
+                    metrics.finish(day, 'failed' if attempt == DATE_RETRIES else 'retry')
+                    outcomes[block[0]] = ('failed', error)
+                    failed.append(block)
+                    print(f"     Failed: {error}")
+                print()
+                continue
+            metrics.finish(day, 'downloaded', [file_path(date_str) for date_str in found])
+            for date_str in block:
+                if date_str in found:
+                    outcomes[date_str] = ('downloaded', None)
+                else:
+                    print(f"     No data for {date_str}")
+                    outcomes[date_str] = ('unpublished', "No data in the response")
+            print("     Data download completed.")
+            print()
+            written += found
+        blocks = failed
+        if not blocks:
+            break
+
+    write_summary(os.path.join(output_directory, SUMMARY_NAME.format(prefix=prefix)), outcomes)
+    nbytes = sum(file_size(file_path(date_str)) for date_str in written)
+    metrics.close()
+    return len(written), nbytes, time.time() - t0
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    dates = None
+    if len(sys.argv) == 2 and sys.argv[1].endswith('.json'):
+        # Dates left by a previous run
+        dates = read_summary(sys.argv[1])
+        start_date = end_date = None
+    elif len(sys.argv) == 3:
+        start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
+        end_date = datetime.strptime(sys.argv[2], "%Y%m%d")
+    elif len(sys.argv) == 2:
+        start_date = datetime.strptime(sys.argv[1], "%Y%m%d")
+        end_date = start_date
+    elif len(sys.argv) == 1:
+        start_date = datetime.now()
+        end_date = datetime.now()
+    else:
+        print("Invalid input format.")
+        sys.exit()
+
+    main(start_date, end_date, dates)
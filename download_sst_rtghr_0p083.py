@@ -14,15 +14,33 @@ Siqi Li, SMAST
 """
 import os
 import sys
+import time
 from datetime import datetime
-import urllib.request
-from urllib.error import URLError, HTTPError
 import pygrib
 import numpy as np
 from netCDF4 import Dataset
 
+from download_utils import (date_list, run_dates, read_summary, urlDownload, remote_info,
+                            Manifest, Metrics, SUMMARY_NAME)
+
 # Settings
 output_directory = './'
+# Region (None: global) and strides, as in the GHRSST script
+lon_limits = None
+lat_limits = None
+lon_stride = 1
+lat_stride = 1
+# Skip the date if its grib2 file has not changed since the last download
+incremental = True
+# NetCDF output: compression level (0-9, 0: no compression) and packing
+# of the SST into int16 with a 0.001 K resolution
+complevel = 4
+pack_int16 = False
+# Chunk size along lat and lon, good for both map and time-series reads
+chunk_size = 256
+# Metrics of the run are appended to download_metrics.jsonl in the output
+# directory; they are also written to this Prometheus textfile (None: off)
+prometheus_textfile = None
 
 prefix = "SST_RTGHR_0p083"
 
@@ -31,94 +49,179 @@ url0 = "ftp://ftpprd.ncep.noaa.gov/pub/data/nccf/com/nsst/v1.2/"
 # Usage instructions
 USAGE = """
 Usage: python download_ssh_data.py [date]
+       python download_ssh_data.py [summary]
        python download_ssh_data.py
 
 Arguments:
   date          Single date in yyyymmdd format (optional, defaults to current date)
+  summary       Summary of a previous run (download_summary_*.json): its failed
+                and unpublished dates are downloaded again
 
 Example:
   python download_ssh_data.py 20240105
 """
 
-# Time
-if len(sys.argv) == 2:
-    date = datetime.strptime(sys.argv[1], "%Y%m%d")
-elif len(sys.argv) == 1:
-    date = datetime.now()
-else:
-    print("Invalid input format.")
-    print(USAGE)
-    sys.exit()
-date_str = date.strftime('%Y%m%d')
-
-grb_name = "rtgssthr_grb_0.083_awips.grib2"
-nc_name = prefix + "_" + date_str + '.nc'
-url = url0 + "nsst." + date.strftime('%Y%m%d') + "/" + grb_name
-grb_path = os.path.join(output_directory, grb_name)
-nc_path = os.path.join(output_directory, nc_name)
-
-# Download the data
-def urlDownload(url, destination):
-    try:
-        ftp = urllib.request.urlopen(url)
-        # If the FTP link is available, download the file
-        with open(destination, 'wb') as f:
-            f.write(ftp.read())
-        print(f"  URL : {url}")
-        print(f"  SAVE: {destination}")
-    except HTTPError as e:
-        print(f"HTTP Error: {e.code}, {e.reason}")
-        sys.exit()
-    except URLError as e:
-        print(f"URL Error: {e.reason}")
+def crop_index(x, limits, period=None):
+    """
+    Indices of the points of the 1-D axis x inside limits (None: all).
+    With a period (360 for longitude) the limits may use another
+    convention than x, e.g. -180-180 on the 0-360 RTGHR grid, and may
+    cross the end of the axis.
+    """
+    if limits is None:
+        return np.arange(len(x))
+    if period is None:
+        return np.where((x >= min(limits)) & (x <= max(limits)))[0]
+    offset = (x - limits[0]) % period
+    span = limits[1] - limits[0]
+    if span < period:
+        span %= period
+    index = np.where(offset <= span)[0]
+    return index[np.argsort(offset[index], kind='stable')]
+
+
+def download_one(date_str, manifest, metrics):
+    # Download and convert the data of one day; None if it is up to date
+    grb_name = "rtgssthr_grb_0.083_awips.grib2"
+    nc_name = prefix + "_" + date_str + '.nc'
+    url = url0 + "nsst." + date_str + "/" + grb_name
+    grb_path = os.path.join(output_directory, grb_name)
+    nc_path = os.path.join(output_directory, nc_name)
+
+    # Check the remote file against the manifest
+    if manifest is not None:
+        with metrics.stage(date_str, 'check'):
+            remote = remote_info(url)
+        if remote and manifest.is_current(nc_name, url, remote):
+            print(f"---- {nc_name} is up to date")
+            return None
+
+    print("---- Download the data")
+    with metrics.stage(date_str, 'download'):
+        remote = urlDownload(url, grb_path, metrics=metrics, day=date_str)
+
+    # Read the data from the grib2 file
+    print("---- Read the grib2 file")
+    t0 = time.time()
+    t_stage = time.perf_counter()
+    # Open the grib2 file
+    grbs = pygrib.open(grb_path)
+    # Get the variable by name
+    grb = grbs.select(name='Temperature')[0]
+    # Read the time
+    #grb.dataDate
+    if grb.gridType == 'regular_ll':
+        # Regular grid: crop with the 1-D coordinates, the 2-D ones are never built
+        lat = grb.distinctLatitudes
+        lon = grb.distinctLongitudes
+        j = crop_index(lat, lat_limits)[::lat_stride]
+        i = crop_index(lon, lon_limits, period=360)[::lon_stride]
+        lat = lat[j]
+        lon = lon[i] if lon_limits is None else lon_limits[0] + (lon[i] - lon_limits[0]) % 360
+        # Read the variable values and keep only the region
+        sst = grb.values[np.ix_(j, i)]
+        coord_dims = [('lat',), ('lon',)]
+    else:
+        # Other grids: full field with the 2-D coordinates
+        if lon_limits is not None or lat_limits is not None:
+            print("     Not a regular lat/lon grid, the region is ignored.")
+        lat, lon = grb.latlons()
+        sst = grb.values
+        coord_dims = [('lat', 'lon'), ('lat', 'lon')]
+    ny, nx = sst.shape
+    # Close the grib2 file
+    grbs.close()
+    metrics.add_time(date_str, 'decode', time.perf_counter() - t_stage)
+
+    # Write the data into netcdf
+    print("---- Write the NetCDF file")
+    t_stage = time.perf_counter()
+    # Create a new NetCDF file
+    nc = Dataset(nc_path, 'w', format='NETCDF4')
+    nc.title = 'RTGHR SST'
+    nc.date = date_str
+    # Create dimensions
+    lon_dim = nc.createDimension('lon', nx)
+    lat_dim = nc.createDimension('lat', ny)
+    time_dim = nc.createDimension('time', None)
+    # Create variables
+    zlib = complevel > 0
+    lat_var = nc.createVariable('latitude', np.float32, coord_dims[0],
+                                zlib=zlib, complevel=complevel)
+    lat_var.long_name = 'latitude'
+    lat_var.unit = 'degree_north'
+    lon_var = nc.createVariable('longitude', np.float32, coord_dims[1],
+                                zlib=zlib, complevel=complevel)
+    lon_var.long_name = 'longitude'
+    lon_var.unit = 'degree_east'
+    chunks = (1, min(ny, chunk_size), min(nx, chunk_size))
+    if pack_int16:
+        sst_var = nc.createVariable('sst', np.int16, ('time', 'lat', 'lon'),
+                                    zlib=zlib, complevel=complevel, chunksizes=chunks,
+                                    fill_value=np.int16(-32768))
+        sst_var.scale_factor = np.float32(0.001)
+        sst_var.add_offset = np.float32(290.0)
+    else:
+        sst_var = nc.createVariable('sst', np.float32, ('time', 'lat', 'lon'),
+                                    zlib=zlib, complevel=complevel, chunksizes=chunks)
+    sst_var.long_name = 'sea surface temperature'
+    sst_var.unit = 'Kelvin'
+    # Write the data
+    lat_var[:] = lat
+    lon_var[:] = lon
+    sst_var[0, :, :] = sst
+    # Close the file
+    nc.close()
+    metrics.add_time(date_str, 'write', time.perf_counter() - t_stage)
+    print(f"     {nc_name}: {os.path.getsize(nc_path) / 1e6:.1f} MB, "
+          f"converted in {time.time() - t0:.1f} s")
+
+    # Remove the grb2 file
+    with metrics.stage(date_str, 'cleanup'):
+        os.remove(grb_path)
+
+    # Record the new file
+    if manifest is not None:
+        with metrics.stage(date_str, 'manifest'):
+            manifest.update(nc_name, date_str, url, remote)
+
+    return nc_path
+
+
+def main(start_date, end_date=None, dates=None):
+    """
+    Download and convert the data from start_date to end_date (datetime,
+    defaults to start_date), or of the dates (yyyymmdd) if given. Returns
+    the number of files, the bytes and the seconds of the run.
+    """
+    if dates is None:
+        dates = date_list(start_date, end_date or start_date)
+    # Record of the downloaded files
+    manifest = Manifest(output_directory) if incremental else None
+    # Per-day and per-stage metrics
+    metrics = Metrics(prefix, output_directory, prometheus_textfile)
+
+    run = run_dates(lambda date_str: download_one(date_str, manifest, metrics),
+                    dates, metrics=metrics,
+                    summary=os.path.join(output_directory, SUMMARY_NAME.format(prefix=prefix)))
+    metrics.close()
+    return run
+
+
+if __name__ == "__main__":
+    # Time
+    dates = None
+    if len(sys.argv) == 2 and sys.argv[1].endswith('.json'):
+        # Dates left by a previous run
+        dates = read_summary(sys.argv[1])
+        date = None
+    elif len(sys.argv) == 2:
+        date = datetime.strptime(sys.argv[1], "%Y%m%d")
+    elif len(sys.argv) == 1:
+        date = datetime.now()
+    else:
+        print("Invalid input format.")
+        print(USAGE)
         sys.exit()
 
-print("---- Download the data")
-urlDownload(url, grb_path)
-
-# Read the data from the grib2 file
-print("---- Read the grib2 file")
-# Open the grib2 file
-grbs = pygrib.open(grb_path)
-# Get the variable by name
-grb = grbs.select(name='Temperature')[0]
-# Read the grids
-lat, lon = grb.latlons()
-# Read the variable values
-sst = grb.values
-# Read the time
-#grb.dataDate
-ny, nx = sst.shape
-# Close the grib2 file
-grbs.close()
-
-# Write the data into netcdf
-print("---- Write the NetCDF file")
-# Create a new NetCDF file
-nc = Dataset(nc_path, 'w')
-nc.title = 'RTGHR SST'
-nc.date = date_str
-# Create dimensions
-lon_dim = nc.createDimension('lon', nx)
-lat_dim = nc.createDimension('lat', ny)
-time_dim = nc.createDimension('time', None)
-# Create variables
-lon_var = nc.createVariable('longitude', np.float32, ('lat', 'lon'))
-lon_var.long_name = 'longitude'
-lon_var.unit = 'degree_north'
-lat_var = nc.createVariable('latitude', np.float32, ('lat', 'lon'))
-lat_var.long_name = 'latitude'
-lat_var.unit = 'degree (0-360)'
-sst_var = nc.createVariable('sst', np.float32, ('time', 'lat', 'lon'))
-sst_var.long_name = 'sea surface temperature'
-sst_var.unit = 'Kelvin'
-# Write the data
-lon_var[:] = lon
-lat_var[:] = lat
-sst_var[0, :, :] = sst
-# Close the file
-nc.close()
-
-# Remove the grb2 file
-os.remove(grb_path)
-
+    main(date, dates=dates)
@@ -0,0 +1,728 @@
+"""
+Shared helpers for the download_*.py scripts.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import atexit
+import random
+import hashlib
+import threading
+import ftplib
+import http.client
+import urllib.request
+from urllib.error import URLError, HTTPError
+from urllib.parse import urlparse
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+# Size of the buffer used to stream a download to the disk
+CHUNK_SIZE = 1024 * 1024
+# Number of times an interrupted transfer is resumed before giving up
+RETRIES = 5
+# Socket timeout (s)
+TIMEOUT = 60
+# Name of the manifest kept in every output directory
+MANIFEST_NAME = 'manifest.json'
+# Name of the JSON-lines file of the run metrics kept in every output directory
+METRICS_NAME = 'download_metrics.jsonl'
+# Name of the summary of the last run of a product, in its output directory
+SUMMARY_NAME = 'download_summary_{prefix}.json'
+# Number of times the failed dates of a run are tried again, after a delay
+# (s) doubled every time up to MAX_RETRY_DELAY, with a random jitter
+DATE_RETRIES = 3
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 900
+# Maximum download rate of this process (bytes/s, None: no limit), shared
+# by all its transfers; the scheduler sets it with OCEANDATA_MAX_RATE
+MAX_RATE = float(os.environ['OCEANDATA_MAX_RATE']) if os.environ.get('OCEANDATA_MAX_RATE') else None
+
+_rate_lock = threading.Lock()
+_rate_next = [0.0]
+
+# Thread pools shared by all the downloads of this process
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """A download failed (after its retries)."""
+
+
+class NotPublished(DownloadError):
+    """The data of a date are not on the server (yet)."""
+
+
+class _StalePart(Exception):
+    """The bytes of a .part file come from another version of the remote file."""
+
+
+def date_list(start_date, end_date, step=1):
+    # List the dates (yyyymmdd) from start_date to end_date
+    dates = []
+    current_date = start_date
+    while current_date <= end_date:
+        dates.append(current_date.strftime('%Y%m%d'))
+        current_date += timedelta(days=step)
+    return dates
+
+
+def date_blocks(dates, n):
+    # Group the dates (yyyymmdd) into blocks of at most n consecutive days
+    blocks = []
+    for date_str in dates:
+        day = datetime.strptime(date_str, '%Y%m%d')
+        if (blocks and len(blocks[-1]) < n
+                and datetime.strptime(blocks[-1][-1], '%Y%m%d') + timedelta(days=1) == day):
+            blocks[-1].append(date_str)
+        else:
+            blocks.append([date_str])
+    return blocks
+
+
+def daily_files(prefix, directory='./'):
+    # List the (yyyymmdd, path) of the {prefix}_{yyyymmdd}.nc files, by date
+    pattern = re.compile(re.escape(prefix) + r'_(\d{8})\.nc$')
+    files = []
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(prefix)}_*.nc")):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            files.append((match.group(1), path))
+    return sorted(files)
+
+
+def file_size(path):
+    # Size of a downloaded file in bytes (0 if there is no file)
+    if path is None or not os.path.isfile(path):
+        return 0
+    return os.path.getsize(path)
+
+
+def thread_pool(name, workers):
+    """
+    The thread pool name of this process with workers threads, created on
+    first use and then shared, e.g. by the products run by oceandata.py.
+    A pool must not be used by the tasks that run in it.
+    """
+    with _pools_lock:
+        if (name, workers) not in _pools:
+            _pools[(name, workers)] = ThreadPoolExecutor(max_workers=workers,
+                                                         thread_name_prefix=name)
+        return _pools[(name, workers)]
+
+
+def retry_delay(attempt):
+    # Delay (s) before the attempt-th retry: exponential backoff with jitter
+    delay = min(RETRY_DELAY * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def write_summary(path, outcomes):
+    """
+    Write the outcome of every date of a run (downloaded, skipped,
+    unpublished or failed, with the error) to the JSON file path.
+    """
+    summary = {'time': datetime.now().isoformat(timespec='seconds')}
+    for status in ('downloaded', 'skipped', 'unpublished', 'failed'):
+        summary[status] = sorted(d for d, (s, error) in outcomes.items() if s == status)
+    summary['errors'] = {d: error for d, (s, error) in sorted(outcomes.items()) if error}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(summary, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_summary(path):
+    # The dates of a summary that are still to be downloaded (failed or unpublished)
+    with open(path) as f:
+        summary = json.load(f)
+    return sorted(summary.get('failed', []) + summary.get('unpublished', []))
+
+
+def run_dates(func, dates, workers=1, metrics=None, summary=None):
+    """
+    Call func(date_str) for every date and report the throughput.
+
+    func returns the path of the file it wrote, or None if the date was
+    skipped because it is already up to date, and raises NotPublished if
+    the data of the date are not on the server yet. With workers > 1 the
+    dates are processed by a thread pool, so func has to be thread-safe.
+
+    A date that fails does not stop the run: the failed dates are tried
+    again after the others, up to DATE_RETRIES times with a growing delay
+    (retry_delay()). The unpublished dates are not tried again. With a
+    summary path, the outcome of every date is written there
+    (write_summary()); read_summary() gives its dates to do again.
+
+    With a Metrics, the outcome of every date is recorded.
+    """
+    metrics = metrics or Metrics()
+    t0 = time.time()
+    outcomes = {}
+    nfile = 0
+    nbytes = 0
+
+    def run_one(date_str, last):
+        # Outcome (status, error) and path of one date
+        metrics.start(date_str)
+        try:
+            path = func(date_str)
+        except NotPublished as e:
+            metrics.finish(date_str, 'unpublished')
+            return ('unpublished', str(e)), None
+        except Exception as e:
+            metrics.finish(date_str, 'failed' if last else 'retry')
+            return ('failed', f"{type(e).__name__}: {e}"), None
+        metrics.finish(date_str, 'skipped' if path is None else 'downloaded', [path])
+        return ('skipped' if path is None else 'downloaded', None), path
+
+    def report(outcome, label=''):
+        status, error = outcome
+        if status == 'downloaded':
+            print(f"     Data download completed{label}.")
+        elif status == 'skipped':
+            print(f"     Up to date, skipped{label}.")
+        elif status == 'unpublished':
+            print(f"     Not published yet{label}: {error}")
+        else:
+            print(f"     Failed{label}: {error}")
+
+    pending = list(dates)
+    for attempt in range(DATE_RETRIES + 1):
+        if attempt > 0:
+            delay = retry_delay(attempt)
+            print(f"---- {len(pending)} dates failed, trying again in {delay:.0f} s "
+                  f"({attempt}/{DATE_RETRIES})")
+            time.sleep(delay)
+        last = attempt == DATE_RETRIES
+        if workers <= 1:
+            for date_str in pending:
+                print(f"----Processing data for {date_str}")
+                outcomes[date_str], path = run_one(date_str, last)
+                report(outcomes[date_str])
+                nfile += path is not None
+                nbytes += file_size(path)
+                print()
+        else:
+            print(f"----Processing {len(pending)} dates with {workers} workers")
+            pool = thread_pool('dates', workers)
+            futures = {pool.submit(run_one, date_str, last): date_str for date_str in pending}
+            for future in as_completed(futures):
+                date_str = futures[future]
+                outcomes[date_str], path = future.result()
+                report(outcomes[date_str], f" for {date_str}")
+                nfile += path is not None
+                nbytes += file_size(path)
+            print()
+        pending = sorted(d for d in pending if outcomes[d][0] == 'failed')
+        if not pending:
+            break
+
+    if summary is not None:
+        write_summary(summary, outcomes)
+
+    counts = {}
+    for status, error in outcomes.values():
+        counts[status] = counts.get(status, 0) + 1
+    elapsed = max(time.time() - t0, 1e-6)
+    print(f"---- {nfile} files, {nbytes / 1e6:.1f} MB in {elapsed:.1f} s "
+          f"({nfile / elapsed:.2f} files/s, {nbytes / 1e6 / elapsed:.2f} MB/s), "
+          f"{counts.get('skipped', 0)} up to date"
+          + (f", {counts['unpublished']} not published yet" if 'unpublished' in counts else "")
+          + (f", {counts['failed']} failed" if 'failed' in counts else ""))
+
+    return nfile, nbytes, elapsed
+
+
+def _throttle(nbytes):
+    # Wait so that the transfers of this process stay under MAX_RATE
+    if not MAX_RATE:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        _rate_next[0] = max(_rate_next[0], now) + nbytes / MAX_RATE
+        delay = _rate_next[0] - now
+    time.sleep(delay)
+
+
+def _throttled(write):
+    # write, followed by the wait of the rate limit
+    def throttled_write(chunk):
+        write(chunk)
+        _throttle(len(chunk))
+    return throttled_write
+
+
+def _ftp_info(ftp, path):
+    # Size and modification time of a file on an open FTP connection
+    remote = {}
+    try:
+        remote['size'] = ftp.size(path)
+        remote['last_modified'] = ftp.voidcmd(f"MDTM {path}").split()[-1]
+    except ftplib.error_perm:
+        # SIZE or MDTM is not supported by the server
+        pass
+    return remote
+
+
+def _http_info(headers, size=None):
+    # Size, last-modified time and ETag from the HTTP response headers
+    remote = {}
+    if size is not None:
+        remote['size'] = size
+    if headers.get('Last-Modified'):
+        remote['last_modified'] = headers['Last-Modified']
+    if headers.get('ETag'):
+        remote['etag'] = headers['ETag']
+    return remote
+
+
+def remote_info(url):
+    """
+    Ask the server for the size, last-modified time and ETag of url
+    (HEAD for HTTP, SIZE and MDTM for FTP) without downloading it.
+    Returns None if the server cannot be reached.
+    """
+    parts = urlparse(url)
+    try:
+        if parts.scheme == 'ftp':
+            ftp = ftplib.FTP(parts.hostname, timeout=TIMEOUT)
+            try:
+                ftp.login(parts.username or 'anonymous', parts.password or '')
+                ftp.voidcmd('TYPE I')
+                return _ftp_info(ftp, parts.path)
+            finally:
+                ftp.close()
+
+        request = urllib.request.Request(url, method='HEAD')
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            length = response.headers.get('Content-Length')
+            return _http_info(response.headers, int(length) if length else None)
+    except (URLError, ftplib.Error, http.client.HTTPException, OSError):
+        return None
+
+
+def _read_validator(path):
+    # Validator (URL, ETag, last-modified time, size) saved next to a .part file
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_validator(path, url, remote):
+    validator = {key: remote[key] for key in ('etag', 'last_modified', 'size') if key in remote}
+    validator['url'] = url
+    with open(path, 'w') as f:
+        json.dump(validator, f)
+
+
+def _same_version(validator, url, remote):
+    # Whether remote is the version of the file that validator was saved from
+    if validator.get('url') != url:
+        return False
+    keys = [key for key in ('etag', 'last_modified', 'size') if key in validator and key in remote]
+    return bool(keys) and all(validator[key] == remote[key] for key in keys)
+
+
+def _if_range(validator):
+    # If-Range value of a validator: a strong ETag, or else the last-modified time
+    etag = validator.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return validator.get('last_modified')
+
+
+def _restart(f):
+    f.seek(0)
+    f.truncate()
+    return 0
+
+
+def _ftp_stream(url, f, offset, chunk_size, validator_path):
+    # Stream an FTP file into f, starting from byte offset (REST) if the
+    # file has not changed since the bytes on disk were received
+    parts = urlparse(url)
+    ftp = ftplib.FTP(parts.hostname, timeout=TIMEOUT)
+    try:
+        ftp.login(parts.username or 'anonymous', parts.password or '')
+        ftp.voidcmd('TYPE I')
+        remote = _ftp_info(ftp, parts.path)
+        if offset > 0 and not _same_version(_read_validator(validator_path), url, remote):
+            offset = _restart(f)
+        if offset == 0:
+            _write_validator(validator_path, url, remote)
+        ftp.retrbinary(f"RETR {parts.path}", _throttled(f.write), blocksize=chunk_size,
+                       rest=offset or None)
+    finally:
+        ftp.close()
+    return remote.get('size'), remote
+
+
+def _http_stream(url, f, offset, chunk_size, validator_path):
+    # Stream an HTTP(S) file into f, asking for the bytes after offset only
+    # if the file has not changed since the bytes on disk were received.
+    # Without ETag and Last-Modified (ERDDAP griddap), the URL and the size
+    # of the file are the validator.
+    validator = _read_validator(validator_path)
+    if offset > 0 and not (_if_range(validator) or
+                           (validator.get('url') == url and 'size' in validator)):
+        # Nothing to check the bytes on disk against, start again from zero
+        offset = _restart(f)
+    request = urllib.request.Request(url)
+    if offset > 0:
+        request.add_header('Range', f"bytes={offset}-")
+        if _if_range(validator):
+            request.add_header('If-Range', _if_range(validator))
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        if offset > 0 and response.status != 206:
+            # The file changed, or the server does not support ranges: the
+            # whole file is sent, start again from zero
+            offset = _restart(f)
+        length = response.headers.get('Content-Length')
+        total = offset + int(length) if length is not None else None
+        content_range = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+        if content_range:
+            total = int(content_range.group(1))
+        remote = _http_info(response.headers, total)
+        if offset > 0 and not _same_version(validator, url, remote):
+            # The server ignored If-Range, or the size changed
+            raise _StalePart(url)
+        if offset == 0:
+            _write_validator(validator_path, url, remote)
+        write = _throttled(f.write)
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            write(chunk)
+    return total, remote
+
+
+def urlDownload(url, destination, chunk_size=CHUNK_SIZE, metrics=None, day=None):
+    """
+    Download url to destination.
+
+    The data are streamed in chunk_size pieces to destination + '.part',
+    which is renamed to destination only when the transfer is complete.
+    An interrupted transfer is resumed from the bytes already on disk
+    (HTTP Range or FTP REST), also across runs. The URL, ETag,
+    last-modified time and size of the remote file are kept in
+    destination + '.part.json', and the bytes on disk are only resumed
+    from the same version of the file (HTTP If-Range); otherwise the
+    transfer starts again from zero. Servers that send neither ETag nor
+    Last-Modified (ERDDAP griddap) are resumed when the URL and the size
+    of the file are the same; a response with no size cannot be resumed.
+
+    With a Metrics, the bytes received and the retries are added to day.
+
+    Returns the remote size, last-modified time and ETag that the server
+    sent, to be stored in the Manifest. Raises NotPublished if the file is
+    not on the server (HTTP 404, FTP 550) and DownloadError if it cannot
+    be downloaded.
+    """
+    metrics = metrics or Metrics()
+    part_path = destination + '.part'
+    validator_path = part_path + '.json'
+    is_ftp = urlparse(url).scheme == 'ftp'
+
+    for attempt in range(RETRIES + 1):
+        if attempt > 0:
+            metrics.add(day, 'retries')
+        offset = file_size(part_path)
+        try:
+            with open(part_path, 'ab') as f:
+                try:
+                    if is_ftp:
+                        total, remote = _ftp_stream(url, f, offset, chunk_size, validator_path)
+                    else:
+                        total, remote = _http_stream(url, f, offset, chunk_size, validator_path)
+                finally:
+                    f.flush()
+                    metrics.add(day, 'bytes', max(f.tell() - offset, 0))
+        except _StalePart:
+            os.remove(part_path)
+            continue
+        except HTTPError as e:
+            if e.code == 416 and offset > 0:
+                # The partial file is not valid for this server, start again
+                os.remove(part_path)
+                continue
+            if e.code == 404:
+                raise NotPublished(f"{url} not found") from e
+            raise DownloadError(f"HTTP Error {e.code} ({e.reason}) for {url}") from e
+        except ftplib.error_perm as e:
+            if str(e).startswith('550'):
+                raise NotPublished(f"{url} not found") from e
+            raise DownloadError(f"FTP Error ({e}) for {url}") from e
+        except (URLError, ftplib.Error, http.client.HTTPException, OSError) as e:
+            # Connection dropped: keep the bytes received and resume
+            reason = e.reason if isinstance(e, URLError) else e
+            if attempt == RETRIES:
+                raise DownloadError(f"URL Error ({reason}) for {url}") from e
+            print(f"  Transfer interrupted ({reason}), resuming at "
+                  f"{file_size(part_path)} bytes")
+            time.sleep(attempt + 1)
+            continue
+
+        if total is None or file_size(part_path) >= total:
+            break
+    else:
+        raise DownloadError(f"Incomplete transfer of {url}")
+
+    os.replace(part_path, destination)
+    if os.path.isfile(validator_path):
+        os.remove(validator_path)
+    print(f"  URL : {url}")
+    print(f"  SAVE: {destination}")
+
+    return remote
+
+
+def file_checksum(path, chunk_size=CHUNK_SIZE):
+    # SHA-256 of a file, read in chunks
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive lock between processes (no lock where fcntl is missing)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Manifest:
+    """
+    Record of the files downloaded into one output directory.
+
+    For every file it keeps the date, the source (URL or remote file
+    name), the local size and checksum, and the remote size,
+    last-modified time and ETag. It is used to skip the dates that are
+    already up to date, so that only the missing or updated ones are
+    downloaded again.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def is_current(self, file_name, source, remote=None, verify=False):
+        """
+        Check if file_name is on disk and was downloaded from source, with
+        the same remote metadata if remote is given.
+
+        With verify=True the checksum of the local file is checked too.
+        """
+        entry = self.entries.get(file_name)
+        if entry is None or entry['source'] != source:
+            return False
+        path = os.path.join(os.path.dirname(self.path), file_name)
+        if file_size(path) != entry['size']:
+            return False
+        if verify and file_checksum(path) != entry['checksum']:
+            return False
+        if remote:
+            for key in ('etag', 'last_modified', 'size'):
+                if key in remote and remote[key] != entry['remote'].get(key):
+                    return False
+        return True
+
+    def update(self, file_name, date_str, source, remote=None):
+        # Add the file that was just downloaded and save the manifest
+        path = os.path.join(os.path.dirname(self.path), file_name)
+        entry = {
+            'date': date_str,
+            'source': source,
+            'size': file_size(path),
+            'checksum': file_checksum(path),
+            'remote': remote or {},
+        }
+        with self.lock, _file_lock(self.path + '.lock'):
+            # Only this entry changes: the other entries are the ones on
+            # disk, which may be newer (saved by other scripts) than ours
+            entries = {}
+            if os.path.isfile(self.path):
+                with open(self.path) as f:
+                    entries = json.load(f)
+            entries[file_name] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.entries = entries
+
+
+class Metrics:
+    """
+    Per-day and per-stage instrumentation of a download run.
+
+    The stages of every day (list, download, decode, write, ...) are
+    timed with stage() or add_time(), and the bytes received and the retries are added
+    with add(). finish() writes the record of the day, with its status and
+    output size, as one JSON line to METRICS_NAME in directory; at the
+    end of the run (close(), or the exit of the script) a summary line is
+    written, and the totals go to the Prometheus textfile if one is
+    given (e.g. for the textfile collector of node_exporter).
+
+    A day is a date (yyyymmdd) or the label of a block of dates. Without
+    a directory and a textfile nothing is written.
+    """
+
+    def __init__(self, product=None, directory=None, textfile=None):
+        self.product = product
+        self.path = os.path.join(directory, METRICS_NAME) if directory is not None else None
+        self.textfile = textfile
+        self.lock = threading.Lock()
+        self.records = {}
+        self.totals = {'stages': {}, 'bytes': 0, 'retries': 0, 'output_bytes': 0, 'days': {}}
+        self.t0 = time.time()
+        self.closed = False
+        if self.path or self.textfile:
+            atexit.register(self.close)
+
+    def _record(self, day):
+        # Open record of day (under the lock)
+        if day not in self.records:
+            self.records[day] = {'start': time.time(), 'stages': {}, 'bytes': 0, 'retries': 0}
+        return self.records[day]
+
+    def start(self, day):
+        # Start the clock of day
+        with self.lock:
+            self._record(day)
+
+    @contextmanager
+    def stage(self, day, name):
+        # Time a stage of day (a stage run several times is summed)
+        with self.lock:
+            self._record(day)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(day, name, time.perf_counter() - t0)
+
+    def add_time(self, day, name, elapsed):
+        # Add elapsed seconds to the stage name of day
+        with self.lock:
+            stages = self._record(day)['stages']
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+    def add(self, day, name, n=1):
+        # Add n to a counter of day ('bytes' or 'retries')
+        with self.lock:
+            self._record(day)[name] += n
+
+    def _write(self, line):
+        if self.path is None:
+            return
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(line) + '\n')
+
+    def finish(self, day, status, paths=()):
+        """
+        Close the record of day with its status ('downloaded', 'skipped',
+        'unpublished', 'failed', or 'retry' for a failure tried again
+        later) and output files, and write it.
+        """
+        paths = [path for path in paths if path is not None]
+        output_bytes = sum(file_size(path) for path in paths)
+        with self.lock:
+            record = self.records.pop(day, None) or {'start': time.time(), 'stages': {},
+                                                     'bytes': 0, 'retries': 0}
+            for name, elapsed in record['stages'].items():
+                self.totals['stages'][name] = self.totals['stages'].get(name, 0.0) + elapsed
+            for name in ('bytes', 'retries'):
+                self.totals[name] += record[name]
+            self.totals['output_bytes'] += output_bytes
+            self.totals['days'][status] = self.totals['days'].get(status, 0) + 1
+        self._write({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'product': self.product,
+            'day': day,
+            'status': status,
+            'wall': round(time.time() - record['start'], 6),
+            'stages': {name: round(elapsed, 6) for name, elapsed in record['stages'].items()},
+            'bytes': record['bytes'],
+            'retries': record['retries'],
+            'files': len(paths),
+            'output_bytes': output_bytes,
+        })
+
+    def close(self):
+        # Write the summary of the run and the Prometheus textfile
+        if self.closed:
+            return
+        self.closed = True
+        wall = time.time() - self.t0
+        totals = self.totals
+        self._write({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'product': self.product,
+            'day': None,
+            'status': 'run',
+            'wall': round(wall, 6),
+            'stages': {name: round(elapsed, 6) for name, elapsed in totals['stages'].items()},
+            'bytes': totals['bytes'],
+            'retries': totals['retries'],
+            'days': totals['days'],
+            'output_bytes': totals['output_bytes'],
+        })
+        if self.textfile is None:
+            return
+
+        label = f'product="{self.product}"'
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP oceandata_download_{name} {help_text}")
+            lines.append(f"# TYPE oceandata_download_{name} gauge")
+            for labels, value in samples:
+                lines.append(f"oceandata_download_{name}{{{labels}}} {value}")
+
+        metric('run_seconds', 'Wall time of the last run.', [(label, f"{wall:.3f}")])
+        metric('stage_seconds', 'Time spent in each stage in the last run.',
+               [(f'{label},stage="{name}"', f"{elapsed:.3f}")
+                for name, elapsed in totals['stages'].items()])
+        metric('days', 'Days of the last run by status.',
+               [(f'{label},status="{status}"', n) for status, n in totals['days'].items()])
+        metric('bytes', 'Bytes received in the last run.', [(label, totals['bytes'])])
+        metric('retries', 'Retried transfers in the last run.', [(label, totals['retries'])])
+        metric('output_bytes', 'Size of the files written in the last run.',
+               [(label, totals['output_bytes'])])
+        metric('last_run_timestamp_seconds', 'End of the last run.',
+               [(label, f"{time.time():.0f}")])
+
+        tmp_path = self.textfile + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.textfile)
@@ -0,0 +1,172 @@
+"""
+Shared helpers for the ERDDAP griddap downloads (GHRSST).
+
+A large lon/lat box is split into tiles on the index grid of the dataset.
+The tiles are downloaded concurrently and written back into one NetCDF
+file, so that every request stays under the ERDDAP response-size limit.
+A small box is instead requested for several days at once, and the
+response is split into one file per day.
+
+https://coastwatch.pfeg.noaa.gov/erddap/griddap/documentation.html
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from netCDF4 import Dataset
+
+from download_utils import urlDownload, thread_pool, Metrics
+
+
+def grid_index(value, start, step, n):
+    # Index of the grid point nearest to value on a regular axis
+    return int(min(max(round((value - start) / step), 0), n - 1))
+
+
+def tile_ranges(i1, i2, stride, tile_size):
+    """
+    Split the index range i1:stride:i2 into pieces of at most tile_size
+    points. Every piece starts on the same strided grid as the whole range.
+    """
+    ranges = []
+    step = stride * tile_size
+    for a in range(i1, i2 + 1, step):
+        b = min(a + step - stride, i2)
+        b -= (b - a) % stride
+        ranges.append((a, b))
+    return ranges
+
+
+def batch_days(points_per_day, max_points, max_days):
+    # Number of days in one request, so that it has at most max_points values
+    return int(max(1, min(max_days, max_points // max(points_per_day, 1))))
+
+
+def _create_like(src, dst, var, sizes):
+    # Create the dimensions and variables of src in dst, with new sizes
+    dst.setncatts(src.__dict__)
+    for name, dim in src.dimensions.items():
+        dst.createDimension(name, sizes.get(name, len(dim)))
+    for name in ('time', 'latitude', 'longitude', var):
+        var_in = src.variables[name]
+        attrs = var_in.__dict__
+        fill_value = attrs.pop('_FillValue', None)
+        var_out = dst.createVariable(name, var_in.dtype, var_in.dimensions,
+                                     fill_value=fill_value)
+        var_out.setncatts(attrs)
+
+
+def split_days(block_path, var, destinations):
+    """
+    Write every day of a multi-day response into its own file.
+
+    destinations maps yyyymmdd to the output path. Only one day of data is
+    in memory at a time. Returns the dates that were found in the response.
+    """
+    found = []
+    with Dataset(block_path) as src:
+        src.set_auto_maskandscale(False)
+        times = src.variables['time'][:]
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        for k, t in enumerate(times):
+            date_str = (epoch + timedelta(seconds=float(t))).strftime('%Y%m%d')
+            if date_str not in destinations:
+                continue
+            tmp_path = destinations[date_str] + '.part'
+            with Dataset(tmp_path, 'w') as dst:
+                dst.set_auto_maskandscale(False)
+                _create_like(src, dst, var, {'time': 1})
+                dst.variables['time'][:] = times[k:k + 1]
+                dst.variables['latitude'][:] = src.variables['latitude'][:]
+                dst.variables['longitude'][:] = src.variables['longitude'][:]
+                dst.variables[var][:] = src.variables[var][k:k + 1]
+                if 'time_coverage_start' in dst.ncattrs():
+                    time_str = (epoch + timedelta(seconds=float(t))).strftime('%Y-%m-%dT%H:%M:%SZ')
+                    dst.time_coverage_start = time_str
+                    dst.time_coverage_end = time_str
+            os.replace(tmp_path, destinations[date_str])
+            found.append(date_str)
+
+    return found
+
+
+def download_tiled(url0, var, time_query, lat_range, lon_range, stride, destination,
+                   tile_size=1000, workers=4, metrics=None, day=None):
+    """
+    Download var[time][lat][lon] in tiles and stitch them into destination.
+
+    lat_range and lon_range are the (first, last) grid indices, stride is
+    (lat_stride, lon_stride) and tile_size is the number of points along
+    each side of a tile. time_query is the time subscript, e.g.
+    '(2024-01-01T09:00:00Z):1:(2024-01-01T09:00:00Z)'.
+
+    With a download_utils.Metrics, the download and stitch stages, the
+    bytes received and the retries are recorded for day.
+    """
+    metrics = metrics or Metrics()
+    lat_tiles = tile_ranges(lat_range[0], lat_range[1], stride[0], tile_size)
+    lon_tiles = tile_ranges(lon_range[0], lon_range[1], stride[1], tile_size)
+
+    tiles = []
+    for i, (a1, b1) in enumerate(lat_tiles):
+        for j, (a2, b2) in enumerate(lon_tiles):
+            url  = f"{url0}?{var}"
+            url += f"%5B{time_query}%5D"
+            url += f"%5B{a1}:{stride[0]}:{b1}%5D"
+            url += f"%5B{a2}:{stride[1]}:{b2}%5D"
+            tile_path = f"{destination}.tile_{i:03d}_{j:03d}"
+            offset = ((a1 - lat_range[0]) // stride[0], (a2 - lon_range[0]) // stride[1])
+            tiles.append((url, tile_path, offset))
+
+    print(f"  {len(lat_tiles)} x {len(lon_tiles)} tiles")
+    with metrics.stage(day, 'download'):
+        pool = thread_pool('tiles', workers)
+        list(pool.map(lambda tile: urlDownload(tile[0], tile[1], metrics=metrics, day=day),
+                      tiles))
+
+    shape = ((lat_range[1] - lat_range[0]) // stride[0] + 1,
+             (lon_range[1] - lon_range[0]) // stride[1] + 1)
+    with metrics.stage(day, 'stitch'):
+        stitch_tiles(tiles, destination, var, shape)
+
+
+def stitch_tiles(tiles, destination, var, shape):
+    """
+    Write the tiles into one NetCDF file with the layout of an ERDDAP
+    response (time, latitude, longitude), one tile at a time.
+    """
+    tmp_path = destination + '.part'
+    first = tiles[0][1]
+
+    with Dataset(first) as src, Dataset(tmp_path, 'w') as dst:
+        src.set_auto_maskandscale(False)
+        dst.set_auto_maskandscale(False)
+        _create_like(src, dst, var, {'latitude': shape[0], 'longitude': shape[1]})
+        dst.variables['time'][:] = src.variables['time'][:]
+
+        for url, tile_path, (i, j) in tiles:
+            with Dataset(tile_path) as tile:
+                tile.set_auto_maskandscale(False)
+                lat = tile.variables['latitude'][:]
+                lon = tile.variables['longitude'][:]
+                dst.variables['latitude'][i:i + len(lat)] = lat
+                dst.variables['longitude'][j:j + len(lon)] = lon
+                dst.variables[var][:, i:i + len(lat), j:j + len(lon)] = tile.variables[var][:]
+
+        # Update the coverage of the stitched file
+        lat = dst.variables['latitude'][:]
+        lon = dst.variables['longitude'][:]
+        for name, value in (('geospatial_lat_min', np.min(lat)),
+                            ('geospatial_lat_max', np.max(lat)),
+                            ('geospatial_lon_min', np.min(lon)),
+                            ('geospatial_lon_max', np.max(lon))):
+            if name in dst.ncattrs():
+                dst.setncattr(name, value)
+
+    os.replace(tmp_path, destination)
+    for url, tile_path, offset in tiles:
+        os.remove(tile_path)
@@ -0,0 +1,64 @@
+"""
+Shared geometry helpers of the Python readers (longitude convention,
+point-in-polygon and bounding boxes).
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import numpy as np
+
+
+def lon_180(lon):
+    # Longitude in -180 to 180 (calc_lon_180)
+    return (np.asarray(lon, dtype=float) + 180) % 360 - 180
+
+
+def box_polygon(xlims, ylims):
+    # Polygon (n, 2) of a lon/lat box, as the default Poly of ARGO_read.m
+    return np.array([[xlims[0], ylims[0]], [xlims[1], ylims[0]], [xlims[1], ylims[1]],
+                     [xlims[0], ylims[1]], [xlims[0], ylims[0]]], dtype=float)
+
+
+def inpolygon(x, y, poly):
+    """
+    Points (x, y) inside or on the edge of the polygon poly (n, 2), as
+    inpolygon of MATLAB. All the points are tested at once, one polygon
+    edge at a time, and only the points inside the bounding box of the
+    polygon are tested at all.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    poly = np.asarray(poly, dtype=float)
+    px, py = poly[:, 0], poly[:, 1]
+    if px[0] != px[-1] or py[0] != py[-1]:
+        px = np.append(px, px[0])
+        py = np.append(py, py[0])
+
+    inside = np.zeros(x.shape, dtype=bool)
+    box = (x >= px.min()) & (x <= px.max()) & (y >= py.min()) & (y <= py.max())
+    xb, yb = x[box], y[box]
+    odd = np.zeros(xb.shape, dtype=bool)
+    edge = np.zeros(xb.shape, dtype=bool)
+    for x1, y1, x2, y2 in zip(px[:-1], py[:-1], px[1:], py[1:]):
+        # Crossings of a ray from the point towards +x
+        crosses = (y1 > yb) != (y2 > yb)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            xc = x1 + (yb - y1) * (x2 - x1) / (y2 - y1)
+        odd ^= crosses & (xb < xc)
+        # Points on the edge
+        cross = (x2 - x1) * (yb - y1) - (y2 - y1) * (xb - x1)
+        edge |= ((np.abs(cross) <= 1e-12 * max(abs(x2 - x1) + abs(y2 - y1), 1))
+                 & (xb >= min(x1, x2)) & (xb <= max(x1, x2))
+                 & (yb >= min(y1, y2)) & (yb <= max(y1, y2)))
+    inside[box] = odd | edge
+    return inside
+
+
+def inpolygon_lonlat(lon, lat, poly):
+    # Points in a lon/lat polygon (n, 2), which may cross 180: the longitudes,
+    # in any convention, are first shifted into the frame of the polygon
+    poly = np.asarray(poly, dtype=float)
+    x0 = poly[:, 0].min()
+    lon = x0 + (np.asarray(lon, dtype=float) - x0) % 360
+    return inpolygon(lon, lat, poly)
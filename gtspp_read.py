@@ -0,0 +1,183 @@
+"""
+Python reader of the GTSPP MEDS-ASCII files (same format and output as
+GTSPP_read_one.m).
+
+https://www.ncei.noaa.gov/data/oceans/gtspp/bestcopy/meds_ascii/
+https://www.nodc.noaa.gov/GTSPP/document/codetbls/gtsppcode.html
+
+The file is streamed directly from the .gz downloaded by GTSPP_download.m,
+in blocks of stations. Only the station headers are walked one by one, to
+find which lines belong to which station; all the depth/value fields of
+a block are then decoded at once with NumPy.
+
+The output is a ragged-array dict (one entry per profile, the depths
+and values of all the profiles concatenated):
+    lon      --- longitude (degree east)
+    lat      --- latitude (degree north)
+    time     --- date and time (datetime64[m])
+    row_size --- number of depths of every profile
+    z        --- depth (m)
+    t        --- temperature (degree C)
+    s        --- salinity (psu)
+Profile k is z[o:o+row_size[k]] with o = sum(row_size[:k]).
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import gzip
+
+import numpy as np
+
+# Width of one depth/value field group in a profile record
+POINT_WIDTH = 17
+# Number of stations decoded at once
+BLOCK_SIZE = 20000
+
+
+def _open(fin):
+    # Open a MEDS-ASCII file, compressed (.gz) or not
+    if fin.endswith('.gz'):
+        return gzip.open(fin, 'rb')
+    return open(fin, 'rb')
+
+
+def parse_fixed(chars):
+    """
+    Decode fixed-width ASCII numbers. chars is a (n, width) uint8 array;
+    returns n floats, NaN for the blank fields (as str2double).
+    """
+    chars = np.atleast_2d(chars)
+    n, width = chars.shape
+    is_digit = (chars >= 48) & (chars <= 57)
+    is_dot = chars == 46
+    after_dot = np.cumsum(is_dot, axis=1) > 0
+    mantissa = np.zeros(n)
+    decimals = np.zeros(n)
+    for col in range(width):
+        digit = is_digit[:, col]
+        mantissa = np.where(digit, mantissa * 10 + (chars[:, col] - 48), mantissa)
+        decimals += digit & after_dot[:, col]
+    value = mantissa / 10.0 ** decimals
+    value[(chars == 45).any(axis=1)] *= -1
+    value[~is_digit.any(axis=1)] = np.nan
+    return value
+
+
+def _fixed(lines, start, stop):
+    # Columns start:stop (0-based) of a list of byte lines as a uint8 array
+    width = stop - start
+    buffer = b''.join(line[start:stop].ljust(width) for line in lines)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(len(lines), width)
+
+
+def read_blocks(fin, block_size=BLOCK_SIZE):
+    """
+    Stream the lines of one MEDS-ASCII file and sort them into station
+    headers and profile records, block_size stations at a time. Yields
+    the header lines, the profile record lines and, for every record,
+    the index of its station in the block.
+    """
+    with _open(fin) as f:
+        headers, records, station = [], [], []
+        for header in f:
+            if not header.strip():
+                continue
+            n_prof = int(header[121:123])
+            n_line = 0
+            for i in range(1, n_prof + 1):
+                n_line += int(header[14 * i + 116:14 * i + 118])
+            station.extend([len(headers)] * n_line)
+            records.extend(next(f).rstrip(b'\r\n') for _ in range(n_line))
+            headers.append(header.rstrip(b'\r\n'))
+            if len(headers) == block_size:
+                yield headers, records, np.array(station, dtype=np.int64)
+                headers, records, station = [], [], []
+        if headers:
+            yield headers, records, np.array(station, dtype=np.int64)
+
+
+def _sort_keys(prof, z):
+    """
+    Sort the (profile, depth) keys. Returns the sort order, the first
+    point of every unique key in that order and the unique key index of
+    every point.
+    """
+    order = np.lexsort((z, prof))
+    first = np.ones(len(z), dtype=bool)
+    first[1:] = (prof[order][1:] != prof[order][:-1]) | (z[order][1:] != z[order][:-1])
+    index = np.empty(len(z), dtype=np.int64)
+    index[order] = np.cumsum(first) - 1
+    return order, first, index
+
+
+def _first_values(prof, z, v):
+    # Keep the first value at every (profile, depth), as find(...)(1)
+    order, first, index = _sort_keys(prof, z)
+    return prof[order][first], z[order][first], v[order][first]
+
+
+def _read_block(headers, records, station):
+    # Decode one block of stations (see read_blocks)
+    n_station = len(headers)
+
+    # Station headers
+    lat = parse_fixed(_fixed(headers, 62, 70))
+    lon = -parse_fixed(_fixed(headers, 70, 79))
+    date = _fixed(headers, 26, 38).view('S12').ravel().astype(str)
+    time = np.array([f"{d[0:4]}-{d[4:6]}-{d[6:8]}T{d[8:10]}:{d[10:12]}" for d in date],
+                    dtype='datetime64[m]')
+
+    # Profile records: type, number of points and all the point fields
+    prof_type = _fixed(records, 52, 56).view('S4').ravel()
+    nz = np.nan_to_num(parse_fixed(_fixed(records, 58, 62))).astype(np.int64)
+    buffer = b''.join(line[63:63 + POINT_WIDTH * n].ljust(POINT_WIDTH * n)
+                      for line, n in zip(records, nz.tolist()))
+    fields = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, POINT_WIDTH)
+    depth = parse_fixed(fields[:, 0:6])
+    value = parse_fixed(fields[:, 7:16])
+    point_station = np.repeat(station, nz)
+    point_type = np.repeat(prof_type, nz)
+
+    # Remove the [0 0] points and the points with no value
+    keep = ~((depth == 0) & (value == 0)) & ~np.isnan(value) & ~np.isnan(depth)
+    is_t = keep & (point_type == b'TEMP')
+    is_s = keep & (point_type == b'PSAL')
+
+    # Merge T and S on the union of their depths
+    t_prof, t_z, t_v = _first_values(point_station[is_t], depth[is_t], value[is_t])
+    s_prof, s_z, s_v = _first_values(point_station[is_s], depth[is_s], value[is_s])
+    prof = np.concatenate([t_prof, s_prof])
+    z = np.concatenate([t_z, s_z])
+    order, first, index = _sort_keys(prof, z)
+    t = np.full(first.sum(), np.nan)
+    s = np.full(first.sum(), np.nan)
+    t[index[:len(t_v)]] = t_v
+    s[index[len(t_v):]] = s_v
+
+    row_size = np.bincount(prof[order][first], minlength=n_station)
+    valid = row_size > 0
+
+    return {
+        'lon': lon[valid],
+        'lat': lat[valid],
+        'time': time[valid],
+        'row_size': row_size[valid],
+        'z': z[order][first],
+        't': t,
+        's': s,
+    }
+
+
+def gtspp_read(fin, block_size=BLOCK_SIZE):
+    """
+    Read one GTSPP MEDS-ASCII file (.gz or plain text).
+
+    Returns the ragged-array dict described at the top of this module.
+    Only the profiles with temperature or salinity data are kept, as in
+    GTSPP_read_one.m.
+    """
+    blocks = [_read_block(*block) for block in read_blocks(fin, block_size)]
+    if not blocks:
+        blocks = [_read_block([], [], np.zeros(0, dtype=np.int64))]
+    return {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
@@ -0,0 +1,290 @@
+"""
+This script downloads the IOC sea-level station data, as IOC_download.m,
+with many requests in flight at once.
+
+http://www.ioc-sealevelmonitoring.org
+
+Every station and every 30-day window is one request to bgraph.php. All
+the requests share one asyncio connection pool, capped per host and
+limited to a number of requests per second, and failed requests are
+retried with an exponential backoff. The HTML tables are parsed while
+they are received, and every station is written with the NetCDF layout of
+IOC_archive_one.m (IOC_zeta_{id}_{yyyymmdd}_{yyyymmdd}.nc).
+
+Requires aiohttp.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import aiohttp
+from netCDF4 import Dataset
+
+from station_info import read_list
+
+# Server
+url0 = 'http://www.ioc-sealevelmonitoring.org/'
+# Days per request
+NDAY = 30
+# Connections in the pool, in total and per host
+CONNECTIONS = 32
+CONNECTIONS_PER_HOST = 8
+# Requests per second per host
+RATE = 10.0
+# Number of tries and first backoff delay (s) of a failed request
+RETRIES = 5
+BACKOFF = 1.0
+TIMEOUT = 60
+# Half width (min) of the window averaged into every hourly value
+TWINDOW = 3
+
+TIME_EPOCH = datetime(1800, 1, 1)
+ID_LEN = 7
+LOCATION_LEN = 50
+
+# One row of the bgraph.php table: time, ..., last column
+ROW = re.compile(rb'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})</td>(?:(?!</tr>).)*?<td>(-?\d+(?:\.\d+)?)</td></tr>')
+LAT = re.compile(r'<tr\s*><td\s*class=field>Latitude\s*</td><td\s*class=nice>(-?[\d.]+)</td>')
+LON = re.compile(r'<tr\s*><td\s*class=field>Longitude\s*</td><td\s*class=nice>(-?[\d.]+)</td>')
+CITY = re.compile(r'<tr\s*><td\s*class=field>Location\s*</td><td\s*class=nice>\s*([^<]*?)\s*</td>')
+COUNTRY = re.compile(r'<tr\s*><td\s*class=field>Country\s*</td><td\s*class=nice>\s*([^<]*?)\s*</td>')
+
+# Usage instructions
+USAGE = """
+Usage: python ioc_harvest.py start_date end_date outdir id [id ...]
+
+Arguments:
+  start_date    Start date, format: yyyymmdd
+  end_date      End date, format: yyyymmdd
+  outdir        Output directory
+  id            IOC station codes
+
+Example:
+  python ioc_harvest.py 20240101 20241231 ./ bost2 nant
+"""
+
+
+class RateLimiter:
+    # Spread the requests to a host at most rate per second apart
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def parse_rows(buffer):
+    """
+    Parse the complete table rows of a piece of the bgraph.php page.
+    Returns the times, the values and the rest of the buffer (an
+    incomplete row).
+    """
+    end = buffer.rfind(b'</tr>')
+    if end < 0:
+        return [], [], buffer
+    end += len(b'</tr>')
+    times, values = [], []
+    for match in ROW.finditer(buffer, 0, end):
+        times.append(match.group(1).decode())
+        values.append(float(match.group(2)))
+    return times, values, buffer[end:]
+
+
+async def fetch(session, limiter, url, parse=None):
+    """
+    GET url, retrying with an exponential backoff. With parse, the body
+    is parsed as it arrives (parse_rows) and the rows are returned;
+    otherwise the body is returned as text. Returns None if every try
+    failed.
+    """
+    for attempt in range(1, RETRIES + 1):
+        await limiter.wait()
+        try:
+            async with session.get(url) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise aiohttp.ClientResponseError(response.request_info, (),
+                                                      status=response.status)
+                response.raise_for_status()
+                if parse is None:
+                    return await response.text()
+                times, values, buffer = [], [], b''
+                async for chunk in response.content.iter_chunked(65536):
+                    rows = parse(buffer + chunk)
+                    times += rows[0]
+                    values += rows[1]
+                    buffer = rows[2]
+                return times, values
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:
+                return None
+            if attempt == RETRIES:
+                print(f"     {url} failed: {e}")
+                return None
+            await asyncio.sleep(BACKOFF * 2 ** (attempt - 1) * (1 + random.random()))
+
+
+def hourly(times, values, tlims, twindow=TWINDOW):
+    """
+    Average irregular samples into an hourly series from tlims[0] to
+    tlims[1]: every hour is the mean of the samples within twindow minutes
+    of it (NaN if there is none).
+    """
+    hours = np.arange(np.datetime64(tlims[0], 'h'), np.datetime64(tlims[1], 'h') + 1)
+    zeta = np.full(len(hours), np.nan)
+    if times:
+        t = np.array(times, dtype='datetime64[s]')
+        v = np.array(values, dtype=float)
+        t, index = np.unique(t, return_index=True)
+        v = v[index]
+        minutes = (t - hours[0]).astype('timedelta64[s]').astype(float) / 60
+        k = np.round(minutes / 60).astype(np.int64)
+        near = (np.abs(minutes - 60 * k) <= twindow) & (k >= 0) & (k < len(hours))
+        total = np.bincount(k[near], weights=v[near], minlength=len(hours))
+        count = np.bincount(k[near], minlength=len(hours))
+        with np.errstate(invalid='ignore'):
+            zeta = np.where(count > 0, total / count, np.nan)
+    return hours.astype('datetime64[s]').astype(datetime), zeta
+
+
+def _chars(text, n):
+    # Text padded on the left to n characters, as a (1, n) char array
+    return np.array(list(text.encode('utf-8').rjust(n)[:n]), dtype=np.uint8).view('S1')[None]
+
+
+def ioc_archive_one(fout, sta):
+    # Write one station, as IOC_archive_one.m
+    with Dataset(fout, 'w', format='NETCDF3_CLASSIC') as nc:
+        nc.createDimension('station', 1)
+        nc.createDimension('time', len(sta['time']))
+        nc.createDimension('IDStrLen', ID_LEN)
+        nc.createDimension('LocationStrLen', LOCATION_LEN)
+
+        id_var = nc.createVariable('id', 'S1', ('station', 'IDStrLen'))
+        id_var.description = 'IOC code'
+        lon_var = nc.createVariable('lon', np.float64, ('station',))
+        lon_var.description = 'longitude'
+        lon_var.unit = 'degree_east'
+        lat_var = nc.createVariable('lat', np.float64, ('station',))
+        lat_var.description = 'latitude'
+        lat_var.unit = 'degree_north'
+        location_var = nc.createVariable('location', 'S1', ('station', 'LocationStrLen'))
+        location_var.description = 'city, country'
+        time_var = nc.createVariable('time', np.float64, ('time',))
+        time_var.description = 'GMT'
+        time_var.unit = 'days since 1800-01-01 00:00:00'
+        zeta_var = nc.createVariable('zeta', np.float32, ('time', 'station'))
+        zeta_var.description = 'water surface elevation'
+        zeta_var.unit = 'meter'
+
+        nc.source = 'IOC (http://www.ioc-sealevelmonitoring.org)'
+        nc.archive = 'OceanData (https://github.com/SiqiLiOcean/OceanData)'
+
+        id_var[:] = _chars(sta['id'], ID_LEN)
+        lon_var[:] = sta['lon']
+        lat_var[:] = sta['lat']
+        location_var[:] = _chars(sta['descr'], LOCATION_LEN)
+        time_var[:] = [(t - TIME_EPOCH).total_seconds() / 86400 for t in sta['time']]
+        zeta_var[:, 0] = sta['zeta']
+
+
+async def station_info(session, limiter, station, stations):
+    # Position and description of a station, from list_IOC.mat or station.php
+    if station in stations:
+        return stations[station]
+    text = await fetch(session, limiter, f"{url0}station.php?code={station}")
+    if text is None or not LON.search(text) or not LAT.search(text):
+        return np.nan, np.nan, ''
+    city = CITY.search(text)
+    country = COUNTRY.search(text)
+    descr = ', '.join(m.group(1) for m in (city, country) if m)
+    return float(LON.search(text).group(1)), float(LAT.search(text).group(1)), descr
+
+
+async def _harvest(ids, outdir, tlims, nday):
+    t1, t2 = tlims
+    ends = []
+    t = t1
+    while t < t2:
+        t += timedelta(days=nday)
+        ends.append(t)
+
+    ioc = read_list('IOC')
+    stations = {i: (x, y, d) for i, x, y, d in zip(ioc['id'], ioc['lon'], ioc['lat'], ioc['descr'])}
+    limiter = RateLimiter(RATE)
+    connector = aiohttp.TCPConnector(limit=CONNECTIONS, limit_per_host=CONNECTIONS_PER_HOST)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    stats = {'requests': 0, 'rows': 0}
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def window(station, end):
+            url = (f"{url0}bgraph.php?code={station}&output=tab&period={nday}"
+                   f"&endtime={end:%Y-%m-%d}")
+            rows = await fetch(session, limiter, url, parse=parse_rows)
+            stats['requests'] += 1
+            stats['rows'] += len(rows[0]) if rows else 0
+            return rows or ([], [])
+
+        async def one_station(station):
+            rows = await asyncio.gather(*[window(station, end) for end in ends])
+            times = [t for r in rows for t in r[0]]
+            values = [v for r in rows for v in r[1]]
+            hours, zeta = hourly(times, values, tlims)
+            if np.isnan(zeta).all():
+                print(f"---- {station}: no data")
+                return None
+            lon, lat, descr = await station_info(session, limiter, station, stations)
+            sta = {'id': station, 'descr': descr, 'lon': lon, 'lat': lat,
+                   'time': hours, 'zeta': zeta}
+            fout = os.path.join(outdir, f"IOC_zeta_{station}_{t1:%Y%m%d}_{t2:%Y%m%d}.nc")
+            ioc_archive_one(fout, sta)
+            print(f"---- {station}: {fout}")
+            return station
+
+        done = await asyncio.gather(*[one_station(station) for station in ids])
+
+    return [station for station in done if station is not None], stats
+
+
+def harvest(ids, outdir, tlims, nday=NDAY):
+    """
+    Download the stations ids from tlims[0] to tlims[1] (datetimes) into
+    outdir. Returns the stations with data, as IOC_download.m.
+    """
+    print('----- IOC download -----')
+    os.makedirs(outdir, exist_ok=True)
+    t0 = time.time()
+    ids_out, stats = asyncio.run(_harvest(list(ids), outdir, tlims, nday))
+    elapsed = max(time.time() - t0, 1e-9)
+    print(f"---- {stats['requests']} requests, {stats['rows']} rows in {elapsed:.1f} s "
+          f"({stats['requests'] / elapsed:.1f} requests/s)")
+    return ids_out
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 5:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    tlims = [datetime.strptime(sys.argv[1], '%Y%m%d'), datetime.strptime(sys.argv[2], '%Y%m%d')]
+    outdir = sys.argv[3]
+    ids = sys.argv[4:]
+
+    harvest(ids, outdir, tlims)
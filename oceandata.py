@@ -0,0 +1,189 @@
+"""
+One entry point for the download_*.py scripts, to download several
+products and date ranges in one process.
+
+Every product is a module of the registry, imported only when it runs, so
+the heavy libraries (copernicusmarine, pygrib, netCDF4, numpy) are only
+loaded for the products that are asked for. The products run in one
+thread pool (one at a time by default, see WORKERS), and share the
+interpreter, the CMEMS login, the thread pools of download_utils and the
+manifest of the output directory; the date ranges of one product run one
+after the other. The start-up time (interpreter and imports) is reported
+with every run, and the cold start of every product can be measured in
+new processes with "startup".
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import time
+
+# Start of the imports of this script, for the start-up time
+T0 = time.perf_counter()
+
+import os
+import re
+import sys
+import importlib
+import subprocess
+from datetime import datetime
+
+from products import PRODUCTS
+
+# Number of products run at the same time; the NetCDF library (HDF5) is
+# usually not built thread-safe, so more than 1 needs a thread-safe build
+WORKERS = 1
+
+# Usage instructions
+USAGE = """
+Usage: python oceandata.py product[,product ...] [start_date] [end_date] [product ...]
+       python oceandata.py startup [product ...]
+
+Arguments:
+  product       ssh, sss, ostia, swh, ghrsst or rtghr; every group of products
+                is followed by its dates
+  start_date    Start date in yyyymmdd format (optional, defaults to current date)
+  end_date      End date in yyyymmdd format (optional, defaults to start_date)
+  startup       Measure the cold start of the products in new processes
+
+Example:
+  python oceandata.py ssh,ostia 20240101 20240131 rtghr
+"""
+
+
+def process_age():
+    # Seconds since the start of this process (None without /proc)
+    try:
+        with open('/proc/self/stat') as f:
+            start = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start / os.sysconf('SC_CLK_TCK')
+
+
+def load(product):
+    # Import the module of a product; returns it and the import time
+    t0 = time.perf_counter()
+    module = importlib.import_module(PRODUCTS[product]['module'])
+    return module, time.perf_counter() - t0
+
+
+def parse_jobs(args):
+    """
+    The (product, start_date, end_date) of the command line: groups of
+    comma-separated products, each followed by zero, one or two dates.
+    """
+    groups = []
+    for arg in args:
+        if re.fullmatch(r'\d{8}', arg):
+            if not groups or len(groups[-1][1]) == 2:
+                raise ValueError(f"Unexpected date {arg}")
+            groups[-1][1].append(datetime.strptime(arg, '%Y%m%d'))
+            continue
+        products = arg.split(',')
+        unknown = [p for p in products if p not in PRODUCTS]
+        if unknown:
+            raise ValueError(f"Unknown products: {', '.join(unknown)}")
+        groups.append((products, []))
+
+    jobs = []
+    for products, dates in groups:
+        start_date = dates[0] if dates else datetime.now()
+        end_date = dates[-1] if dates else start_date
+        jobs += [(product, start_date, end_date) for product in products]
+    return jobs
+
+
+def run_product(product, ranges):
+    # Run the date ranges of one product; returns its totals
+    module, import_time = load(product)
+    print(f"---- {product}: {PRODUCTS[product]['module']} imported in {import_time:.2f} s")
+    nfile, nbytes, elapsed, failed = 0, 0, 0.0, 0
+    for start_date, end_date in ranges:
+        try:
+            n, b, e = module.main(start_date, end_date)
+        except (Exception, SystemExit) as e:
+            print(f"---- {product} {start_date:%Y%m%d}-{end_date:%Y%m%d} failed: {e!r}")
+            failed += 1
+            continue
+        nfile, nbytes, elapsed = nfile + n, nbytes + b, elapsed + e
+    return {'files': nfile, 'bytes': nbytes, 'seconds': elapsed, 'import': import_time,
+            'failed': failed}
+
+
+def run(jobs, workers=WORKERS):
+    """
+    Run the jobs (product, start_date, end_date), workers products at a
+    time. Returns the totals of every product.
+    """
+    # Imported here, with the network libraries, only when there is work
+    from download_utils import thread_pool
+
+    ranges = {}
+    for product, start_date, end_date in jobs:
+        ranges.setdefault(product, []).append((start_date, end_date))
+
+    pool = thread_pool('products', workers)
+    futures = {product: pool.submit(run_product, product, r) for product, r in ranges.items()}
+    return {product: future.result() for product, future in futures.items()}
+
+
+def startup(products, repeat=3):
+    # Cold start (s) of the interpreter, of this script and of every product, in new processes
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def cold(code):
+        times = []
+        for k in range(repeat):
+            t0 = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', code], cwd=here,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if result.returncode != 0:
+                return None
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    base = cold('pass')
+    cli = cold('import oceandata')
+    print(f"{'interpreter':14s}{base:7.3f} s")
+    print(f"{'oceandata.py':14s}{cli:7.3f} s  (+{cli - base:.3f} s)")
+    for product in products:
+        t = cold(f"import oceandata; oceandata.load({product!r})")
+        if t is None:
+            print(f"{product:14s}    not available (missing libraries)")
+        else:
+            print(f"{product:14s}{t:7.3f} s  (+{t - cli:.3f} s)")
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) > 1 and sys.argv[1] == 'startup':
+        startup(sys.argv[2:] or list(PRODUCTS))
+        sys.exit()
+    try:
+        jobs = parse_jobs(sys.argv[1:])
+    except ValueError as e:
+        print(e)
+        jobs = []
+    if not jobs:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+
+    imports = time.perf_counter() - T0
+    age = process_age()
+    if age is None:
+        print(f"---- Started, imports in {imports:.2f} s")
+    else:
+        print(f"---- Started in {age:.2f} s (interpreter {age - imports:.2f} s, "
+              f"imports {imports:.2f} s)")
+
+    t0 = time.perf_counter()
+    totals = run(jobs)
+    print(f"---- {len(totals)} products in {time.perf_counter() - t0:.1f} s")
+    for product, total in totals.items():
+        print(f"     {product:7s} {total['files']:5d} files  {total['bytes'] / 1e6:9.1f} MB  "
+              f"{total['seconds']:7.1f} s  import {total['import']:.2f} s"
+              + (f"  {total['failed']} failed" if total['failed'] else ""))
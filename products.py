@@ -0,0 +1,46 @@
+"""
+Registry of the products of the download_*.py scripts, shared by
+oceandata.py, scheduler.py, datacube.py and the download benchmark.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+# Products: module of the download script, prefix of its daily files,
+# days between two files and date of the first file (weekly products),
+# whether the script takes a single date, and for the scheduler the poll
+# cadence (h), days the data stay on the server (None: archive), window
+# of recent days to keep complete and connections used by the script
+PRODUCTS = {
+    'ssh': {'module': 'download_ssh_nrt_0p25', 'prefix': 'SSH_NRT_0p25', 'step': 1,
+            'single_date': False,
+            'cadence': 6, 'retention': None, 'window': 10, 'connections': 1},
+    'sss': {'module': 'download_sss_smos-oi_0p25', 'prefix': 'SSS_SMOS-OI_0p25', 'step': 7,
+            'first_date': '20101227', 'single_date': False,
+            'cadence': 24, 'retention': None, 'window': 28, 'connections': 1},
+    'ostia': {'module': 'download_sst_ostia_0p05', 'prefix': 'SST_OSTIA_0p05', 'step': 1,
+              'single_date': False,
+              'cadence': 12, 'retention': None, 'window': 10, 'connections': 1},
+    'swh': {'module': 'download_swh_nrt_2p00', 'prefix': 'SWH_NRT_2p00', 'step': 1,
+            'single_date': False,
+            'cadence': 6, 'retention': None, 'window': 10, 'connections': 1},
+    'ghrsst': {'module': 'download_sst_ghrsst_0p01', 'prefix': 'SST_GHRSST_0p01', 'step': 1,
+               'single_date': False,
+               'cadence': 12, 'retention': None, 'window': 10, 'connections': 4},
+    'rtghr': {'module': 'download_sst_rtghr_0p083', 'prefix': 'SST_RTGHR_0p083', 'step': 1,
+              'single_date': True,
+              'cadence': 1, 'retention': 2, 'window': 2, 'connections': 1},
+}
+
+
+def script(product):
+    # File name of the download script of a product
+    return f"{PRODUCTS[product]['module']}.py"
+
+
+def product_step(prefix):
+    # Days between two files of the product of prefix (1 for unknown prefixes)
+    for info in PRODUCTS.values():
+        if info['prefix'] == prefix:
+            return info['step']
+    return 1
@@ -0,0 +1,306 @@
+"""
+This script converts the GTSPP (.gz/.dat, from GTSPP_download.m) and ARGO
+(ARGO_{ocean}_{yyyymmdd}.nc, from ARGO_download.m) profile files into one
+indexed profile archive, so that a query does not parse the raw files
+again.
+
+The archive is a CF contiguous ragged-array NetCDF4 file (featureType =
+profile): one header row per profile (lon, lat, time, row_size, ...) and
+the depths and values of all the profiles concatenated along obs.
+
+Every batch of profiles is sorted by month and by lat/lon cell (10 x 10
+degrees by default) before it is appended, and the bucket table records
+where the profiles of every (month, cell) start. A query first reads the
+bucket table, then only the headers of the matching buckets, and finally
+only the depths and values of the profiles that pass the exact time and
+polygon test.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from netCDF4 import Dataset
+
+from argo_read import argo_read_file, JULD_EPOCH
+from geo_utils import lon_180, box_polygon, inpolygon_lonlat
+from gtspp_read import gtspp_read
+
+# Size (degree) of the lat/lon cells of the index
+CELL_SIZE = 10
+# Chunk sizes of the profile headers and of the observations
+CHUNK_PROFILES = 4096
+CHUNK_OBS = 65536
+# Compression level (0-9)
+COMPLEVEL = 4
+
+TIME_UNITS = 'days since 1950-01-01 00:00:00'
+SOURCES = {'GTSPP': 1, 'ARGO': 2}
+
+# Usage instructions
+USAGE = """
+Usage: python profile_archive.py archive fin [fin ...]
+
+Arguments:
+  archive       Archive file, created if it does not exist
+  fin           GTSPP (.gz or .dat) or ARGO (.nc) files to add
+
+Example:
+  python profile_archive.py profiles.nc GTSPP_*.dat ARGO_*.nc
+"""
+
+
+def read_profiles(fin):
+    # Read a GTSPP or an ARGO file into the ragged dict, with its source
+    if fin.endswith('.nc'):
+        return argo_read_file(fin), 'ARGO'
+    return gtspp_read(fin), 'GTSPP'
+
+
+def _months(times):
+    # Months since 1970-01 of datetime64 values
+    return np.asarray(times, dtype='datetime64[M]').astype(np.int64)
+
+
+def _cells(lon, lat, cell_size):
+    # Row and column of the index cell of every point
+    nrow = int(np.ceil(180 / cell_size))
+    ncol = int(np.ceil(360 / cell_size))
+    row = np.clip(np.floor((np.asarray(lat) + 90) / cell_size), 0, nrow - 1).astype(np.int64)
+    col = np.clip(np.floor((lon_180(lon) + 180) / cell_size), 0, ncol - 1).astype(np.int64)
+    return row, col, ncol
+
+
+def create_archive(fout, cell_size=CELL_SIZE, complevel=COMPLEVEL):
+    # Create an empty archive
+    with Dataset(fout, 'w', format='NETCDF4') as nc:
+        nc.Conventions = 'CF-1.8'
+        nc.featureType = 'profile'
+        nc.cell_size = np.float64(cell_size)
+        nc.archive = 'OceanData (https://github.com/SiqiLiOcean/OceanData)'
+        nc.createDimension('profile', None)
+        nc.createDimension('obs', None)
+        nc.createDimension('bucket', None)
+        nc.createDimension('file', None)
+
+        def variable(name, dtype, dim, chunk, **attrs):
+            var = nc.createVariable(name, dtype, (dim,), zlib=complevel > 0,
+                                    complevel=complevel, chunksizes=(chunk,))
+            var.setncatts(attrs)
+
+        # Profile headers
+        variable('lon', np.float64, 'profile', CHUNK_PROFILES,
+                 standard_name='longitude', units='degree_east')
+        variable('lat', np.float64, 'profile', CHUNK_PROFILES,
+                 standard_name='latitude', units='degree_north')
+        variable('time', np.float64, 'profile', CHUNK_PROFILES,
+                 standard_name='time', units=TIME_UNITS)
+        variable('row_size', np.int32, 'profile', CHUNK_PROFILES,
+                 long_name='number of observations of the profile', sample_dimension='obs')
+        variable('obs_start', np.int64, 'profile', CHUNK_PROFILES,
+                 long_name='index of the first observation of the profile')
+        variable('source', np.int8, 'profile', CHUNK_PROFILES,
+                 flag_values=np.array(list(SOURCES.values()), dtype=np.int8),
+                 flag_meanings=' '.join(SOURCES))
+
+        # Observations
+        variable('z', np.float32, 'obs', CHUNK_OBS,
+                 long_name='depth (GTSPP) or pressure (ARGO)', units='m or dbar')
+        variable('t', np.float32, 'obs', CHUNK_OBS,
+                 long_name='temperature', units='degree_C')
+        variable('s', np.float32, 'obs', CHUNK_OBS,
+                 long_name='salinity', units='psu')
+
+        # Index
+        variable('bucket_month', np.int32, 'bucket', 1024,
+                 long_name='month of the bucket', units='months since 1970-01')
+        variable('bucket_cell', np.int32, 'bucket', 1024,
+                 long_name='lat/lon cell of the bucket (row * ncol + col)')
+        variable('bucket_start', np.int64, 'bucket', 1024,
+                 long_name='index of the first profile of the bucket')
+        variable('bucket_count', np.int64, 'bucket', 1024,
+                 long_name='number of profiles of the bucket')
+        nc.createVariable('file_name', str, ('file',)).long_name = 'files added'
+
+
+def append_profiles(fout, data, source):
+    """
+    Append the profiles of one ragged dict to the archive, sorted by month
+    and cell, and add their buckets to the index. Returns the number of
+    profiles added.
+    """
+    # Profiles with no position or time can not be indexed (nor found by
+    # ARGO_read.m), they are left out
+    valid = np.isfinite(data['lon']) & np.isfinite(data['lat']) & ~np.isnat(data['time'])
+    if not valid.all():
+        keep = np.repeat(valid, data['row_size'])
+        data = {key: (values[keep] if key in ('z', 't', 's') else values[valid])
+                for key, values in data.items()}
+    n = len(data['lon'])
+    if n == 0:
+        return 0
+
+    with Dataset(fout, 'a') as nc:
+        cell_size = float(nc.cell_size)
+        row, col, ncol = _cells(data['lon'], data['lat'], cell_size)
+        month = _months(data['time'])
+        cell = row * ncol + col
+        order = np.lexsort((cell, month))
+
+        # Observations in the order of the sorted profiles
+        row_size = np.asarray(data['row_size'], dtype=np.int64)[order]
+        offsets = np.cumsum(data['row_size']) - data['row_size']
+        out_offsets = np.cumsum(row_size) - row_size
+        obs = np.repeat(offsets[order] - out_offsets, row_size) + np.arange(row_size.sum())
+
+        np0 = len(nc.dimensions['profile'])
+        no0 = len(nc.dimensions['obs'])
+        days = (np.asarray(data['time'], dtype='datetime64[s]') - JULD_EPOCH) / np.timedelta64(1, 'D')
+        nc.variables['lon'][np0:np0 + n] = np.asarray(data['lon'])[order]
+        nc.variables['lat'][np0:np0 + n] = np.asarray(data['lat'])[order]
+        nc.variables['time'][np0:np0 + n] = days[order]
+        nc.variables['row_size'][np0:np0 + n] = row_size
+        nc.variables['obs_start'][np0:np0 + n] = no0 + out_offsets
+        nc.variables['source'][np0:np0 + n] = np.full(n, SOURCES[source], dtype=np.int8)
+        if len(obs):
+            for key in ('z', 't', 's'):
+                nc.variables[key][no0:no0 + len(obs)] = np.asarray(data[key])[obs]
+
+        # Buckets: runs of the same (month, cell)
+        month, cell = month[order], cell[order]
+        first = np.flatnonzero(np.r_[True, (month[1:] != month[:-1]) | (cell[1:] != cell[:-1])])
+        nb0 = len(nc.dimensions['bucket'])
+        nb = len(first)
+        nc.variables['bucket_month'][nb0:nb0 + nb] = month[first]
+        nc.variables['bucket_cell'][nb0:nb0 + nb] = cell[first]
+        nc.variables['bucket_start'][nb0:nb0 + nb] = np0 + first
+        nc.variables['bucket_count'][nb0:nb0 + nb] = np.diff(np.r_[first, n])
+
+    return n
+
+
+def convert(fout, fins, cell_size=CELL_SIZE):
+    # Add the GTSPP/ARGO files to the archive; the files already added are skipped
+    if not os.path.isfile(fout):
+        print(f"---- Create {fout}")
+        create_archive(fout, cell_size)
+    with Dataset(fout) as nc:
+        added = set(nc.variables['file_name'][:])
+
+    t0 = time.time()
+    total = 0
+    for fin in fins:
+        name = os.path.basename(fin)
+        if name in added:
+            print(f"     {name} is already in the archive, skipped.")
+            continue
+        data, source = read_profiles(fin)
+        n = append_profiles(fout, data, source)
+        with Dataset(fout, 'a') as nc:
+            var = nc.variables['file_name']
+            var[len(var)] = name
+        added.add(name)
+        total += n
+        print(f"---- Add {n} {source} profiles from {name}")
+    print(f"---- {total} profiles added in {time.time() - t0:.1f} s")
+
+    return total
+
+
+def _runs(index):
+    # Runs of consecutive integers, as (first, last + 1) pairs
+    if len(index) == 0:
+        return []
+    cut = np.flatnonzero(np.diff(index) != 1) + 1
+    starts = np.r_[index[0], index[cut]]
+    stops = np.r_[index[cut - 1], index[-1]] + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def query(fout, tlims=None, xlims=None, ylims=None, poly=None):
+    """
+    Read the profiles of the archive in a time range and a polygon.
+
+    tlims is an optional [start, end] pair of datetimes, poly an optional
+    (n, 2) lon/lat polygon (by default the xlims/ylims box, as in
+    ARGO_read.m). Returns the ragged-array dict of gtspp_read.py.
+    """
+    if poly is None and (xlims is not None or ylims is not None):
+        poly = box_polygon(xlims if xlims is not None else [-180, 180],
+                           ylims if ylims is not None else [-90, 90])
+    if tlims is not None:
+        tlims = [np.datetime64(t, 's') for t in tlims]
+        dlims = [(t - JULD_EPOCH) / np.timedelta64(1, 'D') for t in tlims]
+
+    with Dataset(fout) as nc:
+        # Buckets that may have matching profiles
+        month = nc.variables['bucket_month'][:]
+        cell = nc.variables['bucket_cell'][:]
+        keep = np.ones(len(month), dtype=bool)
+        if tlims is not None:
+            keep &= (month >= _months(tlims[0])) & (month <= _months(tlims[1]))
+        if poly is not None:
+            poly = np.asarray(poly, dtype=float)
+            row, col, ncol = _cells(poly[:, 0], poly[:, 1], float(nc.cell_size))
+            keep &= ((cell // ncol >= row.min()) & (cell // ncol <= row.max())
+                     & (cell % ncol >= col.min()) & (cell % ncol <= col.max()))
+        start = nc.variables['bucket_start'][keep]
+        count = nc.variables['bucket_count'][keep]
+        profiles = np.unique(np.concatenate(
+            [np.arange(a, a + c) for a, c in zip(start.tolist(), count.tolist())] or [[]]
+        )).astype(np.int64)
+
+        # Profile headers of the buckets, then the exact test
+        header = {key: [] for key in ('lon', 'lat', 'time', 'row_size', 'obs_start')}
+        for a, b in _runs(profiles):
+            for key in header:
+                header[key].append(nc.variables[key][a:b])
+        header = {key: np.concatenate(values) if values else np.zeros(0)
+                  for key, values in header.items()}
+        inside = np.ones(len(profiles), dtype=bool)
+        if tlims is not None:
+            inside &= (header['time'] >= dlims[0]) & (header['time'] <= dlims[1])
+        if poly is not None:
+            inside &= inpolygon_lonlat(header['lon'], header['lat'], poly)
+        header = {key: values[inside] for key, values in header.items()}
+
+        # Observations of the selected profiles, one read per run of profiles
+        row_size = header['row_size'].astype(np.int64)
+        obs = {key: [] for key in ('z', 't', 's')}
+        k = 0
+        for a, b in _runs(profiles[inside]):
+            o1 = int(header['obs_start'][k])
+            n = int(row_size[k:k + b - a].sum())
+            for key in obs:
+                obs[key].append(nc.variables[key][o1:o1 + n])
+            k += b - a
+
+    # Plain arrays, as returned by gtspp_read and argo_read
+    header = {key: np.ma.filled(values.astype(float), np.nan) for key, values in header.items()}
+    seconds = np.round(header['time'] * 86400).astype('timedelta64[s]')
+    out = {
+        'lon': header['lon'],
+        'lat': header['lat'],
+        'time': JULD_EPOCH + seconds,
+        'row_size': np.ma.filled(row_size, 0),
+    }
+    for key, values in obs.items():
+        out[key] = np.ma.filled(np.concatenate(values), np.nan).astype(float) \
+            if values else np.zeros(0)
+    return out
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 3:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    fout = sys.argv[1]
+    fins = sys.argv[2:]
+
+    convert(fout, fins)
@@ -0,0 +1,298 @@
+"""
+This script puts the daily files of one product ({prefix}_{yyyymmdd}.nc)
+on the grid of another product, e.g. MUR 0.01 and OSTIA 0.05 on the RTGHR
+0.083 grid, for intercomparison.
+
+The interpolation is a sparse matrix (target points x source points),
+bilinear or conservative (area-weighted mean of the overlapping source
+cells). It is built once per source and target grid and cached on disk by
+the hash of the two grids, and every batch of days is then regridded with
+one sparse matrix product. Source cells with no data (land, ice) are left
+out and the remaining weights are renormalized.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import scipy.sparse as sp
+from netCDF4 import Dataset
+
+from download_utils import daily_files
+from station_info import CACHE_DIRECTORY
+from station_extract import grid_coordinates, station_weights
+
+# Number of days regridded at once
+BATCH_DAYS = 8
+# Compression level (0-9)
+COMPLEVEL = 4
+
+# Time of the daily files without a time variable (e.g. RTGHR)
+TIME_UNITS = 'days since 1970-01-01 00:00:00'
+EPOCH = datetime(1970, 1, 1)
+
+# Usage instructions
+USAGE = """
+Usage: python regrid.py prefix target out_prefix [method] [directory]
+
+Arguments:
+  prefix        Product prefix, e.g. SST_GHRSST_0p01
+  target        A file on the target grid, e.g. SST_RTGHR_0p083_20240101.nc
+  out_prefix    Prefix of the regridded files
+  method        bilinear or conservative (optional, defaults to bilinear)
+  directory     Directory of the daily files (optional, defaults to ./)
+
+Example:
+  python regrid.py SST_GHRSST_0p01 SST_RTGHR_0p083_20240101.nc SST_GHRSST_on_0p083 conservative
+"""
+
+
+def _periodic(lon):
+    # Whether a 1-D longitude axis covers the globe
+    dlon = np.abs(np.diff(lon)).mean()
+    return abs(lon[-1] - lon[0]) + dlon >= 360 - 1e-6
+
+
+def _lon_origin(src_lon):
+    # Start of the 360-degree window centred on the source longitudes
+    return (np.min(src_lon) + np.max(src_lon)) / 2 - 180
+
+
+def _wrap(lon, origin):
+    # Longitudes in the 360-degree window that starts at origin
+    return origin + (np.asarray(lon, dtype=float) - origin) % 360
+
+
+def bilinear_weights(src_lat, src_lon, dst_lat, dst_lon):
+    # Bilinear weights of the target grid points on the source grid
+    lon2, lat2 = np.meshgrid(_wrap(dst_lon, _lon_origin(src_lon)), dst_lat)
+    j, i, w = station_weights(src_lat, src_lon, lat2.ravel(), lon2.ravel())
+    w[~np.isfinite(w).all(axis=1)] = 0.0
+    rows = np.repeat(np.arange(len(w)), 4)
+    cols = (j * len(src_lon) + i).ravel()
+    weights = sp.csr_matrix((w.ravel(), (rows, cols)), shape=(len(w), len(src_lat) * len(src_lon)))
+    weights.eliminate_zeros()
+    return weights
+
+
+def _edges(x):
+    # Cell edges of the points of a 1-D axis
+    mid = (x[1:] + x[:-1]) / 2
+    return np.concatenate([[2 * x[0] - mid[0]], mid, [2 * x[-1] - mid[-1]]])
+
+
+def _overlaps(src, dst, transform=None, period=None, origin=None):
+    """
+    Overlap (n_dst x n_src sparse) of the cells of two 1-D axes, measured
+    in transform(x) (e.g. sin(lat) for the area). With period, the source
+    axis wraps around. With origin, the target cells are first moved into
+    the 360-degree window that starts there (longitudes).
+    """
+    src_edges = _edges(src)
+    dst_edges = _edges(dst)
+    n = len(src)
+    src_lo = np.minimum(src_edges[:-1], src_edges[1:])
+    src_hi = np.maximum(src_edges[:-1], src_edges[1:])
+    src_index = np.arange(n)
+    if period is not None:
+        src_lo = np.concatenate([src_lo - period, src_lo, src_lo + period])
+        src_hi = np.concatenate([src_hi - period, src_hi, src_hi + period])
+        src_index = np.tile(src_index, 3)
+    order = np.argsort(src_lo)
+    src_lo, src_hi, src_index = src_lo[order], src_hi[order], src_index[order]
+    dst_lo = np.minimum(dst_edges[:-1], dst_edges[1:])
+    dst_hi = np.maximum(dst_edges[:-1], dst_edges[1:])
+    if origin is not None:
+        shift = _wrap(dst_lo, origin) - dst_lo
+        dst_lo, dst_hi = dst_lo + shift, dst_hi + shift
+
+    # Source cells k1:k2 may overlap every target cell (the cells are sorted and disjoint)
+    k1 = np.searchsorted(src_hi, dst_lo, side='right')
+    k2 = np.searchsorted(src_lo, dst_hi, side='left')
+    count = np.maximum(k2 - k1, 0)
+    rows = np.repeat(np.arange(len(dst)), count)
+    k = np.repeat(k1 - np.cumsum(count) + count, count) + np.arange(count.sum())
+    lo = np.maximum(src_lo[k], dst_lo[rows])
+    hi = np.minimum(src_hi[k], dst_hi[rows])
+    if transform is not None:
+        lo, hi = transform(lo), transform(hi)
+    overlap = np.maximum(hi - lo, 0)
+    return sp.csr_matrix((overlap, (rows, src_index[k])), shape=(len(dst), n))
+
+
+def conservative_weights(src_lat, src_lon, dst_lat, dst_lon):
+    # Area of the overlap of every target cell with every source cell
+    def sin_lat(lat):
+        return np.sin(np.radians(np.clip(lat, -90, 90)))
+
+    wy = _overlaps(src_lat, dst_lat, transform=sin_lat)
+    wx = _overlaps(src_lon, dst_lon, period=360 if _periodic(src_lon) else None,
+                   origin=_lon_origin(src_lon))
+    weights = sp.kron(wy, wx, format='csr')
+    weights.eliminate_zeros()
+    return weights
+
+
+def cached_weights(src_lat, src_lon, dst_lat, dst_lon, method='bilinear',
+                   cache_directory=CACHE_DIRECTORY):
+    # Regridding weights, cached on disk by the hash of the two grids and the method
+    builders = {'bilinear': bilinear_weights, 'conservative': conservative_weights}
+    if method not in builders:
+        raise ValueError(f"Unknown regridding method: {method}")
+    sha = hashlib.sha1(method.encode())
+    for array in (src_lat, src_lon, dst_lat, dst_lon):
+        sha.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    # (v2: the target longitudes are put in the convention of the source)
+    path = os.path.join(cache_directory, f"regrid_v2_{sha.hexdigest()}.npz")
+    if os.path.isfile(path):
+        return sp.load_npz(path)
+
+    weights = builders[method](src_lat, src_lon, dst_lat, dst_lon)
+    if weights.nnz == 0:
+        raise ValueError("The source and target grids do not overlap")
+    os.makedirs(cache_directory, exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    sp.save_npz(tmp_path, weights)
+    os.replace(tmp_path, path)
+    return weights
+
+
+def apply_weights(weights, fields, shape):
+    """
+    Regrid a batch of fields (nt, ny, nx) to the target shape (ny, nx) with
+    one sparse product. The source points with no data are left out.
+    """
+    fields = np.ma.filled(np.ma.asarray(fields).astype(np.float64), np.nan)
+    values = fields.reshape(len(fields), -1).T
+    valid = np.isfinite(values)
+    total = weights @ np.where(valid, values, 0.0)
+    norm = weights @ valid.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = np.where(norm > 0, total / norm, np.nan)
+    return out.T.reshape(len(fields), *shape)
+
+
+def time_variable(dst, src):
+    # Create the time variable of dst like the one of the daily file src,
+    # or in days since 1970 if src has none (RTGHR)
+    if 'time' in src.variables:
+        time_in = src.variables['time']
+        time_var = dst.createVariable('time', time_in.dtype, ('time',))
+        time_var.setncatts({k: v for k, v in time_in.__dict__.items() if k != '_FillValue'})
+    else:
+        time_var = dst.createVariable('time', np.float64, ('time',))
+        time_var.long_name = 'time'
+        time_var.units = TIME_UNITS
+    return time_var
+
+
+def file_time(src, date_str):
+    # Time of a daily file: its time variable, or its date (yyyymmdd)
+    if 'time' in src.variables:
+        return src.variables['time'][:]
+    days = (datetime.strptime(date_str, '%Y%m%d') - EPOCH).days
+    return np.full(len(src.dimensions['time']), days, dtype=np.float64)
+
+
+def _create_output(fout, src, names, dst_lat, dst_lon, complevel=COMPLEVEL):
+    # Create a regridded daily file with the attributes of the source file
+    with Dataset(fout, 'w', format='NETCDF4') as dst:
+        dst.setncatts(src.__dict__)
+        dst.createDimension('time', None)
+        dst.createDimension('lat', len(dst_lat))
+        dst.createDimension('lon', len(dst_lon))
+        time_variable(dst, src)
+        lat_var = dst.createVariable('lat', np.float64, ('lat',))
+        lat_var.standard_name = 'latitude'
+        lat_var.units = 'degrees_north'
+        lon_var = dst.createVariable('lon', np.float64, ('lon',))
+        lon_var.standard_name = 'longitude'
+        lon_var.units = 'degrees_east'
+        lat_var[:] = dst_lat
+        lon_var[:] = dst_lon
+        for name in names:
+            attrs = {k: v for k, v in src.variables[name].__dict__.items()
+                     if k not in ('_FillValue', 'scale_factor', 'add_offset',
+                                  'valid_min', 'valid_max')}
+            var = dst.createVariable(name, np.float32, ('time', 'lat', 'lon'), zlib=complevel > 0,
+                                     complevel=complevel, fill_value=np.float32(np.nan))
+            var.setncatts(attrs)
+        dst.history = f"regridded from {src.filepath()}"
+
+
+def regrid_files(prefix, target, out_prefix, method='bilinear', directory='./',
+                 batch_days=BATCH_DAYS):
+    """
+    Regrid the daily files of prefix in directory onto the grid of the
+    target file, into {out_prefix}_{yyyymmdd}.nc. Days already regridded
+    are skipped. Returns the number of days written.
+    """
+    files = [(date_str, path) for date_str, path in daily_files(prefix, directory)
+             if not os.path.isfile(os.path.join(directory, f"{out_prefix}_{date_str}.nc"))]
+    if not files:
+        print(f"---- No new {prefix} files in {directory}")
+        return 0
+
+    with Dataset(target) as nc:
+        (_, dst_lat), (_, dst_lon) = grid_coordinates(nc)
+    with Dataset(files[0][1]) as nc:
+        (ydim, src_lat), (xdim, src_lon) = grid_coordinates(nc)
+        names = [name for name, var in nc.variables.items()
+                 if var.ndim == 3 and var.dimensions[1:] == (ydim, xdim)]
+
+    t0 = time.time()
+    weights = cached_weights(src_lat, src_lon, dst_lat, dst_lon, method)
+    print(f"---- {method} weights: {weights.shape[0]} x {weights.shape[1]}, "
+          f"{weights.nnz} non-zeros ({time.time() - t0:.1f} s)")
+
+    t0 = time.time()
+    shape = (len(dst_lat), len(dst_lon))
+    for b in range(0, len(files), batch_days):
+        batch = files[b:b + batch_days]
+        sources = [Dataset(path) for date_str, path in batch]
+        try:
+            for name in names:
+                fields = np.ma.concatenate([src.variables[name][:] for src in sources])
+                regridded = apply_weights(weights, fields, shape)
+                k = 0
+                for (date_str, path), src in zip(batch, sources):
+                    nt = len(src.variables[name])
+                    fout = os.path.join(directory, f"{out_prefix}_{date_str}.nc")
+                    if name == names[0]:
+                        # Recreate any .part left by an interrupted run
+                        _create_output(fout + '.part', src, names, dst_lat, dst_lon)
+                    with Dataset(fout + '.part', 'a') as dst:
+                        dst.variables['time'][:] = file_time(src, date_str)
+                        dst.variables[name][:] = regridded[k:k + nt]
+                    k += nt
+        finally:
+            for src in sources:
+                src.close()
+        for date_str, path in batch:
+            fout = os.path.join(directory, f"{out_prefix}_{date_str}.nc")
+            os.replace(fout + '.part', fout)
+        print(f"---- {batch[-1][0]}: {b + len(batch)} of {len(files)} days")
+    print(f"---- {len(files)} days regridded in {time.time() - t0:.1f} s")
+
+    return len(files)
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 4 or len(sys.argv) > 6:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    prefix = sys.argv[1]
+    target = sys.argv[2]
+    out_prefix = sys.argv[3]
+    method = sys.argv[4] if len(sys.argv) > 4 else 'bilinear'
+    directory = sys.argv[5] if len(sys.argv) > 5 else './'
+
+    regrid_files(prefix, target, out_prefix, method, directory)
@@ -0,0 +1,271 @@
+"""
+This script runs the download_*.py scripts as a long-running scheduler, so
+that the near-real-time products are kept up to date without cron and a
+missed run does not lose data (NCEP keeps only the last 2 days of RTGHR).
+
+Every product is polled on its own cadence. The dates of its recent window
+that have no {prefix}_{yyyymmdd}.nc file yet are added to a queue, which
+is kept in scheduler_queue.json in the output directory and so survives
+restarts. The queued dates are downloaded by running the product script;
+the dates still missing afterwards (failed, or not published yet) are
+tried again later, with a growing delay, until they drop out of the
+window. The products whose data stay on the server for the shortest time
+run first, and independent products run at the same time within a global
+budget of connections and bandwidth. The bandwidth is shared by the
+urlDownload transfers (download_utils.MAX_RATE); the CMEMS downloads only
+count against the connections.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+from datetime import datetime, timedelta
+
+from download_utils import date_list
+from products import PRODUCTS, script
+
+# Settings
+output_directory = './'
+# Seconds between two passes of the main loop
+POLL = 60
+# Global budget: connections and download rate (bytes/s, None: no limit)
+CONNECTIONS = 8
+BANDWIDTH = None
+# Delay (s) before a missing date is tried again, doubled after every
+# try up to MAX_BACKOFF
+BACKOFF = 600
+MAX_BACKOFF = 6 * 3600
+QUEUE_NAME = 'scheduler_queue.json'
+
+# Usage instructions
+USAGE = """
+Usage: python scheduler.py [product ...]
+       python scheduler.py once [product ...]
+       python scheduler.py status
+
+Arguments:
+  product       rtghr, ssh, swh, ostia, ghrsst or sss (optional, defaults to all)
+  once          Poll every product once and stop when nothing is left to run
+  status        Print the queue
+
+Example:
+  python scheduler.py rtghr ostia
+"""
+
+
+def window_dates(product, today):
+    # Dates of the window of a product, up to today
+    info = PRODUCTS[product]
+    start = today - timedelta(days=info['window'] - 1)
+    step = info['step']
+    if step > 1:
+        first = datetime.strptime(info['first_date'], '%Y%m%d')
+        start = first + timedelta(days=step * -(-(start - first).days // step))
+    return date_list(start, today, step)
+
+
+def expired(product, date_str, today):
+    # Whether the data of date_str are no longer on the server
+    retention = PRODUCTS[product]['retention']
+    if retention is None:
+        return False
+    return datetime.strptime(date_str, '%Y%m%d') <= today - timedelta(days=retention)
+
+
+def file_path(product, date_str):
+    return os.path.join(output_directory, f"{PRODUCTS[product]['prefix']}_{date_str}.nc")
+
+
+def load_queue():
+    path = os.path.join(output_directory, QUEUE_NAME)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_queue(queue):
+    path = os.path.join(output_directory, QUEUE_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(queue, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def poll(queue, product, now):
+    # Queue the missing dates of the window and drop the expired ones
+    entry = queue.setdefault(product, {'last_poll': 0, 'dates': {}})
+    today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    for date_str in window_dates(product, today):
+        if date_str not in entry['dates'] and not os.path.isfile(file_path(product, date_str)):
+            entry['dates'][date_str] = {'attempts': 0, 'next': 0}
+    for date_str in sorted(entry['dates']):
+        if expired(product, date_str, today):
+            print(f"---- {product} {date_str}: no longer on the server, dropped")
+            del entry['dates'][date_str]
+    entry['last_poll'] = now
+
+
+def command(product, dates):
+    # Command line of the script of a product for consecutive dates (first to last)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script(product))
+    if PRODUCTS[product]['single_date']:
+        return [sys.executable, path, dates[0]]
+    return [sys.executable, path, dates[0], dates[-1]]
+
+
+def first_run(dates, step=1):
+    # The first dates of a sorted list that follow each other by step days
+    run = dates[:1]
+    for date_str in dates[1:]:
+        gap = datetime.strptime(date_str, '%Y%m%d') - datetime.strptime(run[-1], '%Y%m%d')
+        if gap.days != step:
+            break
+        run.append(date_str)
+    return run
+
+
+def ready_jobs(queue, products, running, now):
+    """
+    The jobs (product, dates) that can start now, most urgent first: the
+    products with the shortest retention, then the oldest dates. The dates
+    of a job follow each other, as the scripts download every date from
+    the first to the last; the other ready dates run in the next jobs.
+    """
+    jobs = []
+    for product in products:
+        if product in running:
+            continue
+        dates = sorted(d for d, e in queue.get(product, {}).get('dates', {}).items()
+                       if e['next'] <= now)
+        if not dates:
+            continue
+        if PRODUCTS[product]['single_date']:
+            dates = dates[:1]
+        dates = first_run(dates, PRODUCTS[product]['step'])
+        retention = PRODUCTS[product]['retention']
+        jobs.append(((retention is None, retention or 0, dates[0]), product, dates))
+    return [(product, dates) for key, product, dates in sorted(jobs)]
+
+
+def launch(product, dates, share):
+    # Start the script of a product for dates, with a share of the bandwidth
+    env = dict(os.environ)
+    if share:
+        env['OCEANDATA_MAX_RATE'] = str(share)
+    log = open(os.path.join(output_directory, f"scheduler_{product}.log"), 'a')
+    log.write(f"\n---- {datetime.now():%Y-%m-%d %H:%M:%S} {' '.join(dates[:1] + dates[-1:])}\n")
+    log.flush()
+    process = subprocess.Popen(command(product, dates), cwd=output_directory, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return process
+
+
+def finish(queue, product, dates, now):
+    # Remove the dates that are now on disk, delay the others
+    entry = queue[product]['dates']
+    done = [d for d in dates if os.path.isfile(file_path(product, d))]
+    for date_str in dates:
+        if date_str not in entry:
+            continue
+        if date_str in done:
+            del entry[date_str]
+            continue
+        entry[date_str]['attempts'] += 1
+        delay = min(BACKOFF * 2 ** (entry[date_str]['attempts'] - 1), MAX_BACKOFF)
+        entry[date_str]['next'] = now + delay
+    missing = len(dates) - len(done)
+    print(f"---- {product} {dates[0]}-{dates[-1]}: {len(done)} done"
+          + (f", {missing} missing, tried again later" if missing else ""))
+
+
+def run(products, once=False):
+    """
+    Poll the products on their cadence and download their missing dates
+    until stopped (SIGINT or SIGTERM). With once, every product is polled
+    once and the function returns when nothing is left to run now.
+    """
+    queue = load_queue()
+    running = {}
+    # SIGTERM stops the loop as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    polled = set()
+    try:
+        while True:
+            now = time.time()
+            # Collect the finished scripts
+            for product, (process, dates, need) in list(running.items()):
+                if process.poll() is not None:
+                    del running[product]
+                    finish(queue, product, dates, now)
+                    save_queue(queue)
+
+            # Poll the products that are due
+            for product in products:
+                last_poll = queue.get(product, {}).get('last_poll', 0)
+                if (once and product not in polled) or (
+                        not once and now - last_poll >= PRODUCTS[product]['cadence'] * 3600):
+                    poll(queue, product, now)
+                    polled.add(product)
+                    save_queue(queue)
+
+            # Start the most urgent jobs that fit in the connection budget
+            used = sum(need for process, dates, need in running.values())
+            for product, dates in ready_jobs(queue, products, running, now):
+                need = min(PRODUCTS[product]['connections'], CONNECTIONS)
+                if used + need > CONNECTIONS:
+                    continue
+                share = BANDWIDTH * need / CONNECTIONS if BANDWIDTH else None
+                print(f"---- {product} {dates[0]}-{dates[-1]}: started")
+                running[product] = (launch(product, dates, share), dates, need)
+                used += need
+
+            if once and not running:
+                break
+            time.sleep(1 if once else POLL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Stop the running scripts; their partial downloads are resumed later
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for product, (process, dates, need) in running.items():
+            process.terminate()
+            process.wait()
+        save_queue(queue)
+
+
+def status():
+    # Print the queued dates of every product
+    queue = load_queue()
+    for product, entry in queue.items():
+        last_poll = datetime.fromtimestamp(entry['last_poll']) if entry['last_poll'] else None
+        print(f"{product}: last poll {last_poll:%Y-%m-%d %H:%M}" if last_poll
+              else f"{product}: never polled")
+        for date_str, e in sorted(entry['dates'].items()):
+            retry = datetime.fromtimestamp(e['next']) if e['next'] else None
+            print(f"  {date_str}  {e['attempts']} tries"
+                  + (f", next at {retry:%Y-%m-%d %H:%M}" if retry else ""))
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    args = sys.argv[1:]
+    if args == ['status']:
+        status()
+        sys.exit()
+    once = bool(args) and args[0] == 'once'
+    products = (args[1:] if once else args) or list(PRODUCTS)
+    unknown = [p for p in products if p not in PRODUCTS]
+    if unknown:
+        print(f"Unknown products: {', '.join(unknown)}")
+        print(USAGE)
+        sys.exit()
+
+    run(products, once)
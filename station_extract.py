@@ -0,0 +1,247 @@
+"""
+This script samples the daily gridded files of one product
+({prefix}_{yyyymmdd}.nc) at a set of stations, e.g. the UHSLC or IOC
+tide gauges in list/.
+
+The grid indices and bilinear weights of the stations are computed once
+per product grid and station set and cached on disk. The daily files are
+then read in parallel (one process per file). The grid cells used by the
+stations are grouped into boxes of at most 32 x 32 cells and only these
+boxes are read, so a global station list reads a few thousand cells per
+file instead of the whole grid. The result is written as one station x
+time matrix per variable. Grid cells with no data (land) are left out of the
+interpolation and the remaining weights are renormalized.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+import hashlib
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from netCDF4 import Dataset
+
+from download_utils import daily_files
+from station_info import read_list, CACHE_DIRECTORY
+
+EPOCH = datetime(1970, 1, 1)
+# Size (grid cells) of the boxes in which the cells of the stations are read
+BOX = 32
+
+# Usage instructions
+USAGE = """
+Usage: python station_extract.py prefix stations [directory] [var ...]
+
+Arguments:
+  prefix        Product prefix, e.g. SSH_NRT_0p25
+  stations      Station list: UHSLC or IOC
+  directory     Directory of the daily files (optional, defaults to ./)
+  var           Variables to extract (optional, defaults to all)
+
+Example:
+  python station_extract.py SSH_NRT_0p25 UHSLC ./ sla adt
+"""
+
+
+def grid_coordinates(nc):
+    # 1-D latitude and longitude of a daily file, with their dimension names
+    coords = {}
+    for name, var in nc.variables.items():
+        for key in ('lat', 'lon'):
+            if name.lower().startswith(key) and var.ndim == 1 and key not in coords:
+                coords[key] = (var.dimensions[0], np.asarray(var[:], dtype=float))
+    if len(coords) < 2:
+        raise ValueError("The grid has no 1-D latitude and longitude")
+    return coords['lat'], coords['lon']
+
+
+def axis_weights(axis, x, periodic=False):
+    """
+    Linear interpolation on a monotonic 1-D axis: the indices (i0, i1) of
+    the two points around every x and the weight of i1. Points outside
+    the axis get a NaN weight. With periodic=True (global longitude) x
+    may be in any convention and the axis wraps around.
+    """
+    n = len(axis)
+    ascending = axis[-1] >= axis[0]
+    a = axis if ascending else axis[::-1]
+    if periodic:
+        x = a[0] + (np.asarray(x, dtype=float) - a[0]) % 360
+        edges = np.append(a, a[0] + 360)
+        i0 = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, n - 1)
+        w1 = (x - edges[i0]) / (edges[i0 + 1] - edges[i0])
+        i1 = (i0 + 1) % n
+    else:
+        x = np.asarray(x, dtype=float)
+        i0 = np.clip(np.searchsorted(a, x, side='right') - 1, 0, n - 2)
+        w1 = (x - a[i0]) / (a[i0 + 1] - a[i0])
+        w1[(x < a[0]) | (x > a[-1])] = np.nan
+        i1 = i0 + 1
+    if not ascending:
+        i0, i1 = n - 1 - i0, n - 1 - i1
+    return i0, i1, w1
+
+
+def station_weights(lat, lon, st_lat, st_lon):
+    """
+    Bilinear weights of the stations on the grid (lat, lon): the (j, i)
+    indices of the four corners, each (nstation, 4), and their weights.
+    """
+    dlon = np.abs(np.diff(lon)).mean()
+    periodic = abs(lon[-1] - lon[0]) + dlon >= 360 - 1e-6
+    j0, j1, wy = axis_weights(lat, st_lat)
+    i0, i1, wx = axis_weights(lon, st_lon, periodic=periodic)
+    j = np.stack([j0, j0, j1, j1], axis=1)
+    i = np.stack([i0, i1, i0, i1], axis=1)
+    w = np.stack([(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx], axis=1)
+    return j, i, w
+
+
+def cached_weights(lat, lon, st_lat, st_lon, cache_directory=CACHE_DIRECTORY):
+    # station_weights(), cached on disk by the hash of the grid and the stations
+    sha = hashlib.sha1()
+    for array in (lat, lon, st_lat, st_lon):
+        sha.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    path = os.path.join(cache_directory, f"weights_{sha.hexdigest()}.npz")
+    if os.path.isfile(path):
+        with np.load(path) as cache:
+            return cache['j'], cache['i'], cache['w']
+
+    j, i, w = station_weights(lat, lon, st_lat, st_lon)
+    os.makedirs(cache_directory, exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, j=j, i=i, w=w)
+    os.replace(tmp_path, path)
+    return j, i, w
+
+
+def read_boxes(j, i, box=BOX):
+    """
+    Group the grid cells (j, i) of the stations into boxes of at most
+    box x box cells. Returns, for every box, its (j1, j2, i1, i2) bounds
+    and the flat indices of the cells of j and i in it.
+    """
+    key = (j.ravel() // box) * (i.max() // box + 1) + i.ravel() // box
+    order = np.argsort(key, kind='stable')
+    cut = np.flatnonzero(np.diff(key[order])) + 1
+    boxes = []
+    for cells in np.split(order, cut):
+        jb, ib = j.ravel()[cells], i.ravel()[cells]
+        boxes.append(((jb.min(), jb.max() + 1, ib.min(), ib.max() + 1), cells))
+    return boxes
+
+
+def sample_file(path, names, j, i, w, boxes):
+    """
+    Interpolate the variables of one daily file at the stations. Only the
+    boxes of read_boxes() are read.
+    """
+    out = {}
+    with Dataset(path) as nc:
+        for name in names:
+            values = np.full(j.size, np.nan, dtype=np.float32)
+            for (j1, j2, i1, i2), cells in boxes:
+                field = nc.variables[name][0, j1:j2, i1:i2]
+                field = np.ma.filled(field.astype(np.float32), np.nan)
+                values[cells] = field[j.ravel()[cells] - j1, i.ravel()[cells] - i1]
+            values = values.reshape(j.shape)
+            weights = np.where(np.isfinite(values), w, 0.0)
+            total = weights.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[name] = np.where(total > 0,
+                                     np.nansum(weights * values, axis=1) / total,
+                                     np.nan)
+    return out
+
+
+def extract(prefix, stations, directory='./', names=None, workers=None):
+    """
+    Sample every daily file of prefix in directory at the stations (a dict
+    with lon and lat, as returned by station_info).
+
+    Returns the dates (yyyymmdd) and, for every variable, a station x time
+    matrix.
+    """
+    files = daily_files(prefix, directory)
+    if not files:
+        raise ValueError(f"No {prefix} files in {directory}")
+    dates = [date_str for date_str, path in files]
+
+    with Dataset(files[0][1]) as nc:
+        (ydim, lat), (xdim, lon) = grid_coordinates(nc)
+        if names is None:
+            names = [name for name, var in nc.variables.items()
+                     if var.dimensions[1:] == (ydim, xdim) and var.ndim == 3]
+
+    j, i, w = cached_weights(lat, lon, stations['lat'], stations['lon'])
+    # Stations outside the grid are sampled at (0, 0) and set to NaN
+    outside = ~np.isfinite(w).all(axis=1)
+    j[outside] = i[outside] = 0
+    w[outside] = 0.0
+
+    t0 = time.time()
+    data = {name: np.full((len(w), len(files)), np.nan, dtype=np.float32) for name in names}
+    sample = partial(sample_file, names=names, j=j, i=i, w=w, boxes=read_boxes(j, i))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        paths = [path for date_str, path in files]
+        for k, out in enumerate(pool.map(sample, paths, chunksize=8)):
+            for name in names:
+                data[name][:, k] = out[name]
+    print(f"---- {len(stations['lon'])} stations x {len(files)} files "
+          f"in {time.time() - t0:.1f} s")
+
+    return dates, data
+
+
+def write_stations(fout, stations, dates, data):
+    # Write the station x time matrices into a NetCDF file
+    with Dataset(fout, 'w', format='NETCDF4') as nc:
+        nc.createDimension('station', len(stations['lon']))
+        nc.createDimension('time', len(dates))
+
+        id_var = nc.createVariable('id', str, ('station',))
+        id_var.description = 'station ID'
+        lon_var = nc.createVariable('lon', np.float64, ('station',))
+        lon_var.description = 'longitude'
+        lon_var.unit = 'degree_east'
+        lat_var = nc.createVariable('lat', np.float64, ('station',))
+        lat_var.description = 'latitude'
+        lat_var.unit = 'degree_north'
+        time_var = nc.createVariable('time', np.float64, ('time',))
+        time_var.description = 'GMT'
+        time_var.unit = 'days since 1970-01-01 00:00:00'
+
+        id_var[:] = np.asarray(stations['id'], dtype=object)
+        lon_var[:] = stations['lon']
+        lat_var[:] = stations['lat']
+        time_var[:] = [(datetime.strptime(d, '%Y%m%d') - EPOCH).days for d in dates]
+        for name, values in data.items():
+            var = nc.createVariable(name, np.float32, ('station', 'time'), zlib=True,
+                                    fill_value=np.float32(np.nan))
+            var[:] = values
+
+        nc.archive = 'OceanData (https://github.com/SiqiLiOcean/OceanData)'
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 3:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    prefix = sys.argv[1]
+    list_name = sys.argv[2]
+    directory = sys.argv[3] if len(sys.argv) > 3 else './'
+    names = sys.argv[4:] or None
+
+    stations = read_list(list_name)
+    dates, data = extract(prefix, stations, directory, names)
+    fout = os.path.join(directory, f"{prefix}_{list_name.upper()}_{dates[0]}_{dates[-1]}.nc")
+    write_stations(fout, stations, dates, data)
+    print(f"---- SAVE: {fout}")
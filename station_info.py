@@ -0,0 +1,202 @@
+"""
+Python readers of the tide-gauge station lists in list/ (the same lists
+used by UHSLC_info.m and IOC_info.m).
+
+Every reader returns a dict of arrays:
+    id    --- station ID (str)
+    lon   --- longitude (degree east, -180 to 180)
+    lat   --- latitude (degree north)
+    descr --- station description (str)
+
+The parsed lists are cached on disk, and StationCatalogue answers box,
+polygon, nearest and radius queries over both lists at once (UHSLC_info.m
+and IOC_info.m test every station one by one).
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import struct
+import hashlib
+
+import numpy as np
+import scipy.io as sio
+from scipy.spatial import cKDTree
+
+from geo_utils import lon_180, inpolygon_lonlat
+
+LIST_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'list')
+# Directory of the cached lists (and of the cached weights of station_extract.py)
+CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'oceandata')
+
+EARTH_RADIUS = 6371.0
+
+
+def read_uhslc_list(path=os.path.join(LIST_DIRECTORY, 'list_UHSLC.dat')):
+    # Read list_UHSLC.dat (tab-delimited: id, ..., name, country, lat, lon, t1, ...)
+    ids, lon, lat, descr = [], [], [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 6:
+                continue
+            ids.append(f"{int(fields[0]):03d}")
+            lat.append(float(fields[4]))
+            lon.append(float(fields[5]))
+            descr.append(f"{fields[2]}, {fields[3]}")
+    return {'id': np.array(ids), 'lon': lon_180(lon), 'lat': np.array(lat),
+            'descr': np.array(descr)}
+
+
+def _mcos_strings(workspace):
+    """
+    Decode the MATLAB string objects saved in the __function_workspace__ of
+    a .mat file. Each string is saved as a uint64 array: [1, ndims, dims,
+    lengths, UTF-16 characters]. Returns them in the order they are saved.
+    """
+    flags = b'\x06\x00\x00\x00\x08\x00\x00\x00\x0f\x00\x00\x00\x00\x00\x00\x00'
+    strings = []
+    pos = workspace.find(flags)
+    while pos >= 0:
+        j = pos + len(flags)
+        # Dimensions
+        nbytes = struct.unpack('<I', workspace[j + 4:j + 8])[0]
+        j += 8 + nbytes + (-nbytes % 8)
+        # Name (small or normal data element)
+        tag = struct.unpack('<I', workspace[j:j + 4])[0]
+        if tag >> 16:
+            j += 8
+        else:
+            nbytes = struct.unpack('<I', workspace[j + 4:j + 8])[0]
+            j += 8 + nbytes + (-nbytes % 8)
+        # Data
+        nbytes = struct.unpack('<I', workspace[j + 4:j + 8])[0]
+        data = np.frombuffer(workspace[j + 8:j + 8 + nbytes - nbytes % 8], '<u8')
+        if data.size >= 3 and data[0] == 1:
+            ndims = int(data[1])
+            n = int(np.prod(data[2:2 + ndims]))
+            lengths = data[2 + ndims:2 + ndims + n].astype(int)
+            chars = workspace[j + 8 + 8 * (2 + ndims + n):j + 8 + nbytes]
+            start = 0
+            for length in lengths:
+                strings.append(chars[2 * start:2 * (start + length)].decode('utf-16-le'))
+                start += length
+        pos = workspace.find(flags, pos + len(flags))
+    return strings
+
+
+def read_ioc_list(path=os.path.join(LIST_DIRECTORY, 'list_IOC.mat')):
+    # Read list_IOC.mat (struct array info with id, lon, lat, descr)
+    mat = sio.loadmat(path)
+    info = mat['info'][:, 0]
+    strings = _mcos_strings(mat['__function_workspace__'].tobytes())
+
+    def text(value):
+        # MATLAB string objects point to the saved strings by their index
+        if isinstance(value, sio.matlab.MatlabOpaque):
+            return strings[int(value[0]['arr'][4, 0]) - 1]
+        return str(np.squeeze(value))
+
+    return {'id': np.array([text(s['id']) for s in info]),
+            'lon': lon_180([float(np.squeeze(s['lon'])) for s in info]),
+            'lat': np.array([float(np.squeeze(s['lat'])) for s in info]),
+            'descr': np.array([text(s['descr']) for s in info])}
+
+
+READERS = {'UHSLC': (read_uhslc_list, 'list_UHSLC.dat'),
+           'IOC': (read_ioc_list, 'list_IOC.mat')}
+
+
+def read_list(name, cache_directory=CACHE_DIRECTORY):
+    """
+    Read a station list by its name: 'UHSLC' or 'IOC'. The parsed list is
+    cached on disk until the list file is modified.
+    """
+    if name.upper() not in READERS:
+        raise ValueError(f"Unknown station list: {name}")
+    reader, file_name = READERS[name.upper()]
+    path = os.path.join(LIST_DIRECTORY, file_name)
+    stat = os.stat(path)
+    key = hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    cache_path = os.path.join(cache_directory, f"list_{name.upper()}_{key[:16]}.npz")
+    if os.path.isfile(cache_path):
+        with np.load(cache_path) as cache:
+            return {key: cache[key] for key in cache.files}
+
+    out = reader(path)
+    os.makedirs(cache_directory, exist_ok=True)
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, **out)
+    os.replace(tmp_path, cache_path)
+    return out
+
+
+def _unit_vectors(lon, lat):
+    # Points on the unit sphere
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class StationCatalogue:
+    """
+    The stations of several lists in flat arrays (id, source, lon, lat,
+    descr), with a k-d tree of their positions on the sphere. The queries
+    return station indices, and subset() turns them into a station dict.
+    """
+
+    def __init__(self, names=('UHSLC', 'IOC'), cache_directory=CACHE_DIRECTORY):
+        lists = [read_list(name, cache_directory) for name in names]
+        self.id = np.concatenate([info['id'].astype(str) for info in lists])
+        self.source = np.concatenate([np.full(len(info['id']), name.upper())
+                                      for name, info in zip(names, lists)])
+        self.lon = np.concatenate([info['lon'] for info in lists])
+        self.lat = np.concatenate([info['lat'] for info in lists])
+        self.descr = np.concatenate([info['descr'].astype(str) for info in lists])
+        self.tree = cKDTree(_unit_vectors(self.lon, self.lat))
+
+    def __len__(self):
+        return len(self.id)
+
+    def subset(self, index):
+        # Stations of the indices, as returned by read_list (plus their source)
+        return {'id': self.id[index], 'lon': self.lon[index], 'lat': self.lat[index],
+                'descr': self.descr[index], 'source': self.source[index]}
+
+    def bbox(self, xlims=(-180, 180), ylims=(-90, 90)):
+        # Stations in a lon/lat box; xlims[0] > xlims[1] (after calc_lon_180) crosses 180
+        inside = (self.lat >= ylims[0]) & (self.lat <= ylims[1])
+        if xlims[1] - xlims[0] < 360:
+            x1, x2 = lon_180(xlims)
+            if x1 <= x2:
+                inside &= (self.lon >= x1) & (self.lon <= x2)
+            else:
+                inside &= (self.lon >= x1) | (self.lon <= x2)
+        return np.flatnonzero(inside)
+
+    def polygon(self, poly):
+        # Stations in a lon/lat polygon (n, 2), which may cross 180
+        return np.flatnonzero(inpolygon_lonlat(self.lon, self.lat, poly))
+
+    def nearest(self, lon, lat, k=1):
+        """
+        The k stations nearest to every point (lon, lat), which may be
+        arrays (e.g. all the nodes of a model grid). Returns the
+        great-circle distances (km) and the station indices, with an extra
+        last axis of size k if k > 1.
+        """
+        chord, index = self.tree.query(_unit_vectors(lon, lat), k=k)
+        return 2 * EARTH_RADIUS * np.arcsin(np.minimum(chord / 2, 1)), index
+
+    def radius(self, lon, lat, radius):
+        """
+        The stations within radius (km, great-circle) of the point
+        (lon, lat). For arrays of points, returns one index array per
+        point.
+        """
+        chord = 2 * np.sin(min(radius / EARTH_RADIUS, np.pi) / 2)
+        found = self.tree.query_ball_point(_unit_vectors(lon, lat), chord)
+        if np.ndim(lon) == 0:
+            return np.array(sorted(found), dtype=np.int64)
+        return [np.array(sorted(index), dtype=np.int64) for index in np.ravel(found)]
@@ -0,0 +1,38 @@
+import os
+from functools import partial
+
+import numpy as np
+from netCDF4 import Dataset
+
+import regrid
+
+
+def _grid_file(path, lat, lon, sst=None):
+    with Dataset(path, 'w') as nc:
+        nc.createDimension('time', 1)
+        nc.createDimension('lat', len(lat))
+        nc.createDimension('lon', len(lon))
+        nc.createVariable('lat', 'f8', ('lat',))[:] = lat
+        nc.createVariable('lon', 'f8', ('lon',))[:] = lon
+        nc.createVariable('time', 'f8', ('time',))[:] = 19724
+        if sst is not None:
+            nc.createVariable('sst', 'f4', ('time', 'lat', 'lon'))[:] = sst
+
+
+def test_rerun_after_crash(tmp_path, monkeypatch):
+    # A .part left by a run onto another grid does not break the next run
+    monkeypatch.setattr(regrid, 'cached_weights',
+                        partial(regrid.cached_weights, cache_directory=str(tmp_path / 'cache')))
+    lat, lon = np.arange(-85, 90, 10.), np.arange(-175, 180, 10.)
+    _grid_file(tmp_path / 'SST_20240101.nc', lat, lon, np.ones((1, len(lat), len(lon))))
+    _grid_file(tmp_path / 'target.nc', np.arange(-80, 81, 20.), np.arange(-170, 171, 20.))
+    _grid_file(tmp_path / 'OUT_20240101.nc.part', np.arange(-88, 89, 4.), np.arange(-178, 179, 4.),
+               np.zeros((1, 45, 90)))
+
+    n = regrid.regrid_files('SST', str(tmp_path / 'target.nc'), 'OUT', directory=str(tmp_path))
+
+    assert n == 1
+    assert not os.path.exists(tmp_path / 'OUT_20240101.nc.part')
+    with Dataset(tmp_path / 'OUT_20240101.nc') as nc:
+        assert nc.variables['sst'].shape == (1, 9, 18)
+        assert np.allclose(nc.variables['sst'][:], 1)
@@ -0,0 +1,335 @@
+"""
+This script gathers the IOC (IOC_zeta_{id}_*.nc, from IOC_download.m or
+ioc_harvest.py) and UHSLC (UHSLC_zeta_{id}.nc, from UHSLC_download.m)
+tide-gauge files into one station store, so that a time window of many
+stations is read with one file open.
+
+The store is a CF timeSeries ragged-array NetCDF4 file: one row per
+station (id, source, lon, lat, location) and the time and zeta of all the
+stations along obs, with the station index of every observation.
+
+New observations are appended in blocks: one block per station and per
+month, every block contiguous along obs. The block table records the
+station, position and time range of every block, and is the time index
+of the store. The blocks of one append are sorted by month, so a time
+window of all the stations is a few contiguous reads. Observations older
+than the last ones stored (gaps filled later, late data) are appended
+as new blocks too, and the blocks are merged by time when they are read.
+
+Siqi Li, SMAST
+2026-10-18
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from netCDF4 import Dataset
+
+from geo_utils import lon_180
+
+# Chunk sizes of the observations and of the block table
+CHUNK_OBS = 65536
+CHUNK_BLOCKS = 1024
+# Compression level (0-9)
+COMPLEVEL = 4
+
+TIME_UNITS = 'days since 1800-01-01 00:00:00'
+TIME_EPOCH = np.datetime64('1800-01-01T00:00:00', 's')
+
+# Usage instructions
+USAGE = """
+Usage: python tide_archive.py store fin [fin ...]
+
+Arguments:
+  store         Station store file, created if it does not exist
+  fin           IOC_zeta_*.nc or UHSLC_zeta_*.nc files to add
+
+Example:
+  python tide_archive.py tide_gauges.nc IOC_zeta_*.nc UHSLC_zeta_*.nc
+"""
+
+
+def _text(var):
+    # Text of a char variable
+    chars = np.ma.filled(np.asarray(var[:]).ravel(), b' ')
+    return b''.join(chars.tolist()).decode('utf-8', 'replace').strip()
+
+
+def read_ioc_file(fin):
+    # Read one IOC_archive_one.m file (as IOC_read.m)
+    with Dataset(fin) as nc:
+        return {
+            'id': _text(nc.variables['id']),
+            'descr': _text(nc.variables['location']),
+            'lon': float(lon_180(nc.variables['lon'][:].ravel()[0])),
+            'lat': float(nc.variables['lat'][:].ravel()[0]),
+            'time': np.asarray(nc.variables['time'][:], dtype=np.float64),
+            'zeta': np.ma.filled(nc.variables['zeta'][:].astype(float), np.nan).ravel(),
+        }
+
+
+def read_uhslc_file(fin):
+    # Read one UHSLC fast hourly file (as UHSLC_read.m: meter, no missing values)
+    with Dataset(fin) as nc:
+        zeta = np.ma.filled(nc.variables['sea_level'][:].astype(float), np.nan).ravel() / 1000
+        times = np.asarray(nc.variables['time'][:], dtype=np.float64).ravel()
+        valid = ~np.isnan(zeta)
+        return {
+            'id': f"{int(np.ravel(nc.variables['uhslc_id'][:])[0]):03d}",
+            'descr': (f"{_text(nc.variables['station_name'])}, "
+                      f"{_text(nc.variables['station_country'])}"),
+            'lon': float(lon_180(nc.variables['lon'][:].ravel()[0])),
+            'lat': float(nc.variables['lat'][:].ravel()[0]),
+            'time': times[valid],
+            'zeta': zeta[valid],
+        }
+
+
+def read_station_file(fin):
+    # Read an IOC or a UHSLC file, with its source
+    if os.path.basename(fin).startswith('UHSLC_'):
+        return read_uhslc_file(fin), 'UHSLC'
+    return read_ioc_file(fin), 'IOC'
+
+
+def _months(days):
+    # Months since 1970-01 of times in days since 1800
+    seconds = np.round(np.asarray(days) * 86400).astype('timedelta64[s]')
+    return (TIME_EPOCH + seconds).astype('datetime64[M]').astype(np.int64)
+
+
+def create_store(fout, complevel=COMPLEVEL):
+    # Create an empty station store
+    with Dataset(fout, 'w', format='NETCDF4') as nc:
+        nc.Conventions = 'CF-1.8'
+        nc.featureType = 'timeSeries'
+        nc.source = 'IOC (http://www.ioc-sealevelmonitoring.org), UHSLC (https://uhslc.soest.hawaii.edu)'
+        nc.archive = 'OceanData (https://github.com/SiqiLiOcean/OceanData)'
+        nc.createDimension('station', None)
+        nc.createDimension('obs', None)
+        nc.createDimension('block', None)
+
+        def variable(name, dtype, dim, chunk, **attrs):
+            var = nc.createVariable(name, dtype, (dim,), zlib=complevel > 0,
+                                    complevel=complevel, chunksizes=(chunk,))
+            var.setncatts(attrs)
+
+        # Stations
+        nc.createVariable('id', str, ('station',)).setncatts(
+            {'description': 'station code', 'cf_role': 'timeseries_id'})
+        nc.createVariable('source', str, ('station',)).description = 'IOC or UHSLC'
+        nc.createVariable('location', str, ('station',)).description = 'city, country'
+        variable('lon', np.float64, 'station', CHUNK_BLOCKS,
+                 standard_name='longitude', units='degree_east')
+        variable('lat', np.float64, 'station', CHUNK_BLOCKS,
+                 standard_name='latitude', units='degree_north')
+
+        # Observations
+        variable('time', np.float64, 'obs', CHUNK_OBS,
+                 standard_name='time', units=TIME_UNITS, description='GMT')
+        variable('zeta', np.float32, 'obs', CHUNK_OBS,
+                 description='water surface elevation', units='meter')
+        variable('station_index', np.int32, 'obs', CHUNK_OBS,
+                 long_name='index of the station of the observation',
+                 instance_dimension='station')
+
+        # Time index
+        variable('block_station', np.int32, 'block', CHUNK_BLOCKS,
+                 long_name='station of the block')
+        variable('block_start', np.int64, 'block', CHUNK_BLOCKS,
+                 long_name='index of the first observation of the block')
+        variable('block_count', np.int64, 'block', CHUNK_BLOCKS,
+                 long_name='number of observations of the block')
+        variable('block_time_min', np.float64, 'block', CHUNK_BLOCKS,
+                 long_name='first time of the block', units=TIME_UNITS)
+        variable('block_time_max', np.float64, 'block', CHUNK_BLOCKS,
+                 long_name='last time of the block', units=TIME_UNITS)
+
+
+def _stored_seconds(nc, tables, k, t1, t2):
+    # Times (s, rounded) of the observations of station k stored between t1 and t2 (days)
+    block_station, block_start, block_count, time_min, time_max = tables
+    seconds = []
+    for b in np.flatnonzero((block_station == k) & (time_max >= t1) & (time_min <= t2)):
+        times = np.asarray(nc.variables['time'][block_start[b]:block_start[b] + block_count[b]])
+        seconds.append(np.round(times * 86400).astype(np.int64))
+    return np.concatenate(seconds) if seconds else np.zeros(0, dtype=np.int64)
+
+
+def append_stations(fout, stations):
+    """
+    Append a list of (sta, source) station records to the store. The
+    observations are merged by time: those already stored for a station
+    (same time to the second) are skipped, so adding the same file twice
+    does nothing, and the others are added, also when they are older than
+    the last ones stored. Returns the number of observations added.
+    """
+    with Dataset(fout, 'a') as nc:
+        keys = [f"{s}:{i}" for s, i in zip(nc.variables['source'][:], nc.variables['id'][:])]
+        index = {key: k for k, key in enumerate(keys)}
+        tables = tuple(np.asarray(nc.variables[name][:]) for name in
+                       ('block_station', 'block_start', 'block_count',
+                        'block_time_min', 'block_time_max'))
+        # Times added by this call, per station
+        added = {}
+
+        blocks = []
+        skipped = 0
+        for sta, source in stations:
+            key = f"{source}:{sta['id']}"
+            if key not in index:
+                k = index[key] = len(index)
+                nc.variables['id'][k] = sta['id']
+                nc.variables['source'][k] = source
+                nc.variables['location'][k] = sta['descr']
+                nc.variables['lon'][k] = sta['lon']
+                nc.variables['lat'][k] = sta['lat']
+            k = index[key]
+
+            times = np.asarray(sta['time'])
+            zeta = np.asarray(sta['zeta'])
+            if len(times) == 0:
+                continue
+            seconds, first = np.unique(np.round(times * 86400).astype(np.int64),
+                                       return_index=True)
+            stored = np.concatenate([_stored_seconds(nc, tables, k, times.min(), times.max())]
+                                    + added.get(k, []))
+            new = ~np.isin(seconds, stored)
+            skipped += len(times) - new.sum()
+            times, zeta = times[first[new]], zeta[first[new]]
+            if len(times) == 0:
+                continue
+            added.setdefault(k, []).append(seconds[new])
+
+            # One block per month
+            month = _months(times)
+            cut = np.flatnonzero(np.diff(month)) + 1
+            for a, b in zip(np.r_[0, cut], np.r_[cut, len(times)]):
+                blocks.append((month[a], k, times[a:b], zeta[a:b]))
+
+        if skipped:
+            print(f"---- {skipped} observations already stored skipped")
+        if not blocks:
+            return 0
+
+        blocks.sort(key=lambda block: (block[0], block[1]))
+        counts = np.array([len(block[2]) for block in blocks], dtype=np.int64)
+        no0 = len(nc.dimensions['obs'])
+        nb0 = len(nc.dimensions['block'])
+        n = counts.sum()
+        nc.variables['time'][no0:no0 + n] = np.concatenate([block[2] for block in blocks])
+        nc.variables['zeta'][no0:no0 + n] = np.concatenate([block[3] for block in blocks])
+        nc.variables['station_index'][no0:no0 + n] = np.repeat([block[1] for block in blocks],
+                                                               counts)
+        nb = len(blocks)
+        nc.variables['block_station'][nb0:nb0 + nb] = [block[1] for block in blocks]
+        nc.variables['block_start'][nb0:nb0 + nb] = no0 + np.cumsum(counts) - counts
+        nc.variables['block_count'][nb0:nb0 + nb] = counts
+        nc.variables['block_time_min'][nb0:nb0 + nb] = [block[2][0] for block in blocks]
+        nc.variables['block_time_max'][nb0:nb0 + nb] = [block[2][-1] for block in blocks]
+
+    return int(n)
+
+
+def convert(fout, fins):
+    # Add IOC/UHSLC files to the store
+    if not os.path.isfile(fout):
+        print(f"---- Create {fout}")
+        create_store(fout)
+    t0 = time.time()
+    n = append_stations(fout, [read_station_file(fin) for fin in fins])
+    print(f"---- {n} observations of {len(fins)} files added in {time.time() - t0:.1f} s")
+    return n
+
+
+def query(fout, tlims=None, ids=None, xlims=None, ylims=None, clean=True):
+    """
+    Read stations of the store, as IOC_read.m and UHSLC_read.m.
+
+    tlims is an optional [start, end] pair of datetimes, ids an optional
+    list of station codes, and xlims/ylims an optional lon/lat box. With
+    clean, the stations with no data in tlims are left out. Returns a
+    list of dicts with lon, lat, id, descr, source, time (datetime64[s])
+    and zeta.
+    """
+    with Dataset(fout) as nc:
+        station_id = np.asarray(nc.variables['id'][:], dtype=object)
+        location = nc.variables['location'][:]
+        source = nc.variables['source'][:]
+        lon = nc.variables['lon'][:]
+        lat = nc.variables['lat'][:]
+        selected = np.ones(len(station_id), dtype=bool)
+        if ids is not None:
+            selected &= np.isin(station_id, [str(i) for i in ids])
+        if xlims is not None:
+            selected &= (lon >= xlims[0]) & (lon <= xlims[1])
+        if ylims is not None:
+            selected &= (lat >= ylims[0]) & (lat <= ylims[1])
+
+        # Blocks of the selected stations in the time window
+        block_station = nc.variables['block_station'][:]
+        block_start = nc.variables['block_start'][:]
+        block_count = nc.variables['block_count'][:]
+        keep = selected[block_station] if len(block_station) else np.zeros(0, dtype=bool)
+        if tlims is not None:
+            dlims = [(np.datetime64(t, 's') - TIME_EPOCH) / np.timedelta64(1, 'D') for t in tlims]
+            keep &= ((nc.variables['block_time_max'][:] >= dlims[0])
+                     & (nc.variables['block_time_min'][:] <= dlims[1]))
+        blocks = np.flatnonzero(keep)
+        blocks = blocks[np.argsort(block_start[blocks])]
+
+        # One read per run of contiguous blocks
+        pieces = {}
+        k = 0
+        while k < len(blocks):
+            j = k
+            while (j + 1 < len(blocks) and
+                   block_start[blocks[j + 1]] == block_start[blocks[j]] + block_count[blocks[j]]):
+                j += 1
+            o1 = block_start[blocks[k]]
+            o2 = block_start[blocks[j]] + block_count[blocks[j]]
+            times = np.asarray(nc.variables['time'][o1:o2])
+            zeta = np.ma.filled(nc.variables['zeta'][o1:o2].astype(float), np.nan)
+            for b in blocks[k:j + 1]:
+                a = block_start[b] - o1
+                piece = slice(a, a + block_count[b])
+                pieces.setdefault(block_station[b], []).append((times[piece], zeta[piece]))
+            k = j + 1
+
+        out = []
+        for s in np.flatnonzero(selected):
+            times = np.concatenate([p[0] for p in pieces.get(s, [])] or [np.zeros(0)])
+            zeta = np.concatenate([p[1] for p in pieces.get(s, [])] or [np.zeros(0)])
+            order = np.argsort(times, kind='stable')
+            times, zeta = times[order], zeta[order]
+            if tlims is not None:
+                inside = (times >= dlims[0]) & (times <= dlims[1])
+                times, zeta = times[inside], zeta[inside]
+            if clean and len(times) == 0:
+                continue
+            seconds = np.round(times * 86400).astype('timedelta64[s]')
+            out.append({
+                'lon': float(lon[s]),
+                'lat': float(lat[s]),
+                'id': station_id[s],
+                'descr': location[s],
+                'source': source[s],
+                'time': TIME_EPOCH + seconds,
+                'zeta': zeta,
+            })
+
+    return out
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    if len(sys.argv) < 3:
+        print("Invalid input format.")
+        print(USAGE)
+        sys.exit()
+    fout = sys.argv[1]
+    fins = sys.argv[2:]
+
+    convert(fout, fins)